@@ -0,0 +1,165 @@
+import json
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from pathlib import Path
+
+from runscope import run_scope
+from tracing import run_trace
+
+BATCH_DIR = Path(__file__).parent / "batch_runs"
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def load_queries(path: Path) -> list[dict]:
+    """Read queries as [{"id", "query"}].
+
+    JSONL lines are objects with a "query" and an optional "id". Any other
+    file has one query per line; blank lines and lines starting with # are
+    skipped. Runs without an id are numbered in file order.
+    """
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json.loads(line) if line.startswith("{") else {"query": line}
+            if not job.get("query"):
+                raise ValueError(f"{path}: entry without a query: {line[:80]}")
+            jobs.append(job)
+
+    width = len(str(len(jobs)))
+    for i, job in enumerate(jobs, 1):
+        job["id"] = _slug(str(job.get("id") or f"{i:0{width}d}-{job['query']}"))
+    if len({job["id"] for job in jobs}) != len(jobs):
+        raise ValueError(f"{path}: duplicate query ids")
+    return jobs
+
+
+def run_query(job: dict, run_dir: str, checkpointed: bool = False, trace: bool = False) -> dict:
+    """Run one query through the graph, writing its results to `run_dir`.
+
+    Runs in the worker (thread or process), in its own run scope so
+    concurrent queries never share the extraction store or counters. Never
+    raises: failures are recorded in the returned dict and in run.json.
+    """
+    out = Path(run_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    run = {"id": job["id"], "query": job["query"], "status": "ok"}
+
+    start = time.perf_counter()
+    try:
+        with run_scope(), run_trace(job["id"], job["query"], out) if trace else nullcontext():
+            state = _invoke(job, out, checkpointed)
+        _write_json(out / "sources.json", list(state.get("sources", {}).values()))
+        _write_json(out / "evaluation.json", state.get("evaluation", {}))
+        run["average"] = state.get("evaluation", {}).get("average")
+    except Exception as e:
+        run["status"] = "failed"
+        run["error"] = f"{type(e).__name__}: {e}"
+    run["seconds"] = round(time.perf_counter() - start, 2)
+
+    _write_json(out / "run.json", run)
+    return run
+
+
+def _invoke(job: dict, out: Path, checkpointed: bool) -> dict:
+    graph_input = {"query": job["query"], "output_dir": str(out)}
+    if checkpointed:
+        config = {"configurable": {"thread_id": f"{out.parent.name}-{job['id']}"}}
+        return _get_app(checkpointed).invoke(graph_input, config, durability="async")
+    return _get_app(checkpointed).invoke(graph_input)
+
+
+def run_batch(
+    path: Path,
+    workers: int = 4,
+    executor: str = "thread",
+    output_dir: Path | None = None,
+    checkpointed: bool = False,
+    verbose: bool = False,
+    trace: bool = False,
+) -> dict:
+    """Run every query in `path` and return the batch summary.
+
+    Each query gets its own directory under `output_dir` (default
+    batch_runs/<timestamp>) with final_result.txt, sources.json,
+    evaluation.json and run.json, plus trace.json and metrics.prom with
+    `trace`. summary.json is written at the top.
+    """
+    from display import console, display_batch_run, display_batch_start, display_batch_summary
+
+    jobs = load_queries(path)
+    output_dir = Path(output_dir or BATCH_DIR / time.strftime("%Y%m%d-%H%M%S"))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    display_batch_start(len(jobs), workers, executor, str(output_dir))
+
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+
+    start = time.perf_counter()
+    runs = []
+    try:
+        with pool_class(max_workers=workers, initializer=_silence_nodes, initargs=(not verbose,)) as pool:
+            futures = [
+                pool.submit(run_query, job, str(output_dir / job["id"]), checkpointed, trace)
+                for job in jobs
+            ]
+            for future in as_completed(futures):
+                runs.append(future.result())
+                display_batch_run(len(runs), len(jobs), runs[-1])
+    finally:
+        console.quiet = False
+    wall_seconds = time.perf_counter() - start
+
+    order = {job["id"]: i for i, job in enumerate(jobs)}
+    runs.sort(key=lambda run: order[run["id"]])
+    durations = [run["seconds"] for run in runs] or [0.0]
+    failures = [run for run in runs if run["status"] != "ok"]
+    summary = {
+        "total": len(runs),
+        "succeeded": len(runs) - len(failures),
+        "failed": len(failures),
+        "workers": workers,
+        "executor": executor,
+        "wall_seconds": round(wall_seconds, 2),
+        "queries_per_hour": round(len(runs) * 3600 / wall_seconds, 2) if wall_seconds else 0.0,
+        "median_run_seconds": statistics.median(durations),
+        "max_run_seconds": max(durations),
+        "failures": [{"id": run["id"], "error": run["error"]} for run in failures],
+        "runs": runs,
+    }
+    _write_json(output_dir / "summary.json", summary)
+    display_batch_summary(summary)
+    return summary
+
+
+def _silence_nodes(quiet: bool):
+    # Node output from parallel runs would interleave; only progress is shown
+    from display import console
+
+    console.quiet = quiet
+
+
+def _get_app(checkpointed: bool):
+    # One compiled graph (and checkpointer) per worker process
+    global _app
+    with _app_lock:
+        if _app is None:
+            from graph import get_app, open_checkpointer
+
+            _app = get_app(open_checkpointer() if checkpointed else None)
+        return _app
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "query"
+
+
+def _write_json(path: Path, value):
+    path.write_text(json.dumps(value, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -0,0 +1,251 @@
+"""Benchmark the full graph offline.
+
+Runs planner → evaluator against the stub LLM and search backends in
+fakes.py for each scenario, every run in a fresh interpreter, and reports
+per-node wall time, total time, peak RSS, peak state size and LLM/search
+call counts. Results are appended to benchmarks/results/end_to_end.jsonl
+tagged with the current commit, so regressions show up in the history;
+nothing is saved from a working tree with uncommitted changes.
+
+Latencies are seconds or distributions ("uniform:LOW:HIGH",
+"lognormal:MEDIAN:SIGMA"). The stubs are paced by the "endpoints" rate
+limits in models.json like the real backends, so those waits are part of
+the timings. With both latencies at 0 the limits are dropped as well, and
+only the orchestration, formatting and parsing code is timed.
+--set overrides models.json entries, e.g. to size concurrency settings:
+
+    python benchmarks/end_to_end.py --runs 3
+    python benchmarks/end_to_end.py --scenario wide --llm-latency lognormal:0.5:0.6 \\
+        --set researcher.max_concurrency=4
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from history import save_result
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_FILE = ROOT / "benchmarks" / "results" / "end_to_end.jsonl"
+
+sys.path.insert(0, str(ROOT))
+
+QUERY = "impact of remote work on employee productivity"
+NODES = ("planner", "researcher", "debate", "moderator", "publisher", "evaluator")
+
+# Options passed to fakes.install()
+SCENARIOS = {
+    "baseline": {},
+    "wide": {"subtopics": 6, "perspectives": 5},
+    "gap-loop": {"gap_queries": 2},
+    "rerun": {"fail_first_evaluation": True},
+    "full": {"subtopics": 6, "perspectives": 5, "gap_queries": 2, "fail_first_evaluation": True},
+}
+
+
+def scenario_config(options: dict, overrides: dict[str, dict], paced: bool = True) -> dict:
+    """models.json adjusted so the scenario can run as specified; unpaced, without endpoint limits."""
+    config = json.loads((ROOT / "models.json").read_text(encoding="utf-8"))
+    # Debaters past the third reuse its settings
+    for i in range(4, options.get("perspectives", 3) + 1):
+        config.setdefault(f"debater_{i}", dict(config["debater_3"]))
+    # The stub debaters agree after round 1; keep the rebuttal round in every scenario
+    config["debate"] = {**config.get("debate", {}), "min_rounds": 2, "max_rounds": 2}
+    # A clear local pass would skip the LLM evaluation that triggers the rerun
+    if options.get("fail_first_evaluation"):
+        config["evaluator"].pop("prescore", None)
+    if not paced:
+        config["endpoints"] = {}
+    for name, values in overrides.items():
+        config.setdefault(name, {}).update(values)
+    return config
+
+
+def run_scenario(
+    options: dict, llm_latency: str, search_latency: str, overrides: dict[str, dict], paced: bool = True
+) -> dict:
+    """One full graph run in this process; returns its timings and counts."""
+    from unittest import mock
+
+    import fakes
+    import models_config
+    from display import console
+    from tracing import run_trace, summarize
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / "models.json"
+        config_path.write_text(json.dumps(scenario_config(options, overrides, paced)), encoding="utf-8")
+        with mock.patch.object(models_config, "_CONFIG_PATH", config_path):
+            fakes.install(llm_latency, search_latency, **options)
+            console.quiet = True
+
+            from graph import get_app
+
+            start = time.perf_counter()
+            app = get_app()
+            build_seconds = time.perf_counter() - start
+
+            with run_trace("benchmark", QUERY, Path(tmp)) as trace:
+                app.invoke({"query": QUERY, "output_dir": tmp})
+
+    summary = summarize(trace)
+    calls = trace.to_dict()["calls"]
+    llm = [c for c in calls if c["kind"] == "llm"]
+    search = [c for c in calls if c["kind"] == "search"]
+    return {
+        "build_seconds": round(build_seconds, 4),
+        "total_seconds": round(summary["wall_seconds"], 4),
+        "nodes": {node: round(n["seconds"], 4) for node, n in summary["nodes"].items()},
+        "node_runs": {node: n["runs"] for node, n in summary["nodes"].items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_state_bytes": summary["peak_state_bytes"],
+        "update_bytes": summary["update_bytes"],
+        "llm_calls": len(llm),
+        "search_calls": len(search),
+        "search_requests": sum(c["cache"] == "miss" for c in search),
+        "input_tokens": sum(c.get("input_tokens", 0) for c in llm),
+        "output_tokens": sum(c.get("output_tokens", 0) for c in llm),
+        "calls_by_agent": {agent: a["calls"] for agent, a in summary["agents"].items()},
+    }
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_in_subprocess(options: dict, args) -> dict:
+    job = {
+        "options": options,
+        "llm_latency": args.llm_latency,
+        "search_latency": args.search_latency,
+        "overrides": args.overrides,
+        "paced": args.paced,
+    }
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", json.dumps(job)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def aggregate(runs: list[dict]) -> dict:
+    """Medians over runs for timings, the maximum for RSS; counts come from the last run."""
+    last = runs[-1]
+    return {
+        "runs": len(runs),
+        "median_seconds": round(statistics.median(r["total_seconds"] for r in runs), 4),
+        "min_seconds": round(min(r["total_seconds"] for r in runs), 4),
+        "build_seconds": round(statistics.median(r["build_seconds"] for r in runs), 4),
+        "nodes": {
+            node: round(statistics.median(r["nodes"].get(node, 0.0) for r in runs), 4)
+            for node in last["nodes"]
+        },
+        "node_runs": last["node_runs"],
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None), default=None),
+        **{key: last[key] for key in (
+            "peak_state_bytes", "update_bytes", "llm_calls", "search_calls", "search_requests",
+            "input_tokens", "output_tokens", "calls_by_agent",
+        )},
+    }
+
+
+def parse_overrides(items: list[str]) -> dict[str, dict]:
+    """["researcher.max_concurrency=4"] -> {"researcher": {"max_concurrency": 4}}"""
+    overrides: dict[str, dict] = {}
+    for item in items:
+        target, _, value = item.partition("=")
+        name, _, key = target.partition(".")
+        if not key or not value:
+            raise SystemExit(f"--set expects AGENT.KEY=VALUE, got {item!r}")
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            parsed = value
+        overrides.setdefault(name, {})[key] = parsed
+    return overrides
+
+
+def is_zero(latency: str) -> bool:
+    try:
+        return float(latency) == 0
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--scenario", action="append", choices=SCENARIOS,
+        help="scenario to run (repeatable; default: all)",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario, each in a fresh interpreter")
+    parser.add_argument("--llm-latency", default="uniform:0.05:0.15", help="seconds per LLM call, or a distribution")
+    parser.add_argument("--search-latency", default="uniform:0.1:0.3", help="seconds per search, or a distribution")
+    parser.add_argument("--output-paragraphs", type=int, help="paragraphs per generated text (default 1)")
+    parser.add_argument("--page-paragraphs", type=int, help="paragraphs per search result page (default 6)")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="AGENT.KEY=VALUE",
+        help="override a models.json setting (value parsed as JSON)",
+    )
+    parser.add_argument("--no-save", action="store_true", help="don't append to the results file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        job = json.loads(args.worker)
+        print(json.dumps(run_scenario(
+            job["options"], job["llm_latency"], job["search_latency"], job["overrides"], job["paced"],
+        )))
+        return
+
+    args.overrides = parse_overrides(args.set)
+    # At zero latency the rate limits' sleeps would dominate what is meant to be orchestration time
+    args.paced = not (is_zero(args.llm_latency) and is_zero(args.search_latency))
+    sizes = {
+        key: value for key, value in (
+            ("output_paragraphs", args.output_paragraphs), ("page_paragraphs", args.page_paragraphs),
+        ) if value is not None
+    }
+
+    header = f"{'scenario':<10} {'total':>7}" + "".join(f" {node:>10}" for node in NODES)
+    print(header + f" {'RSS MB':>7} {'state KB':>8} {'LLM':>5} {'search':>6}")
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        options = {**SCENARIOS[name], **sizes}
+        result = results[name] = {"options": options, **aggregate(
+            [run_in_subprocess(options, args) for _ in range(args.runs)]
+        )}
+        nodes = "".join(f" {result['nodes'].get(node, 0.0):>9.2f}s" for node in NODES)
+        rss = "—" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+        print(
+            f"{name:<10} {result['median_seconds']:>6.2f}s{nodes} {rss:>7} "
+            f"{result['peak_state_bytes'] / 1024:>8.1f} "
+            f"{result['llm_calls']:>5} {result['search_calls']:>6}"
+        )
+
+    if not args.no_save:
+        save_result(RESULTS_FILE, {
+            "runs": args.runs,
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "paced": args.paced,
+            "overrides": args.overrides,
+            "scenarios": results,
+        })
+
+
+if __name__ == "__main__":
+    main()
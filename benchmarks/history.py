@@ -0,0 +1,31 @@
+"""Results history shared by the benchmarks: one JSON line per run, tagged with the commit."""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def current_commit() -> str:
+    proc = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip() or "unknown"
+
+
+def save_result(results_file: Path, entry: dict):
+    """Append `entry` to `results_file`, tagged with the commit, time and Python version.
+
+    Results measured on uncommitted changes can't be tied to a commit, so
+    nothing is saved from a dirty working tree.
+    """
+    commit = current_commit()
+    if commit.endswith("-dirty"):
+        print("\nNot saved: the working tree has uncommitted changes (commit first, or use --no-save)")
+        return
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    entry = {"commit": commit, "time": time.time(), "python": sys.version.split()[0], **entry}
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"\nSaved to {results_file.relative_to(ROOT)}")
@@ -0,0 +1,82 @@
+"""Benchmark local passage ranking against plain truncation.
+
+Builds synthetic markdown pages in which a few relevant paragraphs are
+scattered through boilerplate. For each page size it compares the tokens
+the old 15,000-character truncation would send to the extraction LLM with
+the ranked excerpt, how many of the relevant paragraphs each keeps, and
+ranking throughput.
+
+    python benchmarks/passage_ranking.py --sizes 20000 100000 500000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ranking import estimate_tokens, select_passages  # noqa: E402
+
+TOPIC = "impact of remote work on employee productivity"
+TRUNCATION_CHARS = 15000
+BUDGET_TOKENS = 3000
+
+BOILERPLATE = [
+    "Subscribe to our newsletter for the latest updates and exclusive offers.",
+    "We use cookies to improve your experience. Accept all or manage preferences.",
+    "Related articles: travel tips, gadget reviews, celebrity news and more.",
+    "Share this story on social media. Follow us for daily content and videos.",
+    "Advertisement. Continue reading below the sponsored content section.",
+]
+
+
+def build_page(size: int, relevant: int, rng: random.Random) -> tuple[str, list[str]]:
+    facts = [
+        f"A {2015 + i} study of {1000 * (i + 1)} employees found remote work "
+        f"raised productivity by {5 + i}% while employee attrition fell."
+        for i in range(relevant)
+    ]
+    paragraphs = []
+    while sum(len(p) for p in paragraphs) < size:
+        paragraphs.append(" ".join(rng.choice(BOILERPLATE) for _ in range(rng.randint(2, 6))))
+    for fact in facts:
+        paragraphs.insert(rng.randrange(len(paragraphs)), fact)
+    return "\n\n".join(paragraphs), facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000, 500000, 2000000])
+    parser.add_argument("--relevant", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    header = f"{'page chars':>11} {'truncate tok':>13} {'ranked tok':>11} {'reduction':>10} {'facts kept (trunc/ranked)':>26} {'MB/s':>7}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        page, facts = build_page(size, args.relevant, rng)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            excerpt = select_passages(page, TOPIC, BUDGET_TOKENS)
+        elapsed = (time.perf_counter() - start) / args.repeat
+
+        truncated = page[:TRUNCATION_CHARS]
+        truncated_tokens = estimate_tokens(truncated)
+        ranked_tokens = estimate_tokens(excerpt)
+        kept_truncated = sum(f in truncated for f in facts)
+        kept_ranked = sum(f in excerpt for f in facts)
+        print(
+            f"{len(page):>11,} {truncated_tokens:>13,} {ranked_tokens:>11,} "
+            f"{1 - ranked_tokens / truncated_tokens:>9.0%} "
+            f"{f'{kept_truncated}/{len(facts)} vs {kept_ranked}/{len(facts)}':>26} "
+            f"{len(page) / elapsed / 1e6:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare sequential vs concurrent researcher_node wall time.
+
+Runs researcher_node against fake search and chat backends with fixed
+latencies, once with max_concurrency=1 (the sequential path) and once with
+the requested cap, and checks both runs produce identical state.
+
+    python benchmarks/researcher_concurrency.py --subtopics 5 --concurrency 8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from display import console  # noqa: E402
+from nodes import researcher  # noqa: E402
+from runscope import run_scope  # noqa: E402
+
+
+class FakeLLM:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, messages):
+        time.sleep(self.latency)
+        return SimpleNamespace(content=f"summary of {len(messages[-1]['content'])} chars")
+
+
+def fake_search(latency: float, pages: int):
+    def search(query: str, **kwargs) -> list[dict]:
+        time.sleep(latency)
+        return [
+            {
+                "url": f"https://example.com/{abs(hash(query))}/{i}",
+                "title": f"{query} #{i}",
+                "raw_content": f"{query} page {i} " * 200,
+            }
+            for i in range(pages)
+        ]
+    return search
+
+
+def run(subtopics: list[str], concurrency: int, args) -> tuple[float, dict]:
+    llm = FakeLLM(args.llm_latency)
+    config = {"max_concurrency": concurrency}
+    with (
+        run_scope(),
+        mock.patch.object(researcher, "get_llm", return_value=llm),
+        mock.patch.object(researcher, "get_agent_config", return_value=config),
+        mock.patch.object(
+            researcher, "tavily_search", fake_search(args.search_latency, args.pages),
+        ),
+    ):
+        start = time.perf_counter()
+        result = researcher.researcher_node({"subtopics": subtopics})
+        return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subtopics", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    subtopics = [f"subtopic {i}" for i in range(1, args.subtopics + 1)]
+
+    with console.capture():
+        sequential, seq_result = run(subtopics, 1, args)
+        concurrent, conc_result = run(subtopics, args.concurrency, args)
+
+    console.print(f"sequential   (max_concurrency=1): {sequential:.2f}s")
+    console.print(f"concurrent   (max_concurrency={args.concurrency}): {concurrent:.2f}s")
+    console.print(f"speedup: {sequential / concurrent:.1f}x")
+    console.print(f"identical output: {seq_result == conc_result}")
+
+
+if __name__ == "__main__":
+    main()
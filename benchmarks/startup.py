@@ -0,0 +1,99 @@
+"""Benchmark CLI startup time.
+
+Times each startup path in a fresh interpreter (median of --runs) and, with
+`python -X importtime`, lists the imports that dominate `import main` and
+`import graph`. Results are appended to benchmarks/results/startup.jsonl
+tagged with the current commit, so regressions show up in the history;
+nothing is saved from a working tree with uncommitted changes.
+
+    python benchmarks/startup.py --runs 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from history import save_result
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_FILE = ROOT / "benchmarks" / "results" / "startup.jsonl"
+
+COMMANDS = {
+    "--version": [sys.executable, "main.py", "--version"],
+    "--check-config": [sys.executable, "main.py", "--check-config"],
+    "import main": [sys.executable, "-c", "import main"],
+    "build graph": [sys.executable, "-c", "from graph import get_app; get_app()"],
+}
+
+
+def time_command(cmd: list[str], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def import_profile(module: str, top: int) -> tuple[float, list[tuple[str, float]]]:
+    """Total import time of `module` and its slowest top-level imports, in ms."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    total = 0.0
+    direct = []
+    # Children are printed before their parent, one extra indent level deeper
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        ms = int(cumulative) / 1000
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            direct.append((name.strip(), ms))
+        elif depth == 0:
+            if name.strip() == module:
+                total = ms
+                break
+            direct = []
+    direct.sort(key=lambda item: -item[1])
+    return total, direct[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest direct imports to list per module")
+    parser.add_argument("--no-save", action="store_true", help="don't append to the results file")
+    args = parser.parse_args()
+
+    print(f"{'path':<16} {'median':>10}")
+    timings = {}
+    for name, cmd in COMMANDS.items():
+        timings[name] = time_command(cmd, args.runs)
+        print(f"{name:<16} {timings[name] * 1000:>8.0f}ms")
+
+    imports = {}
+    for module in ("main", "graph"):
+        total, slowest = import_profile(module, args.top)
+        imports[module] = {"total_ms": round(total, 1), "slowest": dict(slowest)}
+        print(f"\nimport {module}: {total:.0f}ms")
+        for name, ms in slowest:
+            print(f"  {name:<30} {ms:>8.0f}ms")
+
+    if not args.no_save:
+        save_result(RESULTS_FILE, {
+            "runs": args.runs,
+            "median_ms": {name: round(t * 1000, 1) for name, t in timings.items()},
+            "imports": imports,
+        })
+
+
+if __name__ == "__main__":
+    main()
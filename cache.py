@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_PATH = Path(__file__).parent / ".cache" / "spectra.sqlite"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+def make_key(payload) -> str:
+    """Content-address a JSON-serializable payload."""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """SQLite key/value store with per-entry TTL and size-based LRU eviction.
+
+    Each namespace is its own table, and `max_bytes` bounds the total size of
+    the values stored in it. The connection is opened on first use and shared
+    between threads behind a lock.
+    """
+
+    def __init__(self, namespace: str, path: Path = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.namespace = namespace
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.namespace}" ('
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{self.namespace}_accessed" '
+                f'ON "{self.namespace}" (accessed_at)'
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        """Return the stored value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                f'SELECT value, expires_at FROM "{self.namespace}" WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute(f'DELETE FROM "{self.namespace}" WHERE key = ?', (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute(
+                f'UPDATE "{self.namespace}" SET accessed_at = ? WHERE key = ?', (now, key)
+            )
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl_seconds: float = CACHE_TTL_SECONDS):
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{self.namespace}" '
+                "(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now + ttl_seconds, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute(f'DELETE FROM "{self.namespace}" WHERE expires_at < ?', (now,))
+        total = conn.execute(f'SELECT COALESCE(SUM(size), 0) FROM "{self.namespace}"').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Least recently used first
+        stale = []
+        for key, size in conn.execute(
+            f'SELECT key, size FROM "{self.namespace}" ORDER BY accessed_at'
+        ):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany(f'DELETE FROM "{self.namespace}" WHERE key = ?', stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            entries, size = conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM "{self.namespace}"'
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
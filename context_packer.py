@@ -0,0 +1,303 @@
+from functools import lru_cache
+
+from display import display_packing
+from models_config import get_agent_config
+from prompts import get_template
+from ranking import estimate_tokens
+
+# Share of the input budget each section starts with; unused budget is
+# handed to the sections that need more.
+DEFAULT_SHARES = {"context": 0.4, "transcript": 0.45, "sources": 0.15}
+
+TRIM_MARKER = " […]"
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str):
+    """tiktoken encoding for `model`, or None to fall back to the char estimate.
+
+    Non-OpenAI models use cl100k_base as an approximation. tiktoken downloads
+    encodings on first use, so being offline also means falling back.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Keep the first `max_tokens` tokens of `text`, marking the cut."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4] + TRIM_MARKER
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + TRIM_MARKER
+
+
+# ── Section formatting ──
+# Memoized per style: a node formats every argument once for the full
+# transcript and again when packing it, and later moderator passes (gap
+# loop) and publisher reruns format the earlier rounds again. The moderator
+# and publisher styles differ, so the two nodes don't share entries.
+
+
+@lru_cache(maxsize=1024)
+def _format_argument(
+    style: str,
+    agent: str,
+    role: str,
+    confidence: float,
+    text: str,
+    evidence: tuple[tuple[str, str], ...],
+    unresolved: tuple[str, ...],
+) -> tuple[str, str, str]:
+    """Return (header, text, details) for one argument.
+
+    `style` is "moderator" (evidence plus open questions) or "publisher"
+    (evidence quoted for citation). Only the text part is ever trimmed.
+    """
+    header = f"\n**{agent}** ({role})"
+    if confidence:
+        header += f" [confidence: {confidence:.1f}]"
+
+    details = []
+    if evidence:
+        if style == "publisher":
+            details.append("\nCitable evidence:")
+            details.extend(f"  - \"{claim}\" — Fonte: {source}" for claim, source in evidence)
+        else:
+            details.append("\nStructured evidence:")
+            details.extend(f"  - {claim} (Fonte: {source})" for claim, source in evidence)
+    if unresolved and style != "publisher":
+        details.append("\nOpen questions:")
+        details.extend(f"  - {q}" for q in unresolved)
+
+    return f"{header}:\n", text, "\n\n".join(details)
+
+
+def _argument_parts(arg: dict, style: str) -> tuple[str, str, str]:
+    return _format_argument(
+        style,
+        arg["agent"],
+        arg["role"],
+        arg.get("confidence") or 0.0,
+        arg["text"],
+        tuple((e["claim"], e["source"]) for e in arg.get("evidence", [])),
+        tuple(arg.get("unresolved_questions", [])),
+    )
+
+
+def _join_argument(header: str, text: str, details: str) -> str:
+    return f"{header}{text}\n\n{details}" if details else f"{header}{text}"
+
+
+def format_debate_transcript(debate_rounds: list[dict], style: str) -> str:
+    """Full, untrimmed debate transcript."""
+    parts = []
+    for dr in debate_rounds:
+        parts.append(f"### Round {dr['round_num']}")
+        parts.extend(_join_argument(*_argument_parts(arg, style)) for arg in dr["arguments"])
+    return "\n\n".join(parts)
+
+
+def format_sources(sources: dict[str, dict]) -> list[str]:
+    """One Markdown link per registry entry, in the order they were found."""
+    return [f"- [{s['title']}]({s['url']})" for s in sources.values()]
+
+
+def _cited_source_ids(debate_rounds: list[dict]) -> set[str]:
+    return {
+        e["source_id"]
+        for dr in debate_rounds
+        for arg in dr["arguments"]
+        for e in arg.get("evidence", [])
+        if e.get("source_id")
+    }
+
+
+# ── Budgeting ──
+
+
+def _water_fill(needs: list[int], budget: int) -> list[int]:
+    """Split `budget` so small needs are met in full and large ones share the rest equally."""
+    allocation = [0] * len(needs)
+    remaining = budget
+    pending = sorted(range(len(needs)), key=lambda i: needs[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if needs[i] <= share:
+            allocation[i] = needs[i]
+            remaining -= needs[i]
+            pending.pop(0)
+        else:
+            for j in pending:
+                allocation[j] = share
+            break
+    return allocation
+
+
+def _section_budgets(needs: dict[str, int], shares: dict[str, float], total: int) -> dict[str, int]:
+    weight = sum(shares[name] for name in needs) or 1.0
+    budgets = {name: int(total * shares[name] / weight) for name in needs}
+    surplus = sum(max(0, budgets[n] - needs[n]) for n in needs)
+    over = [n for n in needs if needs[n] > budgets[n]]
+    over_weight = sum(shares[n] for n in over) or 1.0
+    for name in needs:
+        if name in over:
+            budgets[name] += int(surplus * shares[name] / over_weight)
+        else:
+            budgets[name] = needs[name]
+    return budgets
+
+
+def _pack_context(search_results: list[dict], budget: int, model: str, decisions: list[str]) -> str:
+    sections = [(f"## {r['query']}\n", r["summary"]) for r in search_results]
+    fixed = sum(count_tokens(h, model) for h, _ in sections)
+    needs = [count_tokens(body, model) for _, body in sections]
+    allocation = _water_fill(needs, max(budget - fixed, 0))
+
+    parts = []
+    for (heading, body), need, allowed in zip(sections, needs, allocation):
+        if allowed < need:
+            body = truncate_tokens(body, allowed, model)
+        parts.append(heading + body)
+
+    trimmed = sum(1 for need, allowed in zip(needs, allocation) if allowed < need)
+    if trimmed:
+        decisions.append(f"context: trimmed {trimmed}/{len(sections)} subtopic summaries to fit {budget:,} tokens")
+    return "\n\n".join(parts)
+
+
+def _pack_transcript(debate_rounds: list[dict], style: str, budget: int, model: str, decisions: list[str]) -> str:
+    rounds = []
+    for dr in debate_rounds:
+        rounds.append([_argument_parts(arg, style) for arg in dr["arguments"]])
+
+    round_needs = [
+        sum(count_tokens(_join_argument(*parts), model) for parts in arguments)
+        for arguments in rounds
+    ]
+    round_budgets = _water_fill(round_needs, budget)
+
+    out = []
+    for dr, arguments, need, round_budget in zip(debate_rounds, rounds, round_needs, round_budgets):
+        out.append(f"### Round {dr['round_num']}")
+        if need <= round_budget:
+            out.extend(_join_argument(*parts) for parts in arguments)
+            continue
+
+        # Headers, evidence and open questions are kept; argument texts share the rest
+        fixed = sum(count_tokens(h, model) + count_tokens(d, model) for h, _, d in arguments)
+        text_needs = [count_tokens(t, model) for _, t, _ in arguments]
+        allocation = _water_fill(text_needs, max(round_budget - fixed, 0))
+        for (header, text, details), text_need, allowed in zip(arguments, text_needs, allocation):
+            if allowed < text_need:
+                text = truncate_tokens(text, allowed, model)
+            out.append(_join_argument(header, text, details))
+        decisions.append(
+            f"transcript round {dr['round_num']}: trimmed argument text "
+            f"({need:,} → ~{round_budget:,} tokens)"
+        )
+    return "\n\n".join(out)
+
+
+def _pack_sources(lines: list[str], cited: list[bool], budget: int, model: str, decisions: list[str]) -> str:
+    # Sources the debate actually cites go first; the rest fill what is left
+    ranked = sorted(range(len(lines)), key=lambda i: not cited[i])
+    kept = []
+    used = 0
+    for i in ranked:
+        cost = count_tokens(lines[i], model) + 1
+        if used + cost > budget:
+            continue
+        kept.append(i)
+        used += cost
+    if len(kept) < len(lines):
+        decisions.append(f"sources: kept {len(kept)}/{len(lines)} (cited first) to fit {budget:,} tokens")
+    return "\n".join(lines[i] for i in sorted(kept))
+
+
+def pack_sections(
+    agent_name: str,
+    *,
+    search_results: list[dict] | None = None,
+    debate_rounds: list[dict] | None = None,
+    sources: dict[str, dict] | None = None,
+    style: str = "moderator",
+    prompt: str | None = None,
+) -> dict[str, str]:
+    """Format the prompt sections for `agent_name` within its input budget.
+
+    The budget comes from `context_budget` in models.json:
+    `max_input_tokens` for the packed sections plus optional per-section
+    shares. When `prompt` names the template the sections go into, its own
+    text is counted against the budget too. Without a budget, sections are
+    returned untrimmed. Only the sections passed in are returned: "context",
+    "transcript" and/or "sources".
+    """
+    agent_config = get_agent_config(agent_name)
+    model = agent_config["model"]
+    budget_config = agent_config.get("context_budget", {})
+    max_tokens = budget_config.get("max_input_tokens")
+    if max_tokens and prompt:
+        max_tokens = max(max_tokens - get_template(prompt).static_tokens(model), 0)
+
+    source_lines = format_sources(sources) if sources is not None else None
+
+    if not max_tokens:
+        packed = {}
+        if search_results is not None:
+            packed["context"] = "\n\n".join(f"## {r['query']}\n{r['summary']}" for r in search_results)
+        if debate_rounds is not None:
+            packed["transcript"] = format_debate_transcript(debate_rounds, style)
+        if source_lines is not None:
+            packed["sources"] = "\n".join(source_lines)
+        return packed
+
+    transcript = format_debate_transcript(debate_rounds, style) if debate_rounds is not None else None
+    needs = {}
+    if search_results is not None:
+        needs["context"] = sum(count_tokens(f"## {r['query']}\n{r['summary']}", model) for r in search_results)
+    if transcript is not None:
+        needs["transcript"] = count_tokens(transcript, model)
+    if source_lines is not None:
+        needs["sources"] = sum(count_tokens(line, model) + 1 for line in source_lines)
+
+    shares = {**DEFAULT_SHARES, **{k: v for k, v in budget_config.items() if k in DEFAULT_SHARES}}
+    budgets = _section_budgets(needs, shares, max_tokens)
+
+    decisions: list[str] = []
+    packed = {}
+    if "context" in needs:
+        packed["context"] = _pack_context(search_results, budgets["context"], model, decisions)
+    if "transcript" in needs:
+        if needs["transcript"] <= budgets["transcript"]:
+            packed["transcript"] = transcript
+        else:
+            packed["transcript"] = _pack_transcript(debate_rounds, style, budgets["transcript"], model, decisions)
+    if "sources" in needs:
+        # Cited by id through evidence, or by title anywhere in the transcript
+        cited_ids = _cited_source_ids(debate_rounds or [])
+        cited = [s["id"] in cited_ids or s["title"] in (transcript or "") for s in sources.values()]
+        packed["sources"] = _pack_sources(source_lines, cited, budgets["sources"], model, decisions)
+
+    if decisions:
+        display_packing(agent_name, sum(needs.values()), max_tokens, decisions)
+    return packed
@@ -0,0 +1,100 @@
+from itertools import combinations
+
+from similarity import jaccard, tokenize
+
+# Overridable in the "debate" entry of models.json
+DEBATE_DEFAULTS = {
+    "min_rounds": 1,
+    "max_rounds": 2,
+    "settled_confidence": 0.8,
+    "stable_similarity": 0.6,
+    "repeated_questions": 0.5,
+    "agreement_similarity": 0.4,
+    "shared_questions": 0.5,
+}
+
+# Two questions are the same question at this word overlap
+QUESTION_MATCH = 0.5
+
+STATUSES = ("disputed", "agreed", "settled", "stalled")
+
+
+def round_statuses(arguments: list[dict], history: dict[str, dict], config: dict) -> dict[str, str]:
+    """Status of each debater after a round, keyed by agent name.
+
+    "agreed" for everyone when the round's arguments already agree with each
+    other (see `debaters_agree`); otherwise each debater's own status from
+    `debater_status`, with `history` holding its previous argument.
+    """
+    if debaters_agree(arguments, config):
+        return {arg["agent"]: "agreed" for arg in arguments}
+    return {
+        arg["agent"]: debater_status(
+            arg, history.get(arg["agent"]), [other for other in arguments if other is not arg], config
+        )
+        for arg in arguments
+    }
+
+
+def debaters_agree(arguments: list[dict], config: dict) -> bool:
+    """Whether the debaters are making the same case and asking the same questions.
+
+    The main arguments must overlap by at least `agreement_similarity` (mean
+    pairwise word Jaccard), and at least `shared_questions` of the open
+    questions must be raised by more than one debater.
+    """
+    if len(arguments) < 2:
+        return False
+    pairs = list(combinations([tokenize(arg["main_argument"]) for arg in arguments], 2))
+    similarity = sum(jaccard(a, b) for a, b in pairs) / len(pairs)
+    if similarity < config["agreement_similarity"]:
+        return False
+    questions = [q for arg in arguments for q in arg.get("unresolved_questions", [])]
+    if not questions:
+        return True
+    shared = 0.0
+    for arg in arguments:
+        own = arg.get("unresolved_questions", [])
+        shared += repeated_share(own, _questions_of(arguments, arg)) * len(own)
+    return shared / len(questions) >= config["shared_questions"]
+
+
+def debater_status(argument: dict, previous: dict | None, others: list[dict], config: dict) -> str:
+    """Whether a debater's position still needs another round after `argument`.
+
+    "settled": confidence of at least `settled_confidence`, and every open
+    question is one another debater raised too, so it's an acknowledged gap
+    rather than a point of contention.
+    "stalled": compared with its `previous` argument, the text barely changed
+    (word Jaccard of at least `stable_similarity`) and at least
+    `repeated_questions` of its open questions were already asked, so another
+    rebuttal is unlikely to move it.
+    "disputed": anything else.
+    """
+    questions = argument.get("unresolved_questions", [])
+    raised_by_others = [q for other in others for q in other.get("unresolved_questions", [])]
+    if argument.get("confidence", 0.0) >= config["settled_confidence"] and repeated_share(questions, raised_by_others) == 1.0:
+        return "settled"
+    if previous is not None:
+        similarity = jaccard(tokenize(argument["main_argument"]), tokenize(previous["main_argument"]))
+        if similarity >= config["stable_similarity"] and (
+            repeated_share(questions, previous.get("unresolved_questions", [])) >= config["repeated_questions"]
+        ):
+            return "stalled"
+    return "disputed"
+
+
+def repeated_share(questions: list[str], earlier: list[str]) -> float:
+    """Share of `questions` that repeat one of `earlier` (1.0 when there are none)."""
+    if not questions:
+        return 1.0
+    earlier_words = [tokenize(q) for q in earlier]
+    repeated = sum(
+        any(jaccard(tokenize(q), words) >= QUESTION_MATCH for words in earlier_words)
+        for q in questions
+    )
+    return repeated / len(questions)
+
+
+def _questions_of(arguments: list[dict], exclude: dict) -> list[str]:
+    return [q for arg in arguments if arg is not exclude for q in arg.get("unresolved_questions", [])]
@@ -0,0 +1,96 @@
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import add_schedule, bind
+
+
+class Dataflow:
+    """Run tasks as soon as the tasks they depend on have finished.
+
+    `add(name, fn, after=...)` registers a task; `fn` is called with the
+    results of its dependencies as a dict in `after` order. Dependencies must
+    be added first, so the graph can't have cycles. Tasks may also be added
+    while running, from `on_done`, once a result decides what runs next.
+    `run()` returns every result by name and, when tracing, records each
+    task's span and the critical path: the chain of tasks that determined the
+    total time.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._tasks: dict[str, tuple[Callable, tuple[str, ...], dict]] = {}
+
+    def add(self, name: str, fn: Callable[[dict], object], after=(), **fields):
+        """Register a task; `fields` (e.g. round, agent) are copied onto its trace span."""
+        if name in self._tasks:
+            raise ValueError(f"duplicate task {name!r}")
+        unknown = [dep for dep in after if dep not in self._tasks]
+        if unknown:
+            raise ValueError(f"{name!r} depends on unknown tasks {unknown}")
+        self._tasks[name] = (fn, tuple(after), fields)
+
+    def run(self, on_done: Callable[[str, object], None] | None = None) -> dict[str, object]:
+        """Run every task; `on_done(name, result)` is called in this thread as each finishes.
+
+        The first task to raise stops further tasks from starting and its
+        exception is re-raised once the running ones have finished.
+        """
+        results: dict[str, object] = {}
+        spans: dict[str, dict] = {}  # started tasks
+        running = {}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as pool:
+            try:
+                while len(spans) < len(self._tasks) or running:
+                    for name, (fn, after, fields) in list(self._tasks.items()):
+                        if name not in spans and all(dep in results for dep in after):
+                            inputs = {dep: results[dep] for dep in after}
+                            spans[name] = {"task": name, **fields, "after": list(after), "ready": _since(start)}
+                            running[pool.submit(bind(_timed), fn, inputs, start)] = name
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        result, started, finished = future.result()
+                        spans[name].update(start=started, end=finished)
+                        results[name] = result
+                        if on_done:
+                            on_done(name, result)
+            except BaseException:
+                # Running tasks finish; queued ones never start
+                pool.shutdown(cancel_futures=True)
+                raise
+
+        spans = list(spans.values())
+        add_schedule(self.name, spans, critical_path(spans))
+        return results
+
+
+def critical_path(spans: list[dict]) -> list[str]:
+    """Names of the tasks on the critical path, in execution order.
+
+    Starts at the task that finished last and repeatedly steps back to the
+    dependency that finished last, i.e. the one the task was waiting for.
+    """
+    by_name = {span["task"]: span for span in spans if "end" in span}
+    if not by_name:
+        return []
+    current = max(by_name.values(), key=lambda span: span["end"])
+    path = [current["task"]]
+    while current["after"]:
+        current = max((by_name[dep] for dep in current["after"]), key=lambda span: span["end"])
+        path.append(current["task"])
+    return path[::-1]
+
+
+def _timed(fn: Callable, inputs: dict, start: float) -> tuple[object, float, float]:
+    started = _since(start)
+    result = fn(inputs)
+    return result, started, _since(start)
+
+
+def _since(start: float) -> float:
+    return round(time.perf_counter() - start, 4)
@@ -1,3 +1,5 @@
+from urllib.parse import urlparse
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
@@ -5,6 +7,9 @@ from rich.text import Text
 
 console = Console()
 
+# Batch progress goes to stderr so it stays visible while node output is silenced
+status_console = Console(stderr=True)
+
 ROLE_COLORS = {
     "advocate": "green",
     "critic": "red",
@@ -59,8 +64,8 @@ def display_perspectives(perspectives: list[dict]):
     console.print(table)
 
 
-def display_search_progress(query: str, index: int, total: int):
-    console.print(f"  [dim]🔍 [{index}/{total}][/dim] Searching: [italic]{query}[/italic]")
+def display_search_progress(query: str, done: int, total: int, results: int):
+    console.print(f"  [dim]🔍 [{done}/{total}][/dim] Searched: [italic]{query}[/italic] [dim]({results} results)[/dim]")
 
 
 def display_search_done(total_sources: int):
@@ -84,6 +89,39 @@ def display_debate_argument(agent: str, role: str, text: str, round_num: int):
     )
 
 
+def display_debate_convergence(round_num: int, statuses: dict[str, str], continuing: list[str]):
+    counts = ", ".join(
+        f"{sum(status == s for status in statuses.values())} {s}"
+        for s in ("disputed", "agreed", "settled", "stalled") if s in statuses.values()
+    )
+    if continuing:
+        console.print(f"  [dim]⚖ After round {round_num}: {counts} → round {round_num + 1} with {', '.join(continuing)}[/dim]")
+    else:
+        console.print(f"  [dim]⚖ After round {round_num}: {counts} → debate converged[/dim]")
+
+
+def display_debate_savings(rebuttals: int, llm_calls: int, searches: int):
+    console.print(
+        f"  [dim]Adaptive rounds: {rebuttals} rebuttals skipped, "
+        f"~{llm_calls} LLM calls and {searches} searches saved[/dim]"
+    )
+
+
+def display_debater_preview(agent: str, main_argument: str, round_num: int):
+    preview = " ".join(main_argument.split())
+    if len(preview) > 100:
+        preview = preview[:100] + "…"
+    console.print(f"  [dim]✎ {agent} (Round {round_num}): {preview}[/dim]")
+
+
+def display_structured_retry(agent: str, error: str):
+    console.print(f"  [yellow]↻ {agent}: unusable JSON reply, asking again[/yellow] [dim]({error[:160]})[/dim]")
+
+
+def display_structured_fallback(agent: str, error: str):
+    console.print(f"  [yellow]⚠ {agent}: no valid JSON after retrying, using the reply as plain text[/yellow] [dim]({error[:160]})[/dim]")
+
+
 def display_synthesis(synthesis: dict):
     if synthesis.get("consensus"):
         console.print("\n  [bold green]Consensus:[/bold green]")
@@ -134,7 +172,8 @@ def display_evaluation(evaluation: dict):
     console.print(table)
 
     avg_color = "green" if average >= 7 else "yellow" if average >= 5 else "red"
-    console.print(f"\n  [bold]Average:[/bold] [{avg_color}]{average:.1f}/10[/{avg_color}]")
+    method = " [dim](local pre-score, no LLM call)[/dim]" if evaluation.get("method") == "local" else ""
+    console.print(f"\n  [bold]Average:[/bold] [{avg_color}]{average:.1f}/10[/{avg_color}]{method}")
 
     if average < 7.0:
         console.print("  [yellow]↻ Insufficient quality — resending to Publisher with feedback[/yellow]")
@@ -150,3 +189,208 @@ def display_final_report_saved(path: str):
             border_style="green",
         )
     )
+
+
+def display_cache_stats(stats: dict[str, dict]):
+    table = Table(show_header=True, header_style="bold magenta", title="LLM Cache")
+    table.add_column("Agent", style="bold")
+    table.add_column("Hits", justify="right")
+    table.add_column("Misses", justify="right")
+    table.add_column("Saved time", justify="right")
+    table.add_column("Saved tokens", justify="right")
+
+    for agent, s in stats.items():
+        table.add_row(
+            agent,
+            str(s["hits"]),
+            str(s["misses"]),
+            f"{s['saved_seconds']:.1f}s",
+            str(s["saved_tokens"]),
+        )
+
+    console.print()
+    console.print(table)
+
+
+def display_endpoint_stats(stats: dict[str, dict]):
+    table = Table(show_header=True, header_style="bold magenta", title="Endpoints")
+    table.add_column("Endpoint", style="bold")
+    table.add_column("Calls", justify="right")
+    table.add_column("Retries", justify="right")
+    table.add_column("Throttled", justify="right")
+    table.add_column("Failed", justify="right")
+    table.add_column("Queue wait", justify="right")
+    table.add_column("Request time", justify="right")
+    table.add_column("Concurrency", justify="right")
+
+    for name, s in stats.items():
+        table.add_row(
+            urlparse(name).netloc or name,
+            str(s["calls"]),
+            str(s["retries"]),
+            str(s["throttled"]),
+            str(s["failures"]),
+            f"{s['queue_seconds']:.1f}s",
+            f"{s['request_seconds']:.1f}s",
+            "—" if s["concurrency"] is None else f"{s['concurrency']:g}",
+        )
+
+    console.print()
+    console.print(table)
+
+
+def display_trace_summary(summary: dict, files=None):
+    nodes = Table(show_header=True, header_style="bold magenta", title="Node Timings")
+    nodes.add_column("Node", style="bold")
+    nodes.add_column("Runs", justify="right")
+    nodes.add_column("Time", justify="right")
+    nodes.add_column("Share", justify="right")
+    wall = summary["wall_seconds"] or 1.0
+    for name, n in summary["nodes"].items():
+        nodes.add_row(name, str(n["runs"]), f"{n['seconds']:.2f}s", f"{n['seconds'] / wall:.0%}")
+
+    calls = Table(show_header=True, header_style="bold magenta", title="Calls by Agent")
+    calls.add_column("Agent", style="bold", no_wrap=True)
+    calls.add_column("Calls", justify="right")
+    calls.add_column("Hits", justify="right")
+    calls.add_column("Latency", justify="right")
+    calls.add_column("TTFT", justify="right")
+    calls.add_column("In", justify="right")
+    calls.add_column("Out", justify="right")
+    calls.add_column("Retry/Err", justify="right")
+    # Hits are calls served from a cache; latency and TTFT are per-call means.
+    # Queue wait per endpoint is in the Endpoints table.
+    for name, a in sorted(summary["agents"].items(), key=lambda item: -item[1]["latency"]):
+        calls.add_row(
+            name,
+            str(a["calls"]),
+            str(a["cache_hits"]),
+            f"{a['latency'] / a['calls']:.2f}s",
+            f"{a['ttft'] / a['calls']:.2f}s",
+            f"{a['input_tokens']:,}",
+            f"{a['output_tokens']:,}",
+            f"{a['retries']}/{a['errors']}",
+        )
+
+    console.print()
+    console.print(nodes)
+    console.print(calls)
+    console.print(
+        f"  [dim]Run {summary['run_id']}: {summary['wall_seconds']:.1f}s wall time, "
+        f"state peaked at {summary['peak_state_bytes'] / 1024:.1f} KB, "
+        f"{summary['update_bytes'] / 1024:.1f} KB of node updates[/dim]"
+    )
+    for critical in summary.get("critical_paths", []):
+        path = " → ".join(f"{step['task']} {step['seconds']:.2f}s" for step in critical["path"])
+        console.print(f"  [dim]Critical path ({critical['schedule']}, {critical['seconds']:.2f}s): {path}[/dim]")
+    if files:
+        console.print(f"  [dim]Trace: {files[0]}[/dim]")
+        console.print(f"  [dim]Metrics: {files[1]}[/dim]")
+
+
+def display_search_stats(stats: dict):
+    served = stats["memory_hits"] + stats["store_hits"] + stats["coalesced"]
+    console.print(
+        f"  [dim]Search: {stats['requests']} API requests, {served} served locally "
+        f"({stats['memory_hits']} memory, {stats['store_hits']} store, "
+        f"{stats['coalesced']} coalesced)[/dim]"
+    )
+
+
+def display_structured_stats(stats: dict):
+    if not stats["calls"]:
+        return
+    console.print(
+        f"  [dim]Structured output: {stats['calls']} calls, {stats['native']} in provider JSON mode"
+        + (f" ({stats['native_fallbacks']} rejected it)" if stats["native_fallbacks"] else "")
+        + f", {stats['repaired']} repaired locally, {stats['reasked']} re-asked, {stats['failed']} failed[/dim]"
+    )
+
+
+def display_extraction_stats(stats: dict):
+    console.print(
+        f"  [dim]Extraction: {stats['extractions']} LLM calls, {stats['calls_saved']} reused "
+        f"({stats['related_hits']} from related topics), {stats['llm_skipped']} answered locally, "
+        f"{stats['chars_saved']:,} input chars saved[/dim]"
+    )
+    if stats["extractions"]:
+        console.print(
+            f"  [dim]Batching: {stats['extractions']} pages in {stats['llm_requests']} requests "
+            f"({stats['extractions'] - stats['llm_requests']} fewer, "
+            f"{stats['batch_fallbacks']} batch fallbacks)[/dim]"
+        )
+    if stats["page_tokens"]:
+        console.print(
+            f"  [dim]Passage ranking: ~{stats['input_tokens']:,} of ~{stats['page_tokens']:,} "
+            f"page tokens sent to the LLM[/dim]"
+        )
+
+
+def display_report_chunk(text: str):
+    console.print(text, end="", markup=False, highlight=False, soft_wrap=True)
+
+
+def display_stream_stats(ttft: float, output_tokens: int, tokens_per_second: float):
+    console.print()
+    console.print(
+        f"\n  [dim]Time to first token: {ttft:.1f}s · "
+        f"{output_tokens} tokens · {tokens_per_second:.1f} tokens/s[/dim]"
+    )
+
+
+def display_covered_queries(covered: list[tuple[str, str]]):
+    for query, reason in covered:
+        console.print(f"  [dim]↷ Skipped: [italic]{query}[/italic] ({reason})[/dim]")
+
+
+def display_packing(agent: str, needed: int, budget: int, decisions: list[str]):
+    console.print(f"  [dim]✂ {agent}: {needed:,} tokens of context for a {budget:,}-token budget[/dim]")
+    for decision in decisions:
+        console.print(f"    [dim]· {decision}[/dim]")
+
+
+def display_prescore_agreement(local_average: float, band: str, agreement: dict):
+    sampled = f" (clear {band}, sampled for an LLM check)" if band != "borderline" else ""
+    bands = ", ".join(f"{name} {b['agreement']:.0%} of {b['runs']}" for name, b in agreement["bands"].items())
+    console.print(
+        f"  [dim]Local pre-score: {local_average:.1f}/10{sampled} · agrees with the LLM on pass/fail in "
+        f"{agreement['agreement']:.0%} of {agreement['runs']} runs, weighted "
+        f"(mean abs error {agreement['mean_abs_error']:.1f}; by band: {bands})[/dim]"
+    )
+
+
+def display_revision(sections: list[tuple[str, list[str]]], total: int):
+    console.print(f"  [yellow]↻ Revising {len(sections)} of {total} sections:[/yellow]")
+    for title, reasons in sections:
+        console.print(f"    [yellow]→[/yellow] {title} [dim]({', '.join(reasons)})[/dim]")
+
+
+def display_batch_start(total: int, workers: int, executor: str, output_dir: str):
+    status_console.print(
+        f"[bold]Batch:[/bold] {total} queries · {workers} {executor} workers · output in {output_dir}"
+    )
+
+
+def display_batch_run(done: int, total: int, run: dict):
+    mark = "[green]✓[/green]" if run["status"] == "ok" else "[red]✗[/red]"
+    detail = f"avg {run['average']:.1f}/10" if run.get("average") is not None else run.get("error", "")
+    status_console.print(
+        f"  {mark} [{done}/{total}] {run['id']} [dim]{run['seconds']:.1f}s · {detail}[/dim]"
+    )
+
+
+def display_batch_summary(summary: dict):
+    table = Table(show_header=True, header_style="bold magenta", title="Batch Summary")
+    table.add_column("Metric", style="bold")
+    table.add_column("Value", justify="right")
+    table.add_row("Queries", str(summary["total"]))
+    table.add_row("Succeeded", f"[green]{summary['succeeded']}[/green]")
+    table.add_row("Failed", f"[red]{summary['failed']}[/red]" if summary["failed"] else "0")
+    table.add_row("Wall time", f"{summary['wall_seconds']:.1f}s")
+    table.add_row("Throughput", f"{summary['queries_per_hour']:.1f} queries/h")
+    table.add_row("Run time (median / max)", f"{summary['median_run_seconds']:.1f}s / {summary['max_run_seconds']:.1f}s")
+
+    status_console.print()
+    status_console.print(table)
+    for run in summary["failures"]:
+        status_console.print(f"  [red]✗[/red] {run['id']}: {run['error']}")
@@ -0,0 +1,263 @@
+import hashlib
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from cache import DiskCache
+from models_config import get_agent_config
+from ranking import estimate_tokens, select_passages
+from runscope import scoped
+from similarity import jaccard, tokenize
+from structured import parse_json
+
+RELATED_TOPIC_THRESHOLD = 0.5
+SKIP_LLM_TOKENS = 400
+SKIP_LLM_COVERAGE = 0.8
+
+# Upper bound on the page text packed into one batched extraction request
+BATCH_INPUT_TOKENS = 12000
+
+BATCH_INSTRUCTIONS = (
+    "You will receive several web pages, each introduced by a [PAGE n] marker with its own "
+    "topic and source. Apply the instructions above to each page independently. "
+    "Respond with valid JSON only, no markdown formatting, no code fences, using this structure: "
+    '{"extractions": [{"page": 1, "content": "..."}, {"page": 2, "content": "..."}]} '
+    "with exactly one entry per page."
+)
+
+
+class ExtractionStore:
+    """Memoizes LLM page extractions by kind, URL, page content and topic.
+
+    Before a page reaches the LLM it is cut down locally to the passages that
+    best match the topic (BM25), within the caller's token budget. The LLM is
+    skipped and that excerpt used directly when it is no larger than
+    `skip_llm_tokens` and either the whole page is that small or the excerpt
+    contains at least `skip_llm_coverage` of the topic's words. A short
+    excerpt that only brushes the topic still goes to the LLM.
+
+    Entries are grouped by extraction kind (which prompt produced them, e.g.
+    "research" or "debate"), URL and a hash of the full page, so a page that
+    changed is extracted again and one prompt's output never stands in for
+    another's. Within a group an extraction is reused for the
+    same topic or, failing that, for the most similar topic whose word overlap
+    reaches `related_threshold`. With `persist`, groups are also written to the
+    local cache and survive across runs.
+    """
+
+    def __init__(
+        self,
+        related_threshold: float = RELATED_TOPIC_THRESHOLD,
+        skip_llm_tokens: int = SKIP_LLM_TOKENS,
+        skip_llm_coverage: float = SKIP_LLM_COVERAGE,
+        persist: bool = False,
+    ):
+        self.related_threshold = related_threshold
+        self.skip_llm_tokens = skip_llm_tokens
+        self.skip_llm_coverage = skip_llm_coverage
+        self.persist = persist
+        self._entries: dict[str, list[dict]] = {}
+        self._disk = DiskCache("extractions")
+        self._inflight: dict[tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "extractions": 0,
+            "calls_saved": 0,
+            "related_hits": 0,
+            "chars_saved": 0,
+            "llm_skipped": 0,
+            "page_tokens": 0,
+            "input_tokens": 0,
+            "llm_requests": 0,
+            "batch_fallbacks": 0,
+        }
+
+    def get_or_extract_many(
+        self,
+        pages: list[tuple[str, str, str]],
+        budget_tokens: int,
+        extract: Callable[[list[tuple[int, str]]], list[str]],
+        kind: str,
+    ) -> list[str]:
+        """Return an extraction for each (url, content, topic) page, made by the `kind` prompt.
+
+        Stored extractions are reused; the rest are cut down to their best
+        passages and, unless small enough to use as-is, handed to `extract` in
+        one call as (page index, excerpt) pairs. `extract` returns their texts
+        in the same order, so callers can batch them into fewer requests.
+        """
+        results: list[str | None] = [None] * len(pages)
+        waiting: dict[int, Future] = {}
+        owned: list[tuple[int, str, Future]] = []
+
+        with self._lock:
+            for i, (url, content, topic) in enumerate(pages):
+                group_key = f"{kind}:{url}#{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+                match = self._lookup(group_key, topic, tokenize(topic))
+                if match is not None:
+                    self.stats["calls_saved"] += 1
+                    self.stats["chars_saved"] += min(len(content), budget_tokens * 4)
+                    if match["topic"] != topic:
+                        self.stats["related_hits"] += 1
+                    results[i] = match["text"]
+                    continue
+
+                # Someone is already extracting this page for this topic: wait for it
+                future = self._inflight.get((group_key, topic))
+                if future is not None:
+                    self.stats["calls_saved"] += 1
+                    self.stats["chars_saved"] += min(len(content), budget_tokens * 4)
+                    waiting[i] = future
+                    continue
+                future = self._inflight[(group_key, topic)] = Future()
+                owned.append((i, group_key, future))
+
+        try:
+            to_extract = []
+            for i, group_key, future in owned:
+                url, content, topic = pages[i]
+                excerpt = select_passages(content, topic, budget_tokens)
+                if self._usable_as_is(content, excerpt, topic):
+                    self._save(group_key, pages[i], excerpt, future, excerpt_tokens=None)
+                    results[i] = excerpt
+                else:
+                    to_extract.append((i, excerpt, group_key, future))
+
+            if to_extract:
+                texts = extract([(i, excerpt) for i, excerpt, _, _ in to_extract])
+                for (i, excerpt, group_key, future), text in zip(to_extract, texts):
+                    self._save(group_key, pages[i], text, future, excerpt_tokens=estimate_tokens(excerpt))
+                    results[i] = text
+        except Exception as e:
+            for _, _, future in owned:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                for i, group_key, _ in owned:
+                    self._inflight.pop((group_key, pages[i][2]), None)
+
+        for i, future in waiting.items():
+            results[i] = future.result()
+        return results
+
+    def _usable_as_is(self, content: str, excerpt: str, topic: str) -> bool:
+        if estimate_tokens(excerpt) > self.skip_llm_tokens:
+            return False
+        if estimate_tokens(content) <= self.skip_llm_tokens:
+            return True
+        topic_words = tokenize(topic)
+        return bool(topic_words) and len(topic_words & tokenize(excerpt)) / len(topic_words) >= self.skip_llm_coverage
+
+    def request_extractions(self, llm, system_prompt: str, blocks: list[str], batch_size: int) -> list[str]:
+        """Run extraction prompts for rendered page blocks, several per request.
+
+        Up to `batch_size` blocks (and BATCH_INPUT_TOKENS) share one request
+        that asks for a JSON list of per-page outputs. Pages of a batch whose
+        output can't be parsed are retried one request each.
+        """
+        batches: list[list[int]] = []
+        batch_tokens = 0
+        for i, block in enumerate(blocks):
+            tokens = estimate_tokens(block)
+            if not batches or len(batches[-1]) >= batch_size or batch_tokens + tokens > BATCH_INPUT_TOKENS:
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(i)
+            batch_tokens += tokens
+
+        texts: list[str] = [""] * len(blocks)
+        for batch in batches:
+            outputs = self._request_batch(llm, system_prompt, [blocks[i] for i in batch]) if len(batch) > 1 else {}
+            for n, i in enumerate(batch, 1):
+                if n in outputs:
+                    texts[i] = outputs[n]
+                else:
+                    texts[i] = self._request_one(llm, system_prompt, blocks[i])
+        return texts
+
+    def _request_one(self, llm, system_prompt: str, block: str) -> str:
+        response = llm.invoke([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": block},
+        ])
+        with self._lock:
+            self.stats["llm_requests"] += 1
+        return response.content
+
+    def _request_batch(self, llm, system_prompt: str, blocks: list[str]) -> dict[int, str]:
+        """One request for several pages; returns {page number: text} for the pages it parsed."""
+        response = llm.invoke([
+            {"role": "system", "content": f"{system_prompt}\n\n{BATCH_INSTRUCTIONS}"},
+            {"role": "user", "content": "\n\n".join(f"[PAGE {n}]\n{block}" for n, block in enumerate(blocks, 1))},
+        ])
+        with self._lock:
+            self.stats["llm_requests"] += 1
+
+        try:
+            data = parse_json(response.content)
+            return {
+                int(e["page"]): e["content"]
+                for e in data["extractions"]
+                if isinstance(e.get("content"), str) and 1 <= int(e["page"]) <= len(blocks)
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            with self._lock:
+                self.stats["batch_fallbacks"] += 1
+            return {}
+
+    def _save(self, group_key: str, page: tuple[str, str, str], text: str, future: Future, excerpt_tokens: int | None):
+        with self._lock:
+            entries = self._entries.setdefault(group_key, [])
+            entries.append({"topic": page[2], "text": text})
+            self.stats["page_tokens"] += estimate_tokens(page[1])
+            if excerpt_tokens is None:
+                self.stats["llm_skipped"] += 1
+            else:
+                self.stats["extractions"] += 1
+                self.stats["input_tokens"] += excerpt_tokens
+            if self.persist:
+                self._disk.set(group_key, entries)
+        future.set_result(text)
+
+    def _lookup(self, group_key: str, topic: str, topic_tokens: set[str]) -> dict | None:
+        entries = self._entries.get(group_key)
+        if entries is None and self.persist:
+            entries = self._disk.get(group_key)
+            if entries is not None:
+                self._entries[group_key] = entries
+        if not entries:
+            return None
+
+        best, best_score = None, 0.0
+        for entry in entries:
+            if entry["topic"] == topic:
+                return entry
+            score = jaccard(topic_tokens, tokenize(entry["topic"]))
+            if score > best_score:
+                best, best_score = entry, score
+        return best if best_score >= self.related_threshold else None
+
+    def reset(self):
+        """Start a new run: forget in-memory entries and extractions in flight, and zero the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+
+
+def _build_store() -> ExtractionStore:
+    config = get_agent_config("extraction")
+    return ExtractionStore(
+        related_threshold=config.get("related_topic_threshold", RELATED_TOPIC_THRESHOLD),
+        skip_llm_tokens=config.get("skip_llm_tokens", SKIP_LLM_TOKENS),
+        skip_llm_coverage=config.get("skip_llm_coverage", SKIP_LLM_COVERAGE),
+        persist=config.get("persist", False),
+    )
+
+
+def get_extraction_store() -> ExtractionStore:
+    """The current run's store (see runscope), so concurrent runs never share entries or counters."""
+    return scoped("extraction_store", _build_store)
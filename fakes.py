@@ -0,0 +1,280 @@
+"""Stub LLM and search backends for running the graph fully offline.
+
+`install()` routes `get_llm` and `tavily_search` to these stubs. Responses are
+deterministic, shaped like what each node's prompt asks for, and carry enough
+numbers, dates and citations for the report to pass the evaluator. Latencies
+can follow a distribution (see `latency_sampler`), and the scenario options of
+`install()` control the plan size, the gap loop and the evaluator rerun.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from ranking import estimate_tokens
+
+_LINK_RE = re.compile(r"\[([^\]]+)\]\s?\((https?://[^)\s]+)\)")
+_QUERY_RE = re.compile(r'(?:query|topic):\s*"?([^"\n]+)"?', re.IGNORECASE)
+
+PERSPECTIVES = [
+    ("Advocate", "advocate", "Argue in favor, stressing benefits and opportunities."),
+    ("Critic", "critic", "Argue against, stressing risks and costs."),
+    ("Analyst", "analyst", "Question the sources and the quality of the evidence."),
+    ("Economist", "economist", "Weigh the costs, prices and distributional effects."),
+    ("Regulator", "regulator", "Focus on rules, enforcement and compliance."),
+    ("Practitioner", "practitioner", "Describe what happens on the ground."),
+]
+
+SUBTOPIC_ASPECTS = ["evidence", "economics", "risks", "history", "regulation", "adoption", "outlook", "equity"]
+
+# Worded apart from the subtopics so the researcher doesn't skip them as covered
+GAP_ASPECTS = ["long-term outcomes", "regional differences", "cost estimates", "minority groups"]
+
+# Scenario options, set by install()
+DEFAULT_OPTIONS = {
+    "subtopics": 3,
+    "perspectives": 3,
+    "gap_queries": 0,
+    "fail_first_evaluation": False,
+    "output_paragraphs": 1,
+    "page_paragraphs": 6,
+}
+
+_options = dict(DEFAULT_OPTIONS)
+_evaluations: Counter = Counter()
+_evaluations_lock = threading.Lock()
+
+
+def latency_sampler(spec: float | str):
+    """Latency function from a spec: seconds ("0.2"), "uniform:LOW:HIGH" or
+    "lognormal:MEDIAN:SIGMA".
+
+    The returned function maps a key (the prompt or query) to seconds. Draws
+    are seeded by the key, so a run gets the same latencies whatever order
+    its calls are made in.
+    """
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        seconds = float(kind)
+        return lambda key: seconds
+    a, b = (float(x) for x in params.split(":"))
+    if kind == "uniform":
+        return lambda key: _rng(key).uniform(a, b)
+    if kind == "lognormal":
+        return lambda key: a * _rng(key).lognormvariate(0.0, b)
+    raise ValueError(f"unknown latency distribution: {kind}")
+
+
+class FakeChatModel:
+    """Chat model stub answering each Spectra prompt with a canned, valid response.
+
+    `latency` (seconds or a `latency_sampler` spec) is spent per call;
+    streamed responses are split into word chunks with the same total latency.
+    """
+
+    def __init__(self, agent_name: str = "", latency: float | str = 0.0):
+        self.agent_name = agent_name
+        self.latency = latency_sampler(latency)
+
+    def invoke(self, messages, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        content = self._respond(messages)
+        time.sleep(self.latency(_latency_key(messages)))
+        return AIMessage(content=content, usage_metadata=_usage(messages, content))
+
+    def stream(self, messages, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        content = self._respond(messages)
+        latency = self.latency(_latency_key(messages))
+        words = re.split(r"(?<=\s)", content)
+        for i, word in enumerate(words):
+            time.sleep(latency / len(words))
+            usage = _usage(messages, content) if i == len(words) - 1 else None
+            yield AIMessageChunk(content=word, usage_metadata=usage)
+
+    def _respond(self, messages) -> str:
+        system = _content(messages[0])
+        user = _content(messages[-1]) if len(messages) > 1 else ""
+        query = _find_query(user)
+
+        if "research planning expert" in system:
+            return json.dumps({
+                "subtopics": [
+                    f"{query} {SUBTOPIC_ASPECTS[i % len(SUBTOPIC_ASPECTS)]}" + (f" {i + 1}" if i >= len(SUBTOPIC_ASPECTS) else "")
+                    for i in range(_options["subtopics"])
+                ],
+                "perspectives": [
+                    {"name": name, "role": role, "system_prompt": prompt}
+                    for name, role, prompt in PERSPECTIVES[:_options["perspectives"]]
+                ],
+            })
+        if "quality evaluator" in system:
+            return self._evaluate(query)
+        if "debate moderator" in system:
+            gap_queries = [
+                f"{GAP_ASPECTS[i % len(GAP_ASPECTS)]} of {query.split()[-1]} {i + 1}" for i in range(_options["gap_queries"])
+            ]
+            return json.dumps({
+                "consensus": [f"The evidence on {query} is mixed but substantial."],
+                "conflicts": ["Advocate and Critic disagree on the size of the effect."],
+                "gaps": [f"Too little evidence on {q}" for q in gap_queries],
+                "gap_queries": gap_queries,
+            })
+        if "structured debate" in system:
+            titles = [title for title, _ in _LINK_RE.findall(user)] or ["Stub source"]
+            return json.dumps({
+                "main_argument": _paragraphs(query, system),
+                "evidence": [{"claim": f"{_number(query, i)}% change reported in {2015 + i}", "source": titles[i % len(titles)]} for i in range(2)],
+                "rebuttal_to": "Critic" if "rebuttal round" in system else "",  # prompts/debate_round2.xml
+                "confidence": 0.7,
+                "unresolved_questions": [f"How does {query} vary across regions?"],
+            })
+        if '"extractions"' in system:
+            pages = re.findall(r"^\[PAGE (\d+)\]", user, re.MULTILINE)
+            return json.dumps({"extractions": [
+                {"page": int(n), "content": _paragraphs(query, n)} for n in pages
+            ]})
+        if "revising one section" in system:
+            heading = re.search(r"^## .+$", user, re.MULTILINE)
+            title = heading.group(0) if heading else "## Revised Section"
+            return f"{title}\n\n{_paragraphs(query, title)} {_citations(user)}"
+        if "expert report writer" in system:
+            return _report(query, user)
+        if "search query" in system:
+            return f"{query} counter-evidence"
+        return _paragraphs(query, user[:200])
+
+    def _evaluate(self, query: str) -> str:
+        with _evaluations_lock:
+            _evaluations[query] += 1
+            first = _evaluations[query] == 1
+        if first and _options["fail_first_evaluation"]:
+            return json.dumps({
+                "scores": {"coverage": 6, "balance": 5, "citations": 6, "depth": 5},
+                "justifications": {d: "Stub evaluation." for d in ("coverage", "balance", "citations", "depth")},
+                "average": 5.5,
+                "feedback": "The Conclusion and the Counter-arguments and Risks sections need more data and citations.",
+            })
+        return json.dumps({
+            "scores": {"coverage": 8, "balance": 8, "citations": 8, "depth": 8},
+            "justifications": {d: "Stub evaluation." for d in ("coverage", "balance", "citations", "depth")},
+            "average": 8.0,
+            "feedback": "",
+        })
+
+
+def fake_search(query: str, max_results: int = 5, include_raw_content: str = "markdown",
+                latency: float | str = 0.0) -> list[dict]:
+    """Search stub returning `max_results` synthetic pages for `query`."""
+    time.sleep(latency_sampler(latency)(query))
+    digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+    results = []
+    for i in range(max_results):
+        body = "\n\n".join(_paragraph(query, f"{digest}-{i}-{p}") for p in range(_options["page_paragraphs"]))
+        results.append({
+            "url": f"https://example.com/{digest}/{i}",
+            "title": f"{query.title()} — source {i + 1}",
+            "content": body[:300],
+            "raw_content": body if include_raw_content else None,
+        })
+    return results
+
+
+def install(llm_latency: float | str = 0.0, search_latency: float | str = 0.0, **options):
+    """Route every agent and every search to the stubs.
+
+    Latencies are seconds or `latency_sampler` specs. `options` override
+    DEFAULT_OPTIONS: the number of subtopics and perspectives the planner
+    returns, gap queries per moderator call (gap loop), whether each query's
+    first evaluation fails (publisher rerun), paragraphs per generated text
+    and per search result page.
+    """
+    import models_config
+    import search
+
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise TypeError(f"unknown fake options: {', '.join(sorted(unknown))}")
+    if options.get("perspectives", 0) > len(PERSPECTIVES):
+        raise ValueError(f"at most {len(PERSPECTIVES)} perspectives")
+    # A bad latency spec fails here rather than inside a node
+    latency_sampler(llm_latency)
+    latency_sampler(search_latency)
+    _options.clear()
+    _options.update(DEFAULT_OPTIONS, **options)
+    _evaluations.clear()
+
+    models_config.set_llm_factory(lambda agent_name: FakeChatModel(agent_name, llm_latency))
+    search.set_search_backend(
+        lambda query, max_results, include_raw_content: fake_search(query, max_results, include_raw_content, search_latency)
+    )
+
+
+def uninstall():
+    import models_config
+    import search
+
+    models_config.set_llm_factory(None)
+    search.set_search_backend(None)
+
+
+def _content(message) -> str:
+    return message["content"] if isinstance(message, dict) else message.content
+
+
+def _find_query(text: str) -> str:
+    match = _QUERY_RE.search(text)
+    return match.group(1).strip() if match else "the research topic"
+
+
+def _latency_key(messages) -> str:
+    # Debaters share the user prompt of a round; the system prompt tells them apart
+    return "\n".join(_content(m) for m in messages)
+
+
+def _rng(key: str) -> random.Random:
+    return random.Random(hashlib.sha256(key.encode("utf-8")).digest())
+
+
+def _number(seed: str, i: int = 0) -> int:
+    return int(hashlib.sha256(f"{seed}{i}".encode("utf-8")).hexdigest()[:4], 16) % 60 + 5
+
+
+def _paragraph(query: str, seed) -> str:
+    n = _number(f"{query}|{seed}")
+    return (
+        f"A {2010 + n % 14} study of {n * 100} participants on {query} found a {n}% effect, "
+        f"while a {2012 + n % 11} follow-up across {n % 9 + 3} countries reported {n // 2}% "
+        f"with {n * 3} cases reviewed by independent analysts."
+    )
+
+
+def _paragraphs(query: str, seed) -> str:
+    return " ".join(_paragraph(query, f"{seed}|{i}" if i else seed) for i in range(_options["output_paragraphs"]))
+
+
+def _citations(text: str) -> str:
+    links = _LINK_RE.findall(text)[:3]
+    return " ".join(f"See [{title}]({url})." for title, url in links)
+
+
+def _report(query: str, user: str) -> str:
+    links = _LINK_RE.findall(user)
+    cite = _citations(user)
+    sections = [f"# {query}", "## Executive Summary", f"{_paragraphs(query, 'summary')} {cite}"]
+    for title in ("Arguments in Favor", "Counter-arguments and Risks", "Source Quality Analysis", "Conclusion"):
+        sections += [f"## {title}", f"{_paragraphs(query, title)} {cite}"]
+    sections += ["## Sources", "\n".join(f"- [{title}]({url})" for title, url in dict(links).items())]
+    return "\n\n".join(sections)
+
+
+def _usage(messages, content: str) -> dict:
+    input_tokens = sum(estimate_tokens(_content(m)) for m in messages)
+    output_tokens = estimate_tokens(content)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
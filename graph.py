@@ -1,3 +1,7 @@
+import sqlite3
+import threading
+from pathlib import Path
+
 from langgraph.graph import END, StateGraph
 
 from nodes.debate import debate_node, should_continue_debate
@@ -7,25 +11,41 @@ from nodes.planner import planner_node
 from nodes.publisher import publisher_node
 from nodes.researcher import researcher_node
 from state import ResearchState
+from tracing import traced_node
+
+CHECKPOINT_PATH = Path(__file__).parent / ".cache" / "checkpoints.sqlite"
+
+# id(checkpointer) -> (checkpointer, compiled graph); the checkpointer is kept
+# alive so its id can't be reused by another object
+_apps: dict[int, tuple] = {}
+_apps_lock = threading.Lock()
+
 
+def open_checkpointer(path: Path = CHECKPOINT_PATH):
+    """SQLite checkpointer that saves graph state after every node."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
 
-def build_graph():
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+def build_graph(checkpointer=None):
     graph = StateGraph(ResearchState)
 
     # Nodes
-    graph.add_node("planner", planner_node)
-    graph.add_node("researcher", researcher_node)
-    graph.add_node("debate", debate_node)
-    graph.add_node("moderator", moderator_node)
-    graph.add_node("publisher", publisher_node)
-    graph.add_node("evaluator", evaluator_node)
+    graph.add_node("planner", traced_node("planner", planner_node))
+    graph.add_node("researcher", traced_node("researcher", researcher_node))
+    graph.add_node("debate", traced_node("debate", debate_node))
+    graph.add_node("moderator", traced_node("moderator", moderator_node))
+    graph.add_node("publisher", traced_node("publisher", publisher_node))
+    graph.add_node("evaluator", traced_node("evaluator", evaluator_node))
 
     # Flow
     graph.set_entry_point("planner")
     graph.add_edge("planner", "researcher")
     graph.add_edge("researcher", "debate")
 
-    # Debate loop (2 rounds)
+    # Debate: the node runs all remaining rounds; the loop resumes older checkpoints taken between rounds
     graph.add_conditional_edges("debate", should_continue_debate, {
         "debate": "debate",
         "moderator": "moderator",
@@ -44,4 +64,13 @@ def build_graph():
         "end": END,
     })
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def get_app(checkpointer=None):
+    """Compiled graph for `checkpointer`, built on first use and reused afterwards."""
+    with _apps_lock:
+        entry = _apps.get(id(checkpointer))
+        if entry is None:
+            entry = _apps[id(checkpointer)] = (checkpointer, build_graph(checkpointer))
+        return entry[1]
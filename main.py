@@ -1,14 +1,197 @@
+import argparse
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from display import console, display_header
-from graph import build_graph
+# Everything heavy (rich, langgraph, langchain, the nodes) is imported on
+# first use so that --version and --check-config return immediately.
+
+__version__ = "0.1.0"
+
+NODES = ("planner", "researcher", "debate", "moderator", "publisher", "evaluator")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Spectra research agent")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument(
+        "--check-config", action="store_true",
+        help="validate models.json and the required API keys, then exit",
+    )
+    parser.add_argument(
+        "--batch", metavar="FILE", type=Path,
+        help="run every query in FILE (JSONL or one query per line) without prompting",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4,
+        help="with --batch, number of queries run in parallel (default: 4)",
+    )
+    parser.add_argument(
+        "--executor", choices=("thread", "process"), default="thread",
+        help="with --batch, run queries in threads or in separate processes",
+    )
+    parser.add_argument(
+        "--output-dir", metavar="DIR", type=Path,
+        help="with --batch, where to write per-query results (default: batch_runs/<timestamp>)",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true",
+        help="with --batch, show node output as well as progress",
+    )
+    parser.add_argument(
+        "--trace", action="store_true",
+        help="record per-node and per-call timings and tokens (JSON + Prometheus export)",
+    )
+    parser.add_argument(
+        "--checkpoint", action="store_true",
+        help="save graph state after every node so the run can be resumed",
+    )
+    parser.add_argument(
+        "--resume", metavar="THREAD_ID",
+        help="resume a checkpointed run from its last completed node",
+    )
+    parser.add_argument(
+        "--rerun", metavar="NODE", choices=NODES,
+        help="with --resume, re-execute the run from the last time NODE was about to start",
+    )
+    args = parser.parse_args()
+    if args.rerun and not args.resume:
+        parser.error("--rerun requires --resume")
+    if args.batch and args.resume:
+        parser.error("--batch and --resume can't be combined")
+    return args
+
+
+def check_config() -> int:
+    from models_config import check_config as find_problems
+
+    problems = find_problems()
+    for problem in problems:
+        print(f"✗ {problem}")
+    if not problems:
+        print("✓ models.json and API keys look good")
+    return 1 if problems else 0
+
+
+def run(app, graph_input, config: dict | None = None, trace_id: str | None = None):
+    from display import (
+        console,
+        display_cache_stats,
+        display_endpoint_stats,
+        display_extraction_stats,
+        display_search_stats,
+        display_structured_stats,
+        display_trace_summary,
+    )
+    from extraction import get_extraction_store
+    from models_config import get_cache_stats
+    from ratelimit import get_endpoint_stats
+    from runscope import run_scope
+    from search import get_search_stats
+    from structured import get_structured_stats
+    from tracing import run_trace, summarize
+
+    query = (graph_input or {}).get("query", "")
+    # Extraction store and counters start fresh for every run
+    with run_scope():
+        with run_trace(trace_id, query) if trace_id else nullcontext() as trace:
+            # Stream node-by-node for real-time display
+            for update in app.stream(
+                graph_input,
+                config,
+                stream_mode="updates",
+                durability="async" if config else None,
+            ):
+                # Each node's display is handled internally
+                pass
+
+        console.print("\n[bold green]✓ Research completed![/bold green]")
+
+        cache_stats = get_cache_stats()
+        if cache_stats:
+            display_cache_stats(cache_stats)
+        endpoint_stats = get_endpoint_stats()
+        if endpoint_stats:
+            display_endpoint_stats(endpoint_stats)
+        display_search_stats(get_search_stats())
+        display_extraction_stats(get_extraction_store().stats)
+        display_structured_stats(get_structured_stats())
+        if trace is not None:
+            display_trace_summary(summarize(trace), trace.files)
+
+
+def resume(app, thread_id: str, rerun: str | None, trace: bool = False):
+    from display import console
+
+    config = {"configurable": {"thread_id": thread_id}}
+
+    if rerun:
+        # Fork from the first checkpoint where `rerun` was the next node. Later
+        # ones are loop-backs (e.g. the publisher again after a failed
+        # evaluation, with its feedback already in the state).
+        # History is newest first.
+        snapshot = None
+        for s in app.get_state_history(config):
+            if rerun in s.next:
+                snapshot = s
+        if snapshot is None:
+            console.print(f"[bold red]Erro:[/bold red] no checkpoint before '{rerun}' in thread {thread_id}")
+            return
+        config = snapshot.config
+    else:
+        snapshot = app.get_state(config)
+        if not snapshot.values:
+            console.print(f"[bold red]Erro:[/bold red] no checkpoints for thread {thread_id}")
+            return
+        if not snapshot.next:
+            console.print(f"[dim]Thread {thread_id} already completed.[/dim]")
+            return
+
+    console.print(f"\n[bold]Resuming:[/bold] {snapshot.values.get('query', '')} [dim](next: {', '.join(snapshot.next)})[/dim]\n")
+    run(app, None, config, trace_id=thread_id if trace else None)
+
+
+def _warm_app(checkpointed: bool):
+    """Import the graph and compile it (meant to run while the user types)."""
+    from graph import get_app, open_checkpointer
+
+    return get_app(open_checkpointer() if checkpointed else None)
 
 
 def main():
+    args = parse_args()
+    if args.check_config:
+        sys.exit(check_config())
+    if args.batch:
+        from batch import run_batch
+
+        summary = run_batch(
+            args.batch, args.workers, args.executor, args.output_dir,
+            checkpointed=args.checkpoint, verbose=args.verbose, trace=args.trace,
+        )
+        sys.exit(1 if summary["failed"] else 0)
+
+    # Compile the graph in the background; the prompt doesn't need it
+    app_future = ThreadPoolExecutor(max_workers=1).submit(_warm_app, bool(args.checkpoint or args.resume))
+
+    from display import console, display_header
+
     display_header()
-    app = build_graph()
+
+    if args.resume:
+        try:
+            resume(app_future.result(), args.resume, args.rerun, args.trace)
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Research cancelled.[/yellow]")
+        except Exception as e:
+            console.print(f"\n[bold red]Erro:[/bold red] {e}")
+        return
 
     while True:
         console.print()
@@ -24,18 +207,16 @@ def main():
             console.print("[dim]Bye![/dim]")
             break
 
+        config = None
+        thread_id = uuid.uuid4().hex[:12]
+        if args.checkpoint:
+            config = {"configurable": {"thread_id": thread_id}}
+            console.print(f"[dim]Checkpoint thread: {thread_id} (resume with --resume {thread_id})[/dim]")
+
         try:
             console.print(f"\n[bold]Researching:[/bold] {query}\n")
-
-            # Stream node-by-node for real-time display
-            for update in app.stream(
-                {"query": query},
-                stream_mode="updates",
-            ):
-                # Each node's display is handled internally
-                pass
-
-            console.print("\n[bold green]✓ Research completed![/bold green]")
+            app = app_future.result()
+            run(app, {"query": query}, config, trace_id=thread_id if args.trace else None)
 
         except KeyboardInterrupt:
             console.print("\n[yellow]Research cancelled.[/yellow]")
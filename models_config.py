@@ -1,27 +1,98 @@
 import json
 import os
+import threading
+import time
 from pathlib import Path
 
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+
+from cache import CACHE_TTL_SECONDS, DiskCache, make_key
+from ratelimit import get_endpoint
+from runscope import scoped
+from tracing import TracedChatModel, annotate
 
 load_dotenv()
 
+_CONFIG_PATH = Path(__file__).parent / "models.json"
+
+# One keep-alive pool per endpoint, shared by every model that talks to it
+HTTP_LIMITS = {"max_connections": 64, "max_keepalive_connections": 32, "keepalive_expiry": 90}
+HTTP_TIMEOUT = {"timeout": 600.0, "connect": 10.0}
+
+# Keys every agent entry in models.json must define
+REQUIRED_AGENT_KEYS = ("model", "provider", "base_url", "api_key_env", "temperature")
+
 _config: dict | None = None
+_config_mtime: float | None = None
+_config_lock = threading.Lock()
+
+_models: dict[tuple, object] = {}
+_http_clients: dict[str, tuple] = {}
+
+_llm_factory = None
+
+_llm_cache = DiskCache("llm")
+_stats_lock = threading.Lock()
 
 
 def _load_config() -> dict:
-    global _config
-    if _config is None:
-        config_path = Path(__file__).parent / "models.json"
-        with open(config_path) as f:
-            _config = json.load(f)
-    return _config
+    """Return models.json, re-reading it (and dropping pooled models) when it changes."""
+    global _config, _config_mtime
+    mtime = _CONFIG_PATH.stat().st_mtime
+    with _config_lock:
+        if _config is None or mtime != _config_mtime:
+            with open(_CONFIG_PATH) as f:
+                _config = json.load(f)
+            _config_mtime = mtime
+            _models.clear()
+        return _config
+
+
+def get_agent_config(agent_name: str) -> dict:
+    return _load_config()[agent_name]
+
+
+def get_endpoint_config(name: str) -> dict:
+    """Rate limit and retry settings for a base_url (or "tavily") from "endpoints"."""
+    return _load_config().get("endpoints", {}).get(name, {})
+
+
+def check_config() -> list[str]:
+    """Problems with models.json and the environment, found without loading any model."""
+    try:
+        config = _load_config()
+    except (OSError, ValueError) as e:
+        return [f"{_CONFIG_PATH.name}: {e}"]
+
+    problems = []
+    for name, entry in config.items():
+        # "search", "extraction", "endpoints" etc. configure services, not agents
+        if "model" not in entry:
+            continue
+        missing = [key for key in REQUIRED_AGENT_KEYS if key not in entry]
+        if missing:
+            problems.append(f"{name}: missing {', '.join(missing)}")
+        elif not os.getenv(entry["api_key_env"]):
+            problems.append(f"{name}: env var {entry['api_key_env']} is not set")
+    if not os.getenv("TAVILY_API_KEY"):
+        problems.append("search: env var TAVILY_API_KEY is not set")
+    return problems
+
+
+def set_llm_factory(factory):
+    """Serve `get_llm(name)` from `factory(name)` instead (e.g. stub models); None restores the real ones."""
+    global _llm_factory
+    _llm_factory = factory
 
 
 def get_llm(agent_name: str):
-    config = _load_config()
-    agent_config = config[agent_name]
+    agent_config = get_agent_config(agent_name)
+    endpoint = get_endpoint(
+        agent_config["base_url"], agent_config["api_key_env"], get_endpoint_config(agent_config["base_url"])
+    )
+    if _llm_factory is not None:
+        # Stubs keep the endpoint's limits, so benchmarks see the real pacing
+        return TracedChatModel(RateLimitedChatModel(_llm_factory(agent_name), endpoint), agent_name)
 
     api_key = os.getenv(agent_config["api_key_env"])
     if not api_key:
@@ -29,11 +100,195 @@ def get_llm(agent_name: str):
             f"Missing API key env var: {agent_config['api_key_env']}"
         )
 
-    return init_chat_model(
-        model=agent_config["model"],
-        model_provider=agent_config["provider"],
-        base_url=agent_config["base_url"],
-        api_key=api_key,
-        temperature=agent_config["temperature"],
-        max_tokens=agent_config.get("max_tokens"),
+    llm = RateLimitedChatModel(_pooled_model(agent_config, api_key), endpoint)
+
+    cache_config = agent_config.get("cache", False)
+    if cache_config:
+        ttl_seconds = CACHE_TTL_SECONDS
+        if isinstance(cache_config, dict):
+            ttl_seconds = cache_config.get("ttl_seconds", CACHE_TTL_SECONDS)
+        llm = CachedChatModel(llm, agent_name, agent_config, ttl_seconds)
+    return TracedChatModel(llm, agent_name, agent_config["model"])
+
+
+def _pooled_model(agent_config: dict, api_key: str):
+    """Return the shared chat model for this endpoint, key and generation params."""
+    key = (
+        agent_config["provider"],
+        agent_config["base_url"],
+        api_key,
+        agent_config["model"],
+        agent_config["temperature"],
+        agent_config.get("max_tokens"),
     )
+    with _config_lock:
+        llm = _models.get(key)
+        if llm is None:
+            from langchain.chat_models import init_chat_model
+
+            # Retries are done by RateLimitedChatModel, which also paces them
+            kwargs = {"max_retries": 0}
+            if agent_config["provider"] == "openai":
+                http_client, http_async_client = _endpoint_clients(agent_config["base_url"])
+                kwargs.update(http_client=http_client, http_async_client=http_async_client)
+            llm = _models[key] = init_chat_model(
+                model=agent_config["model"],
+                model_provider=agent_config["provider"],
+                base_url=agent_config["base_url"],
+                api_key=api_key,
+                temperature=agent_config["temperature"],
+                max_tokens=agent_config.get("max_tokens"),
+                **kwargs,
+            )
+        return llm
+
+
+def _endpoint_clients(base_url: str) -> tuple:
+    """(httpx.Client, httpx.AsyncClient) pair shared by every model on `base_url`."""
+    clients = _http_clients.get(base_url)
+    if clients is None:
+        import httpx
+
+        limits = httpx.Limits(**HTTP_LIMITS)
+        timeout = httpx.Timeout(**HTTP_TIMEOUT)
+        clients = _http_clients[base_url] = (
+            httpx.Client(limits=limits, timeout=timeout),
+            httpx.AsyncClient(limits=limits, timeout=timeout),
+        )
+    return clients
+
+
+def get_cache_stats() -> dict[str, dict]:
+    """Per-agent LLM cache counters for the current run (see runscope)."""
+    with _stats_lock:
+        return {agent: dict(stats) for agent, stats in scoped("cache_stats", dict).items()}
+
+
+def _record_cache(agent_name: str, hit: bool, latency: float = 0.0, tokens: int = 0):
+    with _stats_lock:
+        stats = scoped("cache_stats", dict).setdefault(
+            agent_name, {"hits": 0, "misses": 0, "saved_seconds": 0.0, "saved_tokens": 0}
+        )
+        if hit:
+            stats["hits"] += 1
+            stats["saved_seconds"] += latency
+            stats["saved_tokens"] += tokens
+        else:
+            stats["misses"] += 1
+
+
+class RateLimitedChatModel:
+    """Chat model proxy that sends `invoke` and `stream` through an endpoint's limits.
+
+    See ratelimit.Endpoint: rate limiting, adaptive concurrency and retry
+    with backoff. Anything else is forwarded to the wrapped model untouched.
+    """
+
+    def __init__(self, llm, endpoint):
+        self._llm = llm
+        self._endpoint = endpoint
+
+    def invoke(self, messages, **kwargs):
+        return self._endpoint.call(lambda: self._llm.invoke(messages, **kwargs))
+
+    def stream(self, messages, **kwargs):
+        return self._endpoint.stream(lambda: self._llm.stream(messages, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+
+def _message_payload(message) -> dict:
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {"role": message.type, "content": message.content}
+
+
+class CachedChatModel:
+    """Chat model proxy that answers repeated prompts from the on-disk cache.
+
+    The key covers everything that determines the response: model, provider,
+    endpoint, generation parameters and the exact message list. Anything other
+    than `invoke` and `stream` is forwarded to the wrapped model untouched.
+    """
+
+    def __init__(self, llm, agent_name: str, agent_config: dict, ttl_seconds: float):
+        self._llm = llm
+        self._agent_name = agent_name
+        self._ttl_seconds = ttl_seconds
+        self._key_params = {
+            "model": agent_config["model"],
+            "provider": agent_config["provider"],
+            "base_url": agent_config["base_url"],
+            "temperature": agent_config["temperature"],
+            "max_tokens": agent_config.get("max_tokens"),
+        }
+
+    def invoke(self, messages, **kwargs):
+        # Extra call options can change the response; don't guess, just call
+        if kwargs:
+            return self._llm.invoke(messages, **kwargs)
+
+        key = self._key(messages)
+        cached = _llm_cache.get(key)
+        if cached is not None:
+            from langchain_core.messages import AIMessage
+
+            annotate(cache="hit")
+            _record_cache(self._agent_name, True, cached["latency"], cached["tokens"])
+            return AIMessage(content=cached["content"])
+
+        start = time.perf_counter()
+        response = self._llm.invoke(messages)
+        latency = time.perf_counter() - start
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        self._store(key, response.content, latency, usage.get("total_tokens", 0))
+        return response
+
+    def stream(self, messages, **kwargs):
+        if kwargs:
+            yield from self._llm.stream(messages, **kwargs)
+            return
+
+        key = self._key(messages)
+        cached = _llm_cache.get(key)
+        if cached is not None:
+            from langchain_core.messages import AIMessageChunk
+
+            annotate(cache="hit")
+            _record_cache(self._agent_name, True, cached["latency"], cached["tokens"])
+            yield AIMessageChunk(content=cached["content"])
+            return
+
+        start = time.perf_counter()
+        parts = []
+        tokens = 0
+        for chunk in self._llm.stream(messages):
+            if isinstance(chunk.content, str):
+                parts.append(chunk.content)
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                tokens = usage.get("total_tokens", tokens)
+            yield chunk
+
+        # Only reached when the stream completed, so partial responses are never stored
+        self._store(key, "".join(parts), time.perf_counter() - start, tokens)
+
+    def _key(self, messages) -> str:
+        return make_key({
+            **self._key_params,
+            "messages": [_message_payload(m) for m in messages],
+        })
+
+    def _store(self, key: str, content, latency: float, tokens: int):
+        annotate(cache="miss")
+        _llm_cache.set(key, {
+            "content": content,
+            "latency": latency,
+            "tokens": tokens,
+        }, self._ttl_seconds)
+        _record_cache(self._agent_name, False)
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
@@ -1,61 +1,56 @@
-import json
-import re
-
-from langchain_tavily import TavilySearch
-
-from display import display_debate_argument, display_debater_search, display_step
-from models_config import get_llm
+from functools import partial
+
+from convergence import DEBATE_DEFAULTS, round_statuses
+from dataflow import Dataflow
+from display import (
+    display_debate_argument,
+    display_debate_convergence,
+    display_debate_savings,
+    display_debater_preview,
+    display_debater_search,
+    display_step,
+    display_structured_fallback,
+)
+from extraction import get_extraction_store
+from models_config import get_agent_config, get_llm
 from prompts import load_prompt
-from state import Argument, DebateRound, Evidence, ResearchState, Source
-
-MAX_DEBATE_ROUNDS = 2
-
-
-def _parse_structured_argument(response_text: str, agent: str, role: str, round_num: int) -> Argument:
-    """Parse structured JSON from debater response, with fallback to plain text."""
-    try:
-        cleaned = re.sub(r"```(?:json)?\s*", "", response_text)
-        cleaned = cleaned.strip().rstrip("`")
-        data = json.loads(cleaned)
-
-        main_arg = data.get("main_argument", "")
-        evidence_list = [
-            Evidence(claim=e["claim"], source=e.get("source", ""))
-            for e in data.get("evidence", [])
-        ]
-        rebuttal_to = data.get("rebuttal_to", "")
-        confidence = float(data.get("confidence", 0.0))
-        unresolved = data.get("unresolved_questions", [])
-
-        # Build readable text from structured data
-        text_parts = [main_arg]
-        if evidence_list:
-            text_parts.append("\n\nEvidence:")
-            for e in evidence_list:
-                text_parts.append(f"- {e.claim} (Fonte: {e.source})")
-        if unresolved:
-            text_parts.append("\n\nOpen questions:")
-            for q in unresolved:
-                text_parts.append(f"- {q}")
-
-        return Argument(
-            agent=agent,
-            role=role,
-            text="\n".join(text_parts),
-            main_argument=main_arg,
-            evidence=evidence_list,
-            rebuttal_to=rebuttal_to,
-            confidence=confidence,
-            unresolved_questions=unresolved,
-        )
-    except (json.JSONDecodeError, KeyError, TypeError):
-        # Fallback: treat as plain text
-        return Argument(
-            agent=agent,
-            role=role,
-            text=response_text,
-            main_argument=response_text,
-        )
+from search import tavily_search
+from sources import add_source, merge_sources, resolve_source
+from state import Argument, DebateRound, DebaterOutput, Evidence, ResearchState
+from structured import StructuredOutputError, invoke_structured
+from tracing import set_tags
+
+# Most relevant part of each page sent to the evidence extraction LLM
+EXTRACTION_BUDGET_TOKENS = 2000
+
+# Search results fetched for each rebuttal
+REBUTTAL_SEARCH_RESULTS = 3
+
+EVIDENCE_PROMPT = "Extract the most relevant evidence from this page for the debate topic. Return only the key facts, data, and arguments in 200-300 words. No commentary."
+
+
+def _to_argument(output: DebaterOutput, agent: str, role: str) -> Argument:
+    """Build the Argument, with readable text assembled from the structured reply."""
+    text_parts = [output.main_argument]
+    if output.evidence:
+        text_parts.append("\n\nEvidence:")
+        for e in output.evidence:
+            text_parts.append(f"- {e.claim} (Fonte: {e.source})")
+    if output.unresolved_questions:
+        text_parts.append("\n\nOpen questions:")
+        for q in output.unresolved_questions:
+            text_parts.append(f"- {q}")
+
+    return Argument(
+        agent=agent,
+        role=role,
+        text="\n".join(text_parts),
+        main_argument=output.main_argument,
+        evidence=[Evidence(**e.model_dump()) for e in output.evidence],
+        rebuttal_to=output.rebuttal_to or "",
+        confidence=output.confidence,
+        unresolved_questions=output.unresolved_questions,
+    )
 
 
 def _generate_search_query(llm, perspective: dict, prev_args: str, query: str) -> str:
@@ -73,14 +68,13 @@ def _generate_search_query(llm, perspective: dict, prev_args: str, query: str) -
     return response.content.strip().strip('"')
 
 
-def _search_and_extract(llm, search_query: str, topic: str) -> tuple[str, list[dict]]:
+def _search_and_extract(llm, search_query: str, topic: str, batch_size: int) -> tuple[str, dict[str, dict]]:
     """Search Tavily and extract relevant evidence."""
-    tavily = TavilySearch(max_results=3, include_raw_content="markdown")
-    raw_response = tavily.invoke(search_query)
-    raw_results = raw_response.get("results", []) if isinstance(raw_response, dict) else []
+    raw_results = tavily_search(search_query, max_results=REBUTTAL_SEARCH_RESULTS)
 
-    new_sources = []
-    evidence_parts = []
+    new_sources: dict[str, dict] = {}
+    pages = []
+    store = get_extraction_store()
 
     for r in raw_results:
         url = r.get("url", "")
@@ -89,115 +83,268 @@ def _search_and_extract(llm, search_query: str, topic: str) -> tuple[str, list[d
         content = r.get("content", "")
 
         if url:
-            new_sources.append(Source(url=url, title=title, used_in=f"debate:{topic}").model_dump())
+            add_source(new_sources, url, title, f"debate:{topic}")
 
         page_content = raw_content or content
         if page_content:
-            # Extract relevant portion via LLM
-            truncated = page_content[:10000]
-            extract_response = llm.invoke([
-                {
-                    "role": "system",
-                    "content": "Extract the most relevant evidence from this page for the debate topic. Return only the key facts, data, and arguments in 200-300 words. No commentary.",
-                },
-                {
-                    "role": "user",
-                    "content": f"Topic: {topic}\nSearch query: {search_query}\n\nPage [{title}]:\n{truncated}",
-                },
-            ])
-            evidence_parts.append(f"[{title}] ({url}):\n{extract_response.content}")
+            pages.append((url, title, page_content))
+
+    def extract(items: list[tuple[int, str]]) -> list[str]:
+        blocks = [
+            f"Topic: {topic}\nSearch query: {search_query}\n\nPage [{pages[i][1]}]:\n{excerpt}"
+            for i, excerpt in items
+        ]
+        return store.request_extractions(llm, EVIDENCE_PROMPT, blocks, batch_size)
+
+    # Extract relevant portion via LLM (reused if this page was already extracted
+    # for the same or a similar rebuttal query)
+    extracted = store.get_or_extract_many(
+        [(url, page_content, search_query) for url, _, page_content in pages],
+        EXTRACTION_BUDGET_TOKENS,
+        extract,
+        kind="debate",
+    )
+    evidence_parts = [
+        f"[{title}] ({url}):\n{text}"
+        for (url, title, _), text in zip(pages, extracted)
+    ]
 
     evidence_text = "\n\n".join(evidence_parts) if evidence_parts else ""
     return evidence_text, new_sources
 
 
-def debate_node(state: ResearchState) -> dict:
-    current_round = state.get("current_round", 0)
-    round_num = current_round + 1
-    display_step(f"DEBATE — Rodada {round_num}", "Debate roundtable")
+def _opening(state: ResearchState, idx: int, perspective: dict, inputs: dict) -> Argument:
+    """Round 1: argue from the research context alone."""
+    system_msg, user_msg = load_prompt(
+        "debate_round1",
+        query=state["query"],
+        compressed_context=state["compressed_context"],
+        perspective_prompt=perspective["system_prompt"],
+    )
+    return _argue(state, idx, perspective, 1, system_msg, user_msg, {})
+
+
+def _rebuttal_query(state: ResearchState, idx: int, perspective: dict, round_num: int, inputs: dict) -> tuple[str, str]:
+    """Format the arguments to rebut and generate a search query for counter-evidence.
+
+    `inputs` holds the other debaters' arguments from earlier rounds of this
+    pass; arguments from previous passes are already in the state.
+    """
+    set_tags(round=round_num)
+    earlier = [arg for dr in state.get("debate_rounds", []) for arg in dr["arguments"]]
+    earlier += [arg.model_dump() for arg in inputs.values()]
+    prev_args = _format_previous_arguments(earlier, perspective["name"])
+    search_query = _generate_search_query(get_llm(f"debater_{idx + 1}"), perspective, prev_args, state["query"])
+    return prev_args, search_query
+
+
+def _rebuttal_evidence(state: ResearchState, idx: int, round_num: int, inputs: dict) -> tuple[str, dict[str, dict]]:
+    """Search for the rebuttal query and extract evidence from the results."""
+    set_tags(round=round_num)
+    debater_key = f"debater_{idx + 1}"
+    _, search_query = inputs[f"r{round_num}.{debater_key}.query"]
+    batch_size = get_agent_config(debater_key).get("extraction_batch_size", 1)
+    return _search_and_extract(get_llm(debater_key), search_query, state["query"], batch_size)
+
+
+def _rebuttal(state: ResearchState, idx: int, perspective: dict, round_num: int, inputs: dict) -> Argument:
+    """Round 2+: rebut the other debaters with the evidence found for it."""
+    task = f"r{round_num}.debater_{idx + 1}"
+    prev_args, _ = inputs[f"{task}.query"]
+    evidence_text, new_sources = inputs[f"{task}.search"]
+
+    additional_evidence_section = ""
+    if evidence_text:
+        additional_evidence_section = f"Additional evidence found for your rebuttal:\n{evidence_text}"
+
+    system_msg, user_msg = load_prompt(
+        "debate_round2",
+        query=state["query"],
+        compressed_context=state["compressed_context"],
+        perspective_prompt=perspective["system_prompt"],
+        previous_arguments=prev_args,
+        additional_evidence=additional_evidence_section,
+    )
+    return _argue(state, idx, perspective, round_num, system_msg, user_msg, new_sources)
 
-    perspectives = state["perspectives"]
-    compressed_context = state["compressed_context"]
-    debate_rounds = list(state.get("debate_rounds", []))
-    all_sources = list(state.get("sources", []))
-
-    arguments = []
-
-    for idx, perspective in enumerate(perspectives):
-        debater_key = f"debater_{idx + 1}"
-        llm = get_llm(debater_key)
-
-        if round_num == 1:
-            system_msg, user_msg = load_prompt(
-                "debate_round1",
-                query=state["query"],
-                compressed_context=compressed_context,
-                perspective_prompt=perspective["system_prompt"],
-            )
-        else:
-            # Format previous arguments for context
-            prev_args = _format_previous_arguments(debate_rounds, perspective["name"])
-
-            # Search for additional evidence to support rebuttal
-            search_query = _generate_search_query(llm, perspective, prev_args, state["query"])
-            display_debater_search(perspective["name"], search_query)
-
-            evidence_text, new_sources = _search_and_extract(llm, search_query, state["query"])
-            all_sources.extend(new_sources)
-
-            additional_evidence_section = ""
-            if evidence_text:
-                additional_evidence_section = f"Additional evidence found for your rebuttal:\n{evidence_text}"
-
-            system_msg, user_msg = load_prompt(
-                "debate_round2",
-                query=state["query"],
-                compressed_context=compressed_context,
-                perspective_prompt=perspective["system_prompt"],
-                previous_arguments=prev_args,
-                additional_evidence=additional_evidence_section,
-            )
 
-        response = llm.invoke([
+def _argue(state: ResearchState, idx: int, perspective: dict, round_num: int,
+           system_msg: str, user_msg: str, new_sources: dict[str, dict]) -> Argument:
+    """Get and parse one debater's argument.
+
+    Only one-line notices are displayed here, so concurrent debaters don't
+    interleave their output.
+    """
+    set_tags(round=round_num)
+    debater_key = f"debater_{idx + 1}"
+    llm = get_llm(debater_key)
+
+    # With "stream" on, the main argument is previewed as soon as it is complete
+    on_field = None
+    if get_agent_config(debater_key).get("stream"):
+        def on_field(key, value):
+            if key == "main_argument" and isinstance(value, str):
+                display_debater_preview(perspective["name"], value, round_num)
+
+    try:
+        output = invoke_structured(llm, debater_key, [
             {"role": "system", "content": system_msg},
             {"role": "user", "content": user_msg},
-        ])
-
-        argument = _parse_structured_argument(
-            response.content, perspective["name"], perspective["role"], round_num
-        )
-        arguments.append(argument.model_dump())
-
-        display_debate_argument(
-            perspective["name"],
-            perspective["role"],
-            argument.text,
-            round_num,
-        )
-
-    debate_round = DebateRound(
-        round_num=round_num,
-        arguments=arguments,
-    )
-    debate_rounds.append(debate_round.model_dump())
+        ], DebaterOutput, on_field)
+        argument = _to_argument(output, perspective["name"], perspective["role"])
+    except StructuredOutputError as e:
+        # One debater's unusable reply shouldn't end the run; keep it as plain text
+        display_structured_fallback(perspective["name"], str(e))
+        argument = Argument(agent=perspective["name"], role=perspective["role"], text=e.text, main_argument=e.text)
+    # Evidence names its source by title; link it to the registry entry
+    registry = {**state.get("sources", {}), **new_sources}
+    for evidence in argument.evidence:
+        evidence.source_id = resolve_source(registry, evidence.source)
+    argument.source_ids = list(new_sources)
+    return argument
+
 
+def debate_node(state: ResearchState) -> dict:
+    """Run the remaining debate rounds as one dependency-driven schedule.
+
+    Each debater's steps are separate tasks: a rebuttal's search query and
+    evidence gathering start as soon as the other debaters' earlier arguments
+    are in, while a slow debater may still be writing its own. Rounds up to
+    `min_rounds` are scheduled up front. After that, each finished round
+    decides the next: only debaters whose position is still disputed rebut
+    again, and the debate stops when none are left or at `max_rounds`.
+    Results are grouped into one DebateRound per round, and arguments are
+    displayed in round and perspective order as soon as they and those
+    before them are ready.
+    """
+    config = _debate_config()
+    first = state.get("current_round", 0) + 1
+    last = max(config["max_rounds"], first)
+    perspectives = state["perspectives"]
+    everyone = list(range(len(perspectives)))
+
+    flow = Dataflow("debate", max_workers=max(len(perspectives), 1))
+    scheduled: dict[int, list[int]] = {}  # round -> debaters taking part
+    order: list[tuple[int, int]] = []  # (round, debater) in display order
+
+    def schedule(round_num: int, debaters: list[int]):
+        scheduled[round_num] = debaters
+        order.extend((round_num, idx) for idx in debaters)
+        for idx in debaters:
+            perspective = perspectives[idx]
+            debater_key = f"debater_{idx + 1}"
+            task = f"r{round_num}.{debater_key}"
+            fields = {"round": round_num, "agent": debater_key}
+            if round_num == 1:
+                flow.add(f"{task}.argue", partial(_opening, state, idx, perspective), **fields)
+                continue
+            others = [
+                f"r{n}.debater_{other + 1}.argue"
+                for n in sorted(scheduled) if n < round_num
+                for other in scheduled[n] if other != idx
+            ]
+            flow.add(f"{task}.query", partial(_rebuttal_query, state, idx, perspective, round_num), others, **fields)
+            flow.add(f"{task}.search", partial(_rebuttal_evidence, state, idx, round_num), [f"{task}.query"], **fields)
+            flow.add(
+                f"{task}.argue", partial(_rebuttal, state, idx, perspective, round_num),
+                [f"{task}.query", f"{task}.search"], **fields,
+            )
+
+    for round_num in range(first, min(max(config["min_rounds"], first), last) + 1):
+        schedule(round_num, everyone)
+
+    # Each debater's latest argument, to compare the next one with
+    history = {arg["agent"]: arg for dr in state.get("debate_rounds", []) for arg in dr["arguments"]}
+    finished: dict[tuple[int, int], Argument] = {}
+    results: dict[str, object] = {}
+    arguments: dict[int, list[dict]] = {}
+    round_sources: dict[str, dict] = {}
+
+    def round_finished(round_num: int):
+        statuses = round_statuses(arguments[round_num], history, config)
+        history.update((arg["agent"], arg) for arg in arguments[round_num])
+        if round_num + 1 in scheduled or round_num >= last:
+            return
+        disputed = [idx for idx in scheduled[round_num] if statuses[perspectives[idx]["name"]] == "disputed"]
+        display_debate_convergence(round_num, statuses, [perspectives[idx]["name"] for idx in disputed])
+        if disputed:
+            schedule(round_num + 1, disputed)
+
+    def show_ready(name: str, result):
+        nonlocal round_sources
+        results[name] = result
+        round_part, debater_key, step = name.split(".")
+        if step != "argue":
+            return
+        finished[(int(round_part[1:]), int(debater_key.split("_")[1]) - 1)] = result
+        while order and order[0] in finished:
+            round_num, idx = order.pop(0)
+            perspective = perspectives[idx]
+            argument = finished.pop((round_num, idx))
+            if round_num not in arguments and round_num != first:
+                display_step(f"DEBATE — Rodada {round_num}", "Debate roundtable")
+            if round_num != 1:
+                task = f"r{round_num}.debater_{idx + 1}"
+                display_debater_search(perspective["name"], results[f"{task}.query"][1])
+                round_sources = merge_sources(round_sources, results[f"{task}.search"][1])
+            arguments.setdefault(round_num, []).append(argument.model_dump())
+            display_debate_argument(perspective["name"], perspective["role"], argument.text, round_num)
+            if len(arguments[round_num]) == len(scheduled[round_num]):
+                round_finished(round_num)
+
+    display_step(f"DEBATE — Rodada {first}", "Debate roundtable")
+    flow.run(show_ready)
+
+    # Rebuttals a fixed schedule up to max_rounds would have run
+    skipped = [
+        idx for round_num in range(first, last + 1)
+        for idx in everyone if idx not in scheduled.get(round_num, [])
+    ]
+    if skipped:
+        display_debate_savings(len(skipped), *_rebuttal_calls(skipped))
+
+    # Only the additions: the state reducers append and merge them
     return {
-        "debate_rounds": debate_rounds,
-        "current_round": round_num,
-        "sources": all_sources,
+        "debate_rounds": [
+            DebateRound(round_num=round_num, arguments=arguments[round_num]).model_dump()
+            for round_num in sorted(scheduled)
+        ],
+        "current_round": max(scheduled),
+        "sources": round_sources,
     }
 
 
 def should_continue_debate(state: ResearchState) -> str:
-    if state.get("current_round", 0) < MAX_DEBATE_ROUNDS:
+    # The node runs every round it needs; this only resumes checkpoints taken between rounds
+    if state.get("current_round", 0) < _debate_config()["min_rounds"]:
         return "debate"
     return "moderator"
 
 
-def _format_previous_arguments(debate_rounds: list[dict], exclude_name: str) -> str:
-    parts = []
-    for dr in debate_rounds:
-        for arg in dr["arguments"]:
-            if arg["agent"] != exclude_name:
-                parts.append(f"**{arg['agent']}** ({arg['role']}):\n{arg['text']}")
+def _debate_config() -> dict:
+    try:
+        return {**DEBATE_DEFAULTS, **get_agent_config("debate")}
+    except KeyError:
+        return dict(DEBATE_DEFAULTS)
+
+
+def _rebuttal_calls(debaters: list[int]) -> tuple[int, int]:
+    """Estimated (LLM calls, searches) of one rebuttal by each of `debaters`.
+
+    A rebuttal costs a query generation, a search, the extraction requests
+    for its results and the argument itself.
+    """
+    llm_calls = 0
+    for idx in debaters:
+        batch_size = max(get_agent_config(f"debater_{idx + 1}").get("extraction_batch_size", 1), 1)
+        llm_calls += 2 + -(-REBUTTAL_SEARCH_RESULTS // batch_size)
+    return llm_calls, len(debaters)
+
+
+def _format_previous_arguments(arguments: list[dict], exclude_name: str) -> str:
+    parts = [
+        f"**{arg['agent']}** ({arg['role']}):\n{arg['text']}"
+        for arg in arguments
+        if arg["agent"] != exclude_name
+    ]
     return "\n\n---\n\n".join(parts)
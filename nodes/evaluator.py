@@ -1,30 +1,34 @@
-import json
-import re
-
-from display import display_evaluation, display_step
-from models_config import get_llm
+from display import display_evaluation, display_prescore_agreement, display_step
+from models_config import get_agent_config, get_llm
+from prescore import AUDIT_RATE, audit_sample, prescore_report, record_agreement
 from prompts import load_prompt
-from state import ResearchState
+from state import EvaluatorOutput, ResearchState
+from structured import invoke_structured
+
+PASS_THRESHOLD = 7.0
 
 
 def evaluator_node(state: ResearchState) -> dict:
     display_step("EVALUATOR", "Evaluating report quality")
 
-    llm = get_llm("evaluator")
     report = state.get("final_report", "")
-
-    system_msg, user_msg = load_prompt(
-        "evaluator",
-        query=state["query"],
-        report=report,
-    )
-
-    response = llm.invoke([
-        {"role": "system", "content": system_msg},
-        {"role": "user", "content": user_msg},
-    ])
-
-    parsed = _parse_json(response.content)
+    prescore_config = get_agent_config("evaluator").get("prescore")
+
+    # Clear passes and clear failures are decided locally, except for a sample
+    # (`audit_rate`) that still goes to the LLM so the thresholds can be checked;
+    # borderline reports (or all of them, without "prescore" configured) always do.
+    local = prescore_report(report, state)
+    band = _band(local, prescore_config) if prescore_config else "borderline"
+    audit_rate = prescore_config.get("audit_rate", AUDIT_RATE) if prescore_config else 0.0
+    method = "llm"
+    if band != "borderline" and not audit_sample(report, audit_rate):
+        parsed, method = local, "local"
+    else:
+        parsed = _llm_evaluate(state["query"], report)
+        if prescore_config:
+            weight = 1.0 if band == "borderline" else 1.0 / audit_rate
+            agreement = record_agreement(local, parsed, PASS_THRESHOLD, band, weight)
+            display_prescore_agreement(local["average"], band, agreement)
 
     scores = parsed.get("scores", {})
     average = parsed.get("average", 0.0)
@@ -35,6 +39,8 @@ def evaluator_node(state: ResearchState) -> dict:
         "scores": scores,
         "average": average,
         "justifications": justifications,
+        "method": method,
+        "local_scores": local["scores"],
     }
 
     display_evaluation(evaluation)
@@ -47,7 +53,7 @@ def evaluator_node(state: ResearchState) -> dict:
     }
 
     # If quality is insufficient and we haven't retried yet, send feedback to publisher
-    if average < 7.0 and loop_count < 1 and feedback:
+    if average < PASS_THRESHOLD and loop_count < 1 and feedback:
         result["evaluation_feedback"] = feedback
     else:
         result["evaluation_feedback"] = ""
@@ -55,14 +61,33 @@ def evaluator_node(state: ResearchState) -> dict:
     return result
 
 
+def _band(local: dict, prescore_config: dict) -> str:
+    """"pass" or "fail" when the local pre-score is clear-cut, otherwise "borderline"."""
+    if local["average"] >= prescore_config.get("pass_above", 8.5) \
+            and min(local["scores"].values()) >= PASS_THRESHOLD:
+        return "pass"
+    if local["average"] < prescore_config.get("fail_below", 4.5):
+        return "fail"
+    return "borderline"
+
+
+def _llm_evaluate(query: str, report: str) -> dict:
+    llm = get_llm("evaluator")
+
+    system_msg, user_msg = load_prompt(
+        "evaluator",
+        query=query,
+        report=report,
+    )
+
+    return invoke_structured(llm, "evaluator", [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
+    ], EvaluatorOutput).model_dump()
+
+
 def should_rerun_publisher(state: ResearchState) -> str:
     feedback = state.get("evaluation_feedback", "")
     if feedback:
         return "publisher"
     return "end"
-
-
-def _parse_json(text: str) -> dict:
-    cleaned = re.sub(r"```(?:json)?\s*", "", text)
-    cleaned = cleaned.strip().rstrip("`")
-    return json.loads(cleaned)
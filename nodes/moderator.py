@@ -1,10 +1,9 @@
-import json
-import re
-
+from context_packer import pack_sections
 from display import display_more_research, display_step, display_synthesis
 from models_config import get_llm
 from prompts import load_prompt
 from state import ResearchState, Synthesis
+from structured import invoke_structured
 
 
 def moderator_node(state: ResearchState) -> dict:
@@ -12,22 +11,24 @@ def moderator_node(state: ResearchState) -> dict:
 
     llm = get_llm("moderator")
 
-    debate_transcript = _format_debate_transcript(state.get("debate_rounds", []))
+    sections = pack_sections(
+        "moderator",
+        search_results=state.get("search_results", []),
+        debate_rounds=state.get("debate_rounds", []),
+        prompt="moderator",
+    )
 
     system_msg, user_msg = load_prompt(
         "moderator",
         query=state["query"],
-        compressed_context=state["compressed_context"],
-        debate_transcript=debate_transcript,
+        compressed_context=sections["context"],
+        debate_transcript=sections["transcript"],
     )
 
-    response = llm.invoke([
+    synthesis = invoke_structured(llm, "moderator", [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": user_msg},
-    ])
-
-    parsed = _parse_json(response.content)
-    synthesis = Synthesis(**parsed)
+    ], Synthesis)
     synthesis_dict = synthesis.model_dump()
 
     display_synthesis(synthesis_dict)
@@ -52,32 +53,3 @@ def should_research_more(state: ResearchState) -> str:
     if state.get("needs_more_research", False):
         return "researcher"
     return "publisher"
-
-
-def _format_debate_transcript(debate_rounds: list[dict]) -> str:
-    parts = []
-    for dr in debate_rounds:
-        parts.append(f"### Round {dr['round_num']}")
-        for arg in dr["arguments"]:
-            header = f"\n**{arg['agent']}** ({arg['role']})"
-            if arg.get("confidence"):
-                header += f" [confidence: {arg['confidence']:.1f}]"
-            parts.append(f"{header}:\n{arg['text']}")
-            # Include structured evidence if available
-            evidence = arg.get("evidence", [])
-            if evidence:
-                parts.append("\nStructured evidence:")
-                for e in evidence:
-                    parts.append(f"  - {e['claim']} (Fonte: {e['source']})")
-            unresolved = arg.get("unresolved_questions", [])
-            if unresolved:
-                parts.append("\nOpen questions:")
-                for q in unresolved:
-                    parts.append(f"  - {q}")
-    return "\n\n".join(parts)
-
-
-def _parse_json(text: str) -> dict:
-    cleaned = re.sub(r"```(?:json)?\s*", "", text)
-    cleaned = cleaned.strip().rstrip("`")
-    return json.loads(cleaned)
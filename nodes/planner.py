@@ -1,10 +1,8 @@
-import json
-import re
-
 from display import display_perspectives, display_step, display_subtopics
 from models_config import get_llm
 from prompts import load_prompt
-from state import Perspective, ResearchState
+from state import PlannerOutput, ResearchState
+from structured import invoke_structured
 
 
 def planner_node(state: ResearchState) -> dict:
@@ -13,18 +11,13 @@ def planner_node(state: ResearchState) -> dict:
     llm = get_llm("planner")
     system_msg, user_msg = load_prompt("planner", query=state["query"])
 
-    response = llm.invoke([
+    plan = invoke_structured(llm, "planner", [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": user_msg},
-    ])
-
-    parsed = _parse_json(response.content)
+    ], PlannerOutput)
 
-    subtopics = parsed["subtopics"]
-    perspectives = []
-    for p in parsed["perspectives"]:
-        perspective = Perspective(**p)
-        perspectives.append(perspective.model_dump())
+    subtopics = plan.subtopics
+    perspectives = [perspective.model_dump() for perspective in plan.perspectives]
 
     display_subtopics(subtopics)
     display_perspectives(perspectives)
@@ -33,10 +26,3 @@ def planner_node(state: ResearchState) -> dict:
         "subtopics": subtopics,
         "perspectives": perspectives,
     }
-
-
-def _parse_json(text: str) -> dict:
-    """Parse JSON from LLM response, stripping markdown code fences if present."""
-    cleaned = re.sub(r"```(?:json)?\s*", "", text)
-    cleaned = cleaned.strip().rstrip("`")
-    return json.loads(cleaned)
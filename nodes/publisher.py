@@ -1,24 +1,71 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from display import display_final_report_saved, display_step
-from models_config import get_llm
+from context_packer import pack_sections
+from display import (
+    display_final_report_saved,
+    display_report_chunk,
+    display_revision,
+    display_step,
+    display_stream_stats,
+)
+from models_config import get_agent_config, get_llm
+from nodes.evaluator import PASS_THRESHOLD
+from prescore import (
+    AGAINST_HINTS,
+    CITATIONS_PER_1K,
+    DATA_POINTS_PER_1K,
+    FAVOR_HINTS,
+    QUALITY_HINTS,
+    data_points,
+    find_section,
+    is_sources_section,
+    valid_citations,
+    word_count,
+)
 from prompts import load_prompt
+from report import split_sections
 from state import ResearchState
+from tracing import bind
 
 OUTPUT_FILE = "final_result.txt"
 
+# Report sections written from a single debater's perspective
+ROLE_SECTION_HINTS = {
+    "advocate": FAVOR_HINTS,
+    "critic": AGAINST_HINTS,
+    "analyst": QUALITY_HINTS,
+}
+
 
 def publisher_node(state: ResearchState) -> dict:
     display_step("PUBLISHER", "Generating final report")
 
     llm = get_llm("publisher")
+    output_path = Path(state.get("output_dir") or Path(__file__).parent.parent) / OUTPUT_FILE
 
-    debate_transcript = _format_debate_transcript(state.get("debate_rounds", []))
+    # On an evaluator rerun, rewrite only the sections the feedback is about
+    eval_feedback = state.get("evaluation_feedback", "")
+    if eval_feedback and state.get("final_report") and get_agent_config("publisher").get("section_revision", False):
+        targets = _sections_to_revise(state)
+        if targets:
+            report = _revise_sections(llm, state, targets)
+            _write_atomic(output_path, report)
+            display_final_report_saved(str(output_path))
+            return {"final_report": report}
+
+    sections = pack_sections(
+        "publisher",
+        debate_rounds=state.get("debate_rounds", []),
+        sources=state.get("sources", {}),
+        style="publisher",
+        prompt="publisher",
+    )
     synthesis_text = _format_synthesis(state.get("synthesis", {}))
-    sources_text = _format_sources(state.get("sources", []))
 
     # Build evaluation feedback if available (from Evaluator rerun)
-    eval_feedback = state.get("evaluation_feedback", "")
     if eval_feedback:
         eval_section = f"IMPORTANT — Previous evaluation feedback (improve these areas):\n{eval_feedback}"
     else:
@@ -28,41 +75,159 @@ def publisher_node(state: ResearchState) -> dict:
         "publisher",
         query=state["query"],
         synthesis=synthesis_text,
-        debate_transcript=debate_transcript,
-        sources=sources_text,
+        debate_transcript=sections["transcript"],
+        sources=sections["sources"],
         evaluation_feedback=eval_section,
     )
 
-    response = llm.invoke([
+    messages = [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": user_msg},
-    ])
+    ]
 
-    report = response.content
-    output_path = Path(__file__).parent.parent / OUTPUT_FILE
-    output_path.write_text(report, encoding="utf-8")
+    if get_agent_config("publisher").get("stream", False):
+        report = _stream_report(llm, messages, output_path)
+    else:
+        response = llm.invoke(messages)
+        report = response.content
+        output_path.write_text(report, encoding="utf-8")
 
     display_final_report_saved(str(output_path))
 
     return {"final_report": report}
 
 
-def _format_debate_transcript(debate_rounds: list[dict]) -> str:
-    parts = []
-    for dr in debate_rounds:
-        parts.append(f"### Round {dr['round_num']}")
-        for arg in dr["arguments"]:
-            header = f"\n**{arg['agent']}** ({arg['role']})"
-            if arg.get("confidence"):
-                header += f" [confidence: {arg['confidence']:.1f}]"
-            parts.append(f"{header}:\n{arg['text']}")
-            # Include structured evidence for citation generation
-            evidence = arg.get("evidence", [])
-            if evidence:
-                parts.append("\nCitable evidence:")
-                for e in evidence:
-                    parts.append(f"  - \"{e['claim']}\" — Fonte: {e['source']}")
-    return "\n\n".join(parts)
+def _stream_report(llm, messages: list[dict], output_path: Path) -> str:
+    """Stream the report to the console and to a partial file, then move it into place.
+
+    The previous report stays untouched until the new one is complete; if the
+    stream fails midway the partial file is left next to it for inspection.
+    """
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    chunks = []
+    output_tokens = 0
+    first_token_at = None
+    start = time.perf_counter()
+
+    with open(partial_path, "w", encoding="utf-8") as f:
+        for chunk in llm.stream(messages):
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                output_tokens = usage.get("output_tokens", output_tokens)
+            text = chunk.content
+            if not isinstance(text, str) or not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            f.write(text)
+            f.flush()
+            display_report_chunk(text)
+            chunks.append(text)
+
+    os.replace(partial_path, output_path)
+    elapsed = time.perf_counter() - start
+
+    # Without usage metadata, fall back to one token per streamed chunk
+    output_tokens = output_tokens or len(chunks)
+    ttft = (first_token_at or time.perf_counter()) - start
+    generation_time = elapsed - ttft
+    tokens_per_second = output_tokens / generation_time if generation_time > 0 else 0.0
+    display_stream_stats(ttft, output_tokens, tokens_per_second)
+
+    return "".join(chunks)
+
+
+def _sections_to_revise(state: ResearchState) -> dict[int, list[str]]:
+    """Map the evaluator's feedback to report sections: {section index: reasons}.
+
+    A section is targeted when the feedback names it, when it is itself weak on
+    a low-scoring dimension (citation or data density), when it is one side of
+    an unbalanced for/against pair, or when it covers the perspective of a
+    debater the feedback mentions.
+    """
+    evaluation = state.get("evaluation", {})
+    low = {dim for dim, score in evaluation.get("scores", {}).items() if score < PASS_THRESHOLD}
+    feedback = " ".join([state.get("evaluation_feedback", ""), *evaluation.get("justifications", {}).values()]).lower()
+    known_urls = {s["url"] for s in state.get("sources", {}).values()}
+
+    sections = split_sections(state["final_report"])
+    titles = [title for title, _ in sections if title and not is_sources_section(title)]
+    role_sections = {role: find_section(titles, hints) for role, hints in ROLE_SECTION_HINTS.items()}
+    mentioned_roles = {p["role"] for p in state.get("perspectives", []) if p["name"].lower() in feedback}
+
+    targets = {}
+    for i, (title, text) in enumerate(sections):
+        if not title or is_sources_section(title):
+            continue
+        words = max(word_count(text), 1)
+        reasons = []
+        if title.lower() in feedback:
+            reasons.append("named in feedback")
+        if "citations" in low and valid_citations(text, known_urls) * 1000 / words < CITATIONS_PER_1K:
+            reasons.append("few inline citations")
+        if "depth" in low and data_points(text) * 1000 / words < DATA_POINTS_PER_1K:
+            reasons.append("little concrete data")
+        if "balance" in low and title in (role_sections["advocate"], role_sections["critic"]):
+            reasons.append("for/against balance")
+        if "coverage" in low and any(role_sections.get(role) == title for role in mentioned_roles):
+            reasons.append("missing debater perspective")
+        if reasons:
+            targets[i] = reasons
+    return targets
+
+
+def _revise_sections(llm, state: ResearchState, targets: dict[int, list[str]]) -> str:
+    sections = split_sections(state["final_report"])
+    titles = [title for title, _ in sections]
+    display_revision([(titles[i], reasons) for i, reasons in targets.items()], len(sections))
+
+    sources_text = pack_sections(
+        "publisher", sources=state.get("sources", {}), prompt="publisher_revision",
+    )["sources"]
+
+    def revise(i: int) -> str:
+        title, text = sections[i]
+        # Sections written from one perspective only need that debater's arguments
+        role = next((r for r, hints in ROLE_SECTION_HINTS.items() if find_section([title], hints)), None)
+        rounds = state.get("debate_rounds", [])
+        if role:
+            rounds = [
+                {**dr, "arguments": [a for a in dr["arguments"] if a["role"] == role]}
+                for dr in rounds
+            ]
+        transcript = pack_sections(
+            "publisher", debate_rounds=rounds, style="publisher", prompt="publisher_revision",
+        )["transcript"]
+
+        system_msg, user_msg = load_prompt(
+            "publisher_revision",
+            query=state["query"],
+            feedback=state.get("evaluation_feedback", ""),
+            section=text.strip(),
+            debate_transcript=transcript,
+            sources=sources_text,
+        )
+        response = llm.invoke([
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg},
+        ])
+
+        revised = response.content.strip()
+        if not revised.startswith("## "):
+            revised = f"## {title}\n\n{revised}"
+        # Keep the spacing that separated this section from the next one
+        return revised + text[len(text.rstrip()):]
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        revised = dict(zip(targets, pool.map(bind(revise), targets)))
+
+    return "".join(revised.get(i, text) for i, (_, text) in enumerate(sections))
+
+
+def _write_atomic(path: Path, text: str):
+    partial_path = path.with_name(path.name + ".partial")
+    partial_path.write_text(text, encoding="utf-8")
+    os.replace(partial_path, path)
 
 
 def _format_synthesis(synthesis: dict) -> str:
@@ -80,15 +245,3 @@ def _format_synthesis(synthesis: dict) -> str:
         for item in synthesis["gaps"]:
             parts.append(f"- {item}")
     return "\n".join(parts)
-
-
-def _format_sources(sources: list[dict]) -> str:
-    seen = set()
-    parts = []
-    for s in sources:
-        url = s.get("url", "")
-        if url and url not in seen:
-            seen.add(url)
-            title = s.get("title", url)
-            parts.append(f"- [{title}]({url})")
-    return "\n".join(parts)
@@ -1,101 +1,183 @@
-import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from langchain_tavily import TavilySearch
-
-from display import display_search_done, display_search_progress, display_step
-from models_config import get_llm
+from display import display_covered_queries, display_search_done, display_search_progress, display_step
+from extraction import get_extraction_store
+from models_config import get_agent_config, get_llm
 from prompts import load_prompt
-from state import ResearchState, SearchResult, Source
-
-
-def _extract_relevant_content(llm, raw_content: str, topic: str, title: str) -> str:
-    """Extract the most relevant 500-800 tokens from raw page content."""
-    if not raw_content or len(raw_content) < 200:
-        return raw_content or ""
-
-    # Truncate very long pages to avoid exceeding context limits
-    truncated = raw_content[:15000]
+from search import tavily_search
+from similarity import jaccard, tokenize
+from sources import add_source, source_id
+from state import ResearchState, SearchResult
+from tracing import bind
+
+# Most relevant part of each page sent to the extraction LLM
+EXTRACTION_BUDGET_TOKENS = 3000
+
+# Gap queries at least this similar to an earlier query are not searched again
+COVERED_QUERY_SIMILARITY = 0.6
+
+EXTRACTOR_PROMPT = "You are a content extractor. Extract the most relevant information from the given web page content that relates to the research topic. Return only the extracted content — no commentary. Focus on facts, data, statistics, names, dates, and concrete evidence. Write 500-800 words."
+
+
+def _extract_pages(llm, pages: list[tuple[dict, str]], batch_size: int) -> list[str]:
+    """Format each (search result, topic) page for the summary prompt.
+
+    Full pages are reduced to their most relevant 500-800 words through the
+    extraction store; results without raw content fall back to the snippet.
+    """
+    full_pages = [(i, r, topic) for i, (r, topic) in enumerate(pages) if r.get("raw_content")]
+    store = get_extraction_store()
+
+    def extract(items: list[tuple[int, str]]) -> list[str]:
+        blocks = []
+        for n, excerpt in items:
+            _, r, topic = full_pages[n]
+            title = r.get("title", r.get("url", ""))
+            blocks.append(f"Research topic: {topic}\nSource: {title}\n\nPage content:\n{excerpt}")
+        return store.request_extractions(llm, EXTRACTOR_PROMPT, blocks, batch_size)
+
+    # Only the passages most relevant to the topic are sent, within the budget
+    extracted = store.get_or_extract_many(
+        [(r.get("url", ""), r["raw_content"], topic) for _, r, topic in full_pages],
+        EXTRACTION_BUDGET_TOKENS,
+        extract,
+        kind="research",
+    )
+    texts = {i: text for (i, _, _), text in zip(full_pages, extracted)}
+
+    parts = []
+    for i, (r, _) in enumerate(pages):
+        url = r.get("url", "")
+        title = r.get("title", url)
+        # Use raw_content (full page) when available, fall back to snippet
+        text = texts[i] if i in texts else r.get("content", "")
+        parts.append(f"[{title}] ({url}):\n{text}" if text else "")
+    return parts
+
+
+def _summarize(llm, topic: str, search_content: str) -> str:
+    system_msg, user_msg = load_prompt(
+        "researcher",
+        query=topic,
+        search_content=search_content,
+    )
 
     response = llm.invoke([
-        {
-            "role": "system",
-            "content": "You are a content extractor. Extract the most relevant information from the given web page content that relates to the research topic. Return only the extracted content — no commentary. Focus on facts, data, statistics, names, dates, and concrete evidence. Write 500-800 words.",
-        },
-        {
-            "role": "user",
-            "content": f"Research topic: {topic}\nSource: {title}\n\nPage content:\n{truncated}",
-        },
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
     ])
     return response.content
 
 
+def _find_covering_query(topic: str, previous_queries: list[str]) -> str | None:
+    """Return an earlier query that is a near-duplicate of `topic`, if any."""
+    topic_tokens = tokenize(topic)
+    for previous in previous_queries:
+        if jaccard(topic_tokens, tokenize(previous)) >= COVERED_QUERY_SIMILARITY:
+            return previous
+    return None
+
+
 def researcher_node(state: ResearchState) -> dict:
     display_step("RESEARCHER", "Searching and summarizing sources")
 
-    subtopics = state["subtopics"]
     llm = get_llm("researcher")
-    tavily = TavilySearch(max_results=5, include_raw_content="markdown")
-
-    all_results: list[dict] = state.get("search_results", [])
-    all_sources: list[dict] = state.get("sources", [])
-
-    for i, topic in enumerate(subtopics, 1):
-        display_search_progress(topic, i, len(subtopics))
-
-        # Search with Tavily
-        raw_response = tavily.invoke(topic)
-        raw_results = raw_response.get("results", []) if isinstance(raw_response, dict) else []
-
-        # Extract sources and content
-        topic_sources = []
-        search_content_parts = []
-        for r in raw_results:
-            url = r.get("url", "")
-            title = r.get("title", url)
-            raw_content = r.get("raw_content", "")
-            content = r.get("content", "")
-            if url:
-                source = Source(url=url, title=title, used_in=topic)
-                topic_sources.append(source.model_dump())
-                all_sources.append(source.model_dump())
-
-            # Use raw_content (full page) when available, fall back to snippet
-            if raw_content:
-                extracted = _extract_relevant_content(llm, raw_content, topic, title)
-                search_content_parts.append(f"[{title}] ({url}):\n{extracted}")
-            elif content:
-                search_content_parts.append(f"[{title}] ({url}):\n{content}")
-
-        search_content = "\n\n---\n\n".join(search_content_parts)
+    config = get_agent_config("researcher")
+    max_concurrency = config.get("max_concurrency", 1)
+    batch_size = config.get("extraction_batch_size", 1)
+
+    known_sources: dict[str, dict] = state.get("sources", {})
+
+    # On a gap-research pass only research what earlier passes didn't cover:
+    # near-duplicate queries are skipped and already-known pages are dropped.
+    previous_queries = [r["query"] for r in state.get("search_results", [])]
+    subtopics = []
+    covered = []
+    for topic in state["subtopics"]:
+        covering = _find_covering_query(topic, previous_queries)
+        if covering:
+            covered.append((topic, f"similar to \"{covering}\""))
+        else:
+            subtopics.append(topic)
+
+    # Each stage fans out over a bounded pool; results are kept in input order,
+    # so results, sources and context come out the same as a sequential run.
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        # Search with Tavily, reporting each search as it finishes
+        futures = {pool.submit(bind(tavily_search), topic): i for i, topic in enumerate(subtopics)}
+        searched: list[list[dict]] = [[] for _ in subtopics]
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            searched[i] = future.result()
+            display_search_progress(subtopics[i], done, len(subtopics), len(searched[i]))
+
+        topics = []
+        topic_results = []
+        for topic, raw_results in zip(subtopics, searched):
+            new_results = [r for r in raw_results if source_id(r.get("url", "")) not in known_sources]
+            if raw_results and not new_results:
+                covered.append((topic, "all sources already known"))
+                continue
+            topics.append(topic)
+            topic_results.append(new_results)
+
+        # Extract content from every page of every subtopic, `batch_size` pages per request
+        pages = [
+            (r, topic)
+            for topic, raw_results in zip(topics, topic_results)
+            for r in raw_results
+        ]
+        chunks = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+        page_parts = [
+            part
+            for parts in pool.map(bind(lambda chunk: _extract_pages(llm, chunk, batch_size)), chunks)
+            for part in parts
+        ]
+
+        search_contents = []
+        offset = 0
+        for raw_results in topic_results:
+            parts = [p for p in page_parts[offset:offset + len(raw_results)] if p]
+            search_contents.append("\n\n---\n\n".join(parts))
+            offset += len(raw_results)
 
         # Summarize with LLM
-        system_msg, user_msg = load_prompt(
-            "researcher",
-            query=topic,
-            search_content=search_content,
-        )
-
-        response = llm.invoke([
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ])
-
+        summaries = list(pool.map(
+            bind(lambda item: _summarize(llm, *item)), zip(topics, search_contents)
+        ))
+
+    if covered:
+        display_covered_queries(covered)
+
+    new_sources: dict[str, dict] = {}
+    new_results = []
+    for topic, raw_results, summary in zip(topics, topic_results, summaries):
+        source_ids = [
+            add_source(new_sources, r["url"], r.get("title", r["url"]), topic)
+            for r in raw_results
+            if r.get("url")
+        ]
         result = SearchResult(
             query=topic,
-            sources=topic_sources,
-            summary=response.content,
+            source_ids=list(dict.fromkeys(source_ids)),
+            summary=summary,
         )
-        all_results.append(result.model_dump())
+        new_results.append(result.model_dump())
 
-    display_search_done(len(all_sources))
+    display_search_done(len(known_sources) + len(new_sources))
 
-    # Build organized context by subtopic (no lossy compression)
+    # Build organized context by subtopic (no lossy compression). Earlier
+    # passes are already in compressed_context, so only new sections are added.
+    new_context = "\n\n".join(
+        f"## {r['query']}\n{r['summary']}" for r in new_results
+    )
     compressed_context = "\n\n".join(
-        f"## {r['query']}\n{r['summary']}" for r in all_results
+        part for part in (state.get("compressed_context", ""), new_context) if part
     )
 
+    # Only the additions: the state reducers append and merge them
     return {
-        "search_results": all_results,
+        "search_results": new_results,
         "compressed_context": compressed_context,
-        "sources": all_sources,
+        "sources": new_sources,
     }
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+
+from report import split_sections
+from similarity import tokenize
+
+AGREEMENT_LOG = Path(__file__).parent / ".cache" / "prescore_agreement.jsonl"
+
+# Inline citations and concrete data per 1000 words that earn a 10
+CITATIONS_PER_1K = 8.0
+DATA_POINTS_PER_1K = 15.0
+
+# Share of clear passes and clear failures still checked by the LLM, so the
+# thresholds that skip it are measured on the reports they actually decide
+AUDIT_RATE = 0.1
+
+# An argument counts as covered when this share of its words shows up in the report
+ARGUMENT_COVERAGE = 0.5
+
+_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_DATA_RE = re.compile(r"\b\d[\d.,]*\s*%?|\b(?:1[89]|20)\d{2}\b")
+_WORD_RE = re.compile(r"\w+")
+
+FAVOR_HINTS = ("favor", "favour", "favorável", "prós", "benefit", "advantage")
+AGAINST_HINTS = ("counter", "contra", "risk", "risco", "against")
+QUALITY_HINTS = ("quality", "qualidade", "calidad")
+
+_SOURCES_TITLES = {"sources", "references", "bibliography", "fontes", "referências", "bibliografia", "fuentes", "referencias"}
+
+
+def find_section(titles, hints: tuple[str, ...]):
+    """First title containing any of `hints` (case-insensitive), or None."""
+    for title in titles:
+        if any(h in title.lower() for h in hints):
+            return title
+    return None
+
+
+def is_sources_section(title: str) -> bool:
+    """Whether `title` is the trailing source list (not e.g. "Source Quality Analysis")."""
+    return title.strip().lower() in _SOURCES_TITLES
+
+
+def valid_citations(text: str, known_urls: set[str]) -> int:
+    """Inline [Title](url) links in `text` that point to a collected source."""
+    return sum(1 for _, url in _LINK_RE.findall(text) if url in known_urls)
+
+
+def data_points(text: str) -> int:
+    """Numbers, percentages and years in `text`."""
+    return len(_DATA_RE.findall(text))
+
+
+def word_count(text: str) -> int:
+    return len(_WORD_RE.findall(text))
+
+
+def prescore_report(report: str, state: dict) -> dict:
+    """Score a report on the evaluator's dimensions without an LLM.
+
+    Returns {"scores", "average", "justifications", "feedback"} in the same
+    shape as the evaluator's output. Scores are deterministic and based on
+    inline citations to known sources, coverage of each debater's main
+    argument, the balance of the for/against sections and the density of
+    numbers and dates.
+    """
+    sections = {title: text for title, text in split_sections(report) if title}
+    body = "".join(text for title, text in split_sections(report) if not is_sources_section(title))
+    words = max(word_count(body), 1)
+
+    # Citations: inline links to URLs we actually collected
+    known_urls = {s["url"] for s in state.get("sources", {}).values()}
+    links = _LINK_RE.findall(body)
+    valid = valid_citations(body, known_urls)
+    citation_density = valid * 1000 / words
+    citations = min(10.0, 10.0 * citation_density / CITATIONS_PER_1K)
+
+    # Coverage: each debater's main argument should be reflected in the text
+    report_tokens = tokenize(report)
+    arguments = [
+        arg for dr in state.get("debate_rounds", []) for arg in dr["arguments"]
+        if arg.get("main_argument")
+    ]
+    uncovered = []
+    for arg in arguments:
+        arg_tokens = tokenize(arg["main_argument"])
+        if arg_tokens and len(arg_tokens & report_tokens) / len(arg_tokens) < ARGUMENT_COVERAGE:
+            uncovered.append(arg["agent"])
+    coverage = 10.0 * (1 - len(uncovered) / len(arguments)) if arguments else 5.0
+
+    # Balance: for and against sections of comparable length
+    favor = find_section(sections, FAVOR_HINTS)
+    against = find_section(sections, AGAINST_HINTS)
+    if favor is None or against is None:
+        balance = 5.0
+    else:
+        favor_words = word_count(sections[favor])
+        against_words = word_count(sections[against])
+        balance = 10.0 * min(favor_words, against_words) / max(favor_words, against_words, 1)
+
+    # Depth: numbers, percentages and years
+    data_density = data_points(body) * 1000 / words
+    depth = min(10.0, 10.0 * data_density / DATA_POINTS_PER_1K)
+
+    scores = {
+        "coverage": round(coverage, 1),
+        "balance": round(balance, 1),
+        "citations": round(citations, 1),
+        "depth": round(depth, 1),
+    }
+    justifications = {
+        "coverage": f"{len(arguments) - len(uncovered)}/{len(arguments)} debater arguments reflected in the report",
+        "balance": "for/against sections missing" if favor is None or against is None
+        else "relative length of the for and against sections",
+        "citations": f"{valid} inline citations to collected sources ({citation_density:.1f} per 1000 words, {len(links) - valid} unknown links)",
+        "depth": f"{data_density:.1f} numbers, percentages and dates per 1000 words",
+    }
+
+    feedback = []
+    if scores["coverage"] < 7 and uncovered:
+        feedback.append(f"Represent the arguments of {', '.join(dict.fromkeys(uncovered))} in more detail.")
+    if scores["balance"] < 7:
+        feedback.append("Give the arguments in favor and the counter-arguments comparable depth and length.")
+    if scores["citations"] < 7:
+        feedback.append(
+            f"Cite sources inline with [Title](url) using the provided source URLs — aim for at least "
+            f"{CITATIONS_PER_1K:.0f} citations per 1000 words."
+        )
+    if scores["depth"] < 7:
+        feedback.append("Add concrete data: statistics, percentages, names and dates from the debate evidence.")
+
+    return {
+        "scores": scores,
+        "average": round(sum(scores.values()) / len(scores), 2),
+        "justifications": justifications,
+        "feedback": " ".join(feedback),
+    }
+
+
+def audit_sample(report: str, rate: float) -> bool:
+    """Whether a clear pass or clear failure goes to the LLM anyway, for `rate` of reports.
+
+    Keyed by the report text, so the same report is always treated the same way.
+    """
+    digest = hashlib.sha256(report.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") < rate * 2**32
+
+
+def record_agreement(local: dict, llm: dict, threshold: float, band: str = "borderline", weight: float = 1.0) -> dict:
+    """Append local vs LLM scores to the agreement log and return running totals.
+
+    `band` is how the local pre-score classified the report ("pass", "fail"
+    or "borderline") and `weight` the number of reports the entry stands for
+    (1 / audit rate for sampled clear-cut ones). Agreement and error are
+    weighted, so they estimate accuracy over every report rather than only
+    the borderline ones; "bands" has the unweighted agreement per band.
+    """
+    entry = {
+        "time": time.time(),
+        "band": band,
+        "weight": weight,
+        "local": local["scores"],
+        "llm": llm.get("scores", {}),
+        "local_average": local["average"],
+        "llm_average": llm.get("average", 0.0),
+        "agree": (local["average"] >= threshold) == (llm.get("average", 0.0) >= threshold),
+    }
+    AGREEMENT_LOG.parent.mkdir(parents=True, exist_ok=True)
+    with open(AGREEMENT_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    total = 0
+    weights = agreed = abs_error = 0.0
+    bands: dict[str, dict] = {}
+    with open(AGREEMENT_LOG, encoding="utf-8") as f:
+        for line in f:
+            e = json.loads(line)
+            # Entries logged before sampling existed were all borderline
+            w = e.get("weight", 1.0)
+            total += 1
+            weights += w
+            agreed += w * e["agree"]
+            abs_error += w * abs(e["local_average"] - e["llm_average"])
+            counts = bands.setdefault(e.get("band", "borderline"), {"runs": 0, "agreed": 0})
+            counts["runs"] += 1
+            counts["agreed"] += e["agree"]
+    return {
+        "runs": total,
+        "agreement": agreed / weights,
+        "mean_abs_error": abs_error / weights,
+        "bands": {name: {"runs": c["runs"], "agreement": c["agreed"] / c["runs"]} for name, c in bands.items()},
+    }
@@ -1,29 +1,102 @@
 import re
+import threading
 from pathlib import Path
 
 _PROMPTS_DIR = Path(__file__).parent / "prompts"
 
+# `{name}` is a slot; `{{` and `}}` are literal braces (e.g. JSON examples)
+_SLOT_RE = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+_TAG_RES = {tag: re.compile(rf"<{tag}>(.*?)</{tag}>", re.DOTALL) for tag in ("system", "user")}
+
+
+class PromptTemplate:
+    """An XML prompt parsed once into literal segments and variable slots.
+
+    `system` and `user` are lists alternating literal text and slot names:
+    [text, name, text, name, ..., text]. Rendering joins them in one pass,
+    so injected values are never scanned for placeholders or tags.
+    """
+
+    def __init__(self, name: str, content: str, mtime: float):
+        self.name = name
+        self.mtime = mtime
+        self.system = _compile(_extract_tag(content, "system"))
+        self.user = _compile(_extract_tag(content, "user"))
+        self.variables = frozenset(self.system[1::2]) | frozenset(self.user[1::2])
+        self._static_tokens: dict[str | None, int] = {}
+
+    def render(self, **variables: str) -> tuple[str, str]:
+        missing = self.variables - variables.keys()
+        extra = variables.keys() - self.variables
+        if missing or extra:
+            problems = []
+            if missing:
+                problems.append(f"missing {', '.join(sorted(missing))}")
+            if extra:
+                problems.append(f"unexpected {', '.join(sorted(extra))}")
+            raise ValueError(f"Prompt '{self.name}': {'; '.join(problems)}")
+
+        values = {key: str(value) for key, value in variables.items()}
+        return _render(self.system, values), _render(self.user, values)
+
+    def static_tokens(self, model: str | None = None) -> int:
+        """Tokens in the template text itself, i.e. the prompt with every slot empty."""
+        if model not in self._static_tokens:
+            # Imported here: context_packer pulls in the model config and the UI
+            from context_packer import count_tokens
+            from ranking import estimate_tokens
+
+            text = "".join(self.system[0::2]) + "".join(self.user[0::2])
+            self._static_tokens[model] = count_tokens(text, model) if model else estimate_tokens(text)
+        return self._static_tokens[model]
+
+
+_templates: dict[str, PromptTemplate] = {}
+_lock = threading.Lock()
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Compiled template for prompts/<name>.xml, recompiled when the file changes."""
+    path = _PROMPTS_DIR / f"{name}.xml"
+    mtime = path.stat().st_mtime
+    with _lock:
+        template = _templates.get(name)
+        if template is None or template.mtime != mtime:
+            template = _templates[name] = PromptTemplate(name, path.read_text(encoding="utf-8"), mtime)
+        return template
+
 
 def load_prompt(name: str, **variables: str) -> tuple[str, str]:
     """Load an XML prompt file and return (system_message, user_message).
 
-    Variables in the prompt are replaced using {variable_name} syntax.
+    Variables in the prompt are replaced using {variable_name} syntax. Every
+    variable the prompt uses must be given, and no others.
     """
-    path = _PROMPTS_DIR / f"{name}.xml"
-    content = path.read_text(encoding="utf-8")
+    return get_template(name).render(**variables)
+
 
-    for key, value in variables.items():
-        content = content.replace(f"{{{key}}}", str(value))
+def _compile(text: str) -> list[str]:
+    parts = [""]
+    pos = 0
+    for match in _SLOT_RE.finditer(text):
+        parts[-1] += text[pos:match.start()]
+        if match.group(1) is None:
+            parts[-1] += match.group(0)[0]
+        else:
+            parts.extend([match.group(1), ""])
+        pos = match.end()
+    parts[-1] += text[pos:]
+    return parts
 
-    system = _extract_tag(content, "system")
-    user = _extract_tag(content, "user")
 
-    return system, user
+def _render(parts: list[str], values: dict[str, str]) -> str:
+    out = parts[:]
+    out[1::2] = [values[name] for name in parts[1::2]]
+    return "".join(out)
 
 
 def _extract_tag(content: str, tag: str) -> str:
-    pattern = rf"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, content, re.DOTALL)
+    match = _TAG_RES[tag].search(content)
     if not match:
         return ""
     return match.group(1).strip()
@@ -0,0 +1,105 @@
+import math
+import re
+from collections import Counter
+
+from similarity import words
+
+PASSAGE_CHARS = 800
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), cheap enough for any page size."""
+    return len(text) // 4
+
+
+def split_passages(markdown: str, target_chars: int = PASSAGE_CHARS) -> list[str]:
+    """Split a page into passages of roughly `target_chars`.
+
+    Consecutive short paragraphs (headings, list items) are merged so a heading
+    stays with the text under it; paragraphs far over the target are cut at
+    whitespace.
+    """
+    passages = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(markdown):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > 2 * target_chars:
+            cut = paragraph.rfind(" ", 0, target_chars)
+            cut = cut if cut > 0 else target_chars
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        if current and len(current) + len(paragraph) > target_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(passages: list[str], query: str, k1: float = BM25_K1, b: float = BM25_B) -> list[float]:
+    """Okapi BM25 score of each passage against the query, with the page as corpus."""
+    query_terms = set(words(query))
+    if not passages or not query_terms:
+        return [0.0] * len(passages)
+
+    term_counts = [Counter(words(p)) for p in passages]
+    lengths = [sum(c.values()) for c in term_counts]
+    avg_length = (sum(lengths) / len(lengths)) or 1.0
+    n = len(passages)
+
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for c in term_counts if term in c)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    scores = []
+    for counts, length in zip(term_counts, lengths):
+        score = 0.0
+        norm = k1 * (1 - b + b * length / avg_length)
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def select_passages(content: str, topic: str, budget_tokens: int) -> str:
+    """Keep the passages most relevant to `topic` within `budget_tokens`.
+
+    Pages already within budget are returned whole. Otherwise passages are
+    taken best-first (only those matching the topic at all) and put back in
+    page order; if nothing matches, this degrades to the leading passages.
+    """
+    if estimate_tokens(content) <= budget_tokens:
+        return content
+
+    passages = split_passages(content)
+    scores = bm25_scores(passages, topic)
+    ranked = sorted(
+        (i for i, score in enumerate(scores) if score > 0),
+        key=lambda i: scores[i],
+        reverse=True,
+    )
+    if not ranked:
+        ranked = list(range(len(passages)))
+
+    chosen = []
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(passages[i])
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(i)
+        used += cost
+    return "\n\n".join(passages[i] for i in sorted(chosen))
@@ -0,0 +1,285 @@
+import random
+import threading
+import time
+
+import tracing
+from runscope import scoped
+
+# Used for endpoints without an entry under "endpoints" in models.json
+DEFAULT_ENDPOINT = {
+    "requests_per_second": None,
+    "burst": 1,
+    "initial_concurrency": None,
+    "max_concurrency": None,
+    "max_retries": 3,
+    "backoff_seconds": 1.0,
+    "max_backoff_seconds": 60.0,
+}
+
+# Per-run counters for each endpoint (see runscope)
+ENDPOINT_STATS = ("calls", "retries", "throttled", "failures", "queue_seconds", "request_seconds")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Consecutive throttling responses within this window count as one backoff signal
+DECREASE_INTERVAL = 1.0
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, burst: int = 1):
+        """Change the rate and burst; tokens accrued so far are kept, up to the new burst."""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = max(burst, 1)
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the time waited."""
+        with self._lock:
+            self._refill()
+            # Reserve the token now so waiters are served in arrival order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: +1 per limit's worth of successes, halved when throttled."""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(initial, maximum))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def configure(self, maximum: int, initial: int | None = None):
+        """Cap the limit at a new `maximum`, and raise it to `initial` if given."""
+        with self._cond:
+            self.maximum = maximum
+            self.limit = float(min(max(self.limit, initial or 0), maximum))
+            self._cond.notify_all()
+
+    def acquire(self) -> float:
+        start = time.perf_counter()
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return time.perf_counter() - start
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= DECREASE_INTERVAL:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class Endpoint:
+    """Throttling, retry and accounting for one base_url + API key.
+
+    `call(fn)` waits for a concurrency slot and a rate token (queue time),
+    runs `fn` (request time) and retries retryable errors with full-jitter
+    exponential backoff, honouring Retry-After when the error carries one.
+    """
+
+    def __init__(self, name: str, config: dict):
+        self.name = name
+        self.config: dict = {}
+        self.bucket: TokenBucket | None = None
+        self.limiter: AdaptiveLimiter | None = None
+        self.configure(config)
+
+    def configure(self, config: dict):
+        """Apply (new) settings from models.json.
+
+        The token bucket and concurrency limiter are updated in place, so calls
+        already waiting or running keep their tokens and slots, and the limit
+        learned so far is kept unless the starting concurrency changed.
+        """
+        previous, self.config = self.config, {**DEFAULT_ENDPOINT, **config}
+        rate = self.config["requests_per_second"]
+        if not rate:
+            self.bucket = None
+        elif self.bucket is None:
+            self.bucket = TokenBucket(rate, self.config["burst"])
+        else:
+            self.bucket.configure(rate, self.config["burst"])
+        maximum = self.config["max_concurrency"]
+        initial = self.config["initial_concurrency"] or maximum
+        if not maximum:
+            self.limiter = None
+        elif self.limiter is None:
+            self.limiter = AdaptiveLimiter(initial, maximum)
+        else:
+            # Without initial_concurrency the limit starts at max_concurrency
+            previous_initial = previous.get("initial_concurrency") or previous.get("max_concurrency")
+            self.limiter.configure(maximum, initial if initial != previous_initial else None)
+
+    def call(self, fn):
+        """Run `fn()` under this endpoint's limits; returns its result."""
+        for attempt in range(self.config["max_retries"] + 1):
+            limiter = self.limiter  # released on the one acquired, even if settings change meanwhile
+            queued = self._acquire(limiter)
+            start = time.perf_counter()
+            throttled = False
+            try:
+                return fn()
+            except Exception as e:
+                retryable, throttled = classify_error(e)
+                if not retryable or attempt == self.config["max_retries"]:
+                    self._record(failures=1)
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                if limiter:
+                    limiter.release(throttled)
+                self._record(
+                    calls=1,
+                    throttled=int(throttled),
+                    queue_seconds=queued,
+                    request_seconds=time.perf_counter() - start,
+                )
+            self._record(retries=1)
+            tracing.add(retries=1)
+            time.sleep(delay)
+
+    def stream(self, fn):
+        """Like `call`, for a function returning an iterator.
+
+        Retries only happen before the first item: once output has been
+        yielded, an error is raised to the caller.
+        """
+        for attempt in range(self.config["max_retries"] + 1):
+            limiter = self.limiter  # released on the one acquired, even if settings change meanwhile
+            queued = self._acquire(limiter)
+            start = time.perf_counter()
+            throttled = False
+            started = False
+            try:
+                for item in fn():
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                retryable, throttled = classify_error(e)
+                if started or not retryable or attempt == self.config["max_retries"]:
+                    self._record(failures=1)
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                if limiter:
+                    limiter.release(throttled)
+                self._record(
+                    calls=1,
+                    throttled=int(throttled),
+                    queue_seconds=queued,
+                    request_seconds=time.perf_counter() - start,
+                )
+            self._record(retries=1)
+            tracing.add(retries=1)
+            time.sleep(delay)
+
+    def concurrency(self) -> float | None:
+        """Current concurrency limit (None when unlimited)."""
+        return round(self.limiter.limit, 1) if self.limiter else None
+
+    def _acquire(self, limiter: AdaptiveLimiter | None) -> float:
+        waited = limiter.acquire() if limiter else 0.0
+        bucket = self.bucket
+        if bucket:
+            waited += bucket.acquire()
+        tracing.add(queue_seconds=waited)
+        return waited
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        cap = min(self.config["max_backoff_seconds"], self.config["backoff_seconds"] * 2 ** attempt)
+        return max(random.uniform(0, cap), _retry_after(error))
+
+    def _record(self, **counts):
+        # Counted for the current run; the limits above are shared by every run
+        with _stats_lock:
+            stats = scoped("endpoint_stats", dict).setdefault(self.name, dict.fromkeys(ENDPOINT_STATS, 0))
+            for key, value in counts.items():
+                stats[key] += value
+
+
+def classify_error(error: Exception) -> tuple[bool, bool]:
+    """(retryable, throttled) for an exception from a provider or search client."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS, status == 429
+
+    name = type(error).__name__
+    message = str(error).lower()
+    if "RateLimit" in name or "429" in message or "rate limit" in message:
+        return True, True
+    if isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name:
+        return True, False
+    return False, False
+
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_endpoints: dict[tuple, Endpoint] = {}
+_endpoints_lock = threading.Lock()
+_stats_lock = threading.Lock()
+
+
+def get_endpoint(name: str, key_id: str, config: dict) -> Endpoint:
+    """Shared Endpoint for `name` (a base_url or service) and API key `key_id`.
+
+    `config` is the endpoint's current entry in models.json; when it differs
+    from the one the endpoint was set up with (the file was edited and
+    reloaded), the new limits are applied in place.
+    """
+    with _endpoints_lock:
+        endpoint = _endpoints.get((name, key_id))
+        if endpoint is None:
+            endpoint = _endpoints[(name, key_id)] = Endpoint(name, config)
+        elif endpoint.config != {**DEFAULT_ENDPOINT, **config}:
+            endpoint.configure(config)
+        return endpoint
+
+
+def get_endpoint_stats() -> dict[str, dict]:
+    """Call counters of the endpoints used in the current run, summed over API keys."""
+    with _stats_lock:
+        totals = {name: dict(stats) for name, stats in scoped("endpoint_stats", dict).items()}
+    with _endpoints_lock:
+        endpoints = list(_endpoints.values())
+    for endpoint in endpoints:
+        if endpoint.name in totals:
+            totals[endpoint.name].setdefault("concurrency", endpoint.concurrency())
+    return totals
@@ -0,0 +1,21 @@
+import re
+
+_HEADING_RE = re.compile(r"^## .*$", re.MULTILINE)
+
+
+def split_sections(report: str) -> list[tuple[str, str]]:
+    """Split a Markdown report on its "## " headings.
+
+    Returns (title, text) pairs whose texts concatenate back to the report
+    exactly. Anything before the first heading (the "# " title) comes first
+    with an empty title.
+    """
+    starts = [m.start() for m in _HEADING_RE.finditer(report)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(report)]):
+        text = report[start:end]
+        title = text.split("\n", 1)[0][3:].strip() if text.startswith("## ") else ""
+        sections.append((title, text))
+    return sections
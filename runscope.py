@@ -0,0 +1,33 @@
+import contextvars
+import threading
+from collections.abc import Callable
+from contextlib import contextmanager
+
+# State that belongs to one run (the extraction store, per-run counters).
+# A contextvar like tracing's, so concurrent runs (batch, service) never mix;
+# code running outside any run shares the process-wide scope.
+_scope: contextvars.ContextVar = contextvars.ContextVar("run_scope", default=None)
+_process: dict[str, object] = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def run_scope():
+    """Give everything run inside the block its own per-run state, dropped on exit."""
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def scoped(name: str, factory: Callable[[], object]):
+    """The current run's `name` value, made with `factory()` the first time it is asked for."""
+    values = _scope.get()
+    if values is None:
+        values = _process
+    with _lock:
+        value = values.get(name)
+        if value is None:
+            value = values[name] = factory()
+        return value
@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from cache import DiskCache, make_key
+from models_config import get_agent_config, get_endpoint_config
+from ratelimit import get_endpoint
+from runscope import scoped
+from tracing import annotate, call
+
+SEARCH_TTL_SECONDS = 3600
+
+_clients: dict[tuple, object] = {}
+_memory: dict[str, tuple[float, list[dict]]] = {}
+_inflight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+_backend = None
+
+_store = DiskCache("search")
+_STATS = ("requests", "memory_hits", "store_hits", "coalesced")
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as cache key."""
+    return re.sub(r"\s+", " ", query.strip().strip('"').lower())
+
+
+def tavily_search(query: str, max_results: int = 5, include_raw_content: str = "markdown") -> list[dict]:
+    """Search Tavily and return the result dicts.
+
+    Identical queries (after normalization) with the same parameters are served
+    from memory for `ttl_seconds`, and concurrent identical queries share one
+    request. With `persist` enabled in the "search" entry of models.json,
+    results also go to the local store so repeat runs skip the API. Failed
+    searches raise and empty results are never cached.
+    """
+    with call("search", "tavily", query=query):
+        return _search(query, max_results, include_raw_content)
+
+
+def _search(query: str, max_results: int, include_raw_content: str) -> list[dict]:
+    config = get_agent_config("search")
+    ttl_seconds = config.get("ttl_seconds", SEARCH_TTL_SECONDS)
+    key = make_key({
+        "query": normalize_query(query),
+        "max_results": max_results,
+        "include_raw_content": include_raw_content,
+    })
+
+    with _lock:
+        entry = _memory.get(key)
+        if entry and entry[0] > time.time():
+            _run_stats()["memory_hits"] += 1
+            annotate(cache="memory")
+            return entry[1]
+
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+        else:
+            _run_stats()["coalesced"] += 1
+
+    if not owner:
+        annotate(cache="coalesced")
+        return future.result()
+
+    # Results from a stub backend never go to the persisted store
+    persist = config.get("persist") and _backend is None
+    try:
+        results = _store.get(key) if persist else None
+        if results is not None:
+            annotate(cache="store")
+            with _lock:
+                _run_stats()["store_hits"] += 1
+        else:
+            annotate(cache="miss")
+            # A stub backend goes through the same limits as Tavily
+            backend = _backend or _tavily
+            endpoint = get_endpoint("tavily", "TAVILY_API_KEY", get_endpoint_config("tavily"))
+            results = endpoint.call(lambda: backend(query, max_results, include_raw_content))
+            with _lock:
+                _run_stats()["requests"] += 1
+            # An empty answer may be a transient failure; don't pin it for ttl_seconds
+            if persist and results:
+                _store.set(key, results, ttl_seconds)
+
+        if results:
+            now = time.time()
+            with _lock:
+                # Entries are shared by every run in the process; drop expired ones as we go
+                for expired in [k for k, (expires, _) in _memory.items() if expires <= now]:
+                    del _memory[expired]
+                _memory[key] = (now + ttl_seconds, results)
+        future.set_result(results)
+        return results
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def get_search_stats() -> dict:
+    """Search counters for the current run (see runscope)."""
+    with _lock:
+        return dict(_run_stats())
+
+
+def set_search_backend(backend):
+    """Answer searches with `backend(query, max_results, include_raw_content)` instead of Tavily; None restores Tavily."""
+    global _backend
+    _backend = backend
+    clear_search_cache()
+
+
+def _run_stats() -> dict:
+    return scoped("search_stats", lambda: dict.fromkeys(_STATS, 0))
+
+
+def clear_search_cache():
+    """Drop in-memory results (the persisted store is left alone)."""
+    with _lock:
+        _memory.clear()
+
+
+def _tavily(query: str, max_results: int, include_raw_content: str) -> list[dict]:
+    from langchain_core.tools import ToolException
+
+    try:
+        response = _client(max_results, include_raw_content).invoke(query)
+    except ToolException:
+        # Raised by langchain_tavily when the search finds nothing
+        return []
+    if not isinstance(response, dict):
+        return []
+    # Other failures (429, timeouts, 5xx) are returned as {"error": ...}; raise
+    # them so the endpoint can classify, back off and retry
+    error = response.get("error")
+    if error:
+        raise error if isinstance(error, Exception) else RuntimeError(str(error))
+    return response.get("results", [])
+
+
+def _client(max_results: int, include_raw_content: str):
+    params = (max_results, include_raw_content)
+    with _lock:
+        if params not in _clients:
+            # langchain_tavily is slow to import; only pay for it on the first real search
+            from langchain_tavily import TavilySearch
+
+            _clients[params] = TavilySearch(max_results=max_results, include_raw_content=include_raw_content)
+        return _clients[params]
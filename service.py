@@ -0,0 +1,402 @@
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from runscope import run_scope  # noqa: E402
+from tracing import run_trace  # noqa: E402
+
+JOBS_DIR = Path(__file__).parent / "service_runs"
+
+# Overridable in the "service" entry of models.json
+SERVICE_DEFAULTS = {
+    "max_concurrent_jobs": 4,
+    "max_jobs_per_client": 2,
+    "max_queued_per_client": 20,
+    "retain_finished_seconds": 3600,
+    "max_finished_jobs": 500,
+}
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+# A job only moves forward through these; terminal statuses are final
+STATUS_ORDER = {"queued": 0, "running": 1, **{status: 2 for status in TERMINAL_STATUSES}}
+KEEPALIVE_SECONDS = 15
+MAX_BODY_BYTES = 64 * 1024
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """One research query and everything streamed from it so far."""
+
+    def __init__(self, client: str, query: str, output_dir: Path):
+        self.id = uuid.uuid4().hex[:12]
+        self.client = client
+        self.query = query
+        self.output_dir = output_dir / self.id
+        self.status = "queued"
+        self.error = ""
+        self.final_report = ""
+        self.evaluation: dict = {}
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.cancel_requested = threading.Event()
+        self._events: list[tuple[str, dict]] = []
+        self._changed = threading.Condition()
+
+    def emit(self, event: str, data: dict):
+        with self._changed:
+            self._events.append((event, data))
+            self._changed.notify_all()
+
+    def set_status(self, status: str, **data) -> bool:
+        """Move to `status` and emit it; ignored (False) if the job is finished or already past it."""
+        with self._changed:
+            if self.status in TERMINAL_STATUSES or STATUS_ORDER[status] < STATUS_ORDER[self.status]:
+                return False
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            elif status in TERMINAL_STATUSES:
+                self.finished_at = time.time()
+            self.emit("status", {"status": status, **data})
+            return True
+
+    def events_since(self, index: int, timeout: float) -> list[tuple[str, dict]]:
+        """Events after the first `index`, waiting up to `timeout` for new ones."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: len(self._events) > index or self.status in TERMINAL_STATUSES,
+                timeout,
+            )
+            return self._events[index:]
+
+    def summary(self) -> dict:
+        summary = {
+            "id": self.id,
+            "client": self.client,
+            "query": self.query,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error:
+            summary["error"] = self.error
+        if self.status == "done":
+            summary["final_report"] = self.final_report
+            summary["evaluation"] = self.evaluation
+        return summary
+
+
+class JobQueue:
+    """FIFO job queue with a global and a per-client limit on running jobs.
+
+    A queued job starts as soon as a slot is free and its client is below
+    `max_jobs_per_client`; jobs from other clients may overtake it meanwhile.
+    Every job runs on the same compiled graph. Finished jobs are forgotten
+    `retain_finished_seconds` after they end, and beyond the newest
+    `max_finished_jobs`; their output directories are left on disk.
+    """
+
+    def __init__(self, app, output_dir: Path = JOBS_DIR, max_concurrent_jobs: int = 4,
+                 max_jobs_per_client: int = 2, max_queued_per_client: int = 20,
+                 retain_finished_seconds: float = 3600, max_finished_jobs: int = 500, trace: bool = False):
+        self.app = app
+        self.trace = trace
+        self.output_dir = output_dir
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_jobs_per_client = max_jobs_per_client
+        self.max_queued_per_client = max_queued_per_client
+        self.retain_finished_seconds = retain_finished_seconds
+        self.max_finished_jobs = max_finished_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._queued: deque[Job] = deque()
+        self._running_by_client: Counter = Counter()
+        self._running = 0
+
+    def submit(self, client: str, query: str) -> Job:
+        with self._lock:
+            self._evict()
+            queued = sum(1 for job in self._queued if job.client == client)
+            if queued >= self.max_queued_per_client:
+                raise QueueFull(f"client {client} already has {queued} queued jobs")
+            job = Job(client, query, self.output_dir)
+            # Emitted before the job is visible to _dispatch, so "running" can't come first
+            job.set_status("queued")
+            self._jobs[job.id] = job
+            self._queued.append(job)
+        self._dispatch()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, client: str | None = None) -> list[Job]:
+        with self._lock:
+            return [job for job in self._jobs.values() if client is None or job.client == client]
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a job. Queued jobs stop at once; running jobs stop after their current node."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL_STATUSES:
+                return job
+            job.cancel_requested.set()
+            was_queued = job in self._queued
+            if was_queued:
+                self._queued.remove(job)
+        if was_queued:
+            job.set_status("cancelled")
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": len(self._queued),
+                "jobs": len(self._jobs),
+                "max_concurrent_jobs": self.max_concurrent_jobs,
+                "max_jobs_per_client": self.max_jobs_per_client,
+            }
+
+    def _stream(self, job: Job):
+        for update in self.app.stream(
+            {"query": job.query, "output_dir": str(job.output_dir)},
+            stream_mode="updates",
+        ):
+            for node, values in update.items():
+                values = values or {}
+                if "final_report" in values:
+                    job.final_report = values["final_report"]
+                if "evaluation" in values:
+                    job.evaluation = values["evaluation"]
+                job.emit("update", {"node": node, "values": _jsonable(values)})
+            # Leaving the loop closes the stream, so no further node starts
+            if job.cancel_requested.is_set():
+                break
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            for job in list(self._queued):
+                if self._running >= self.max_concurrent_jobs:
+                    break
+                if self._running_by_client[job.client] >= self.max_jobs_per_client:
+                    continue
+                self._queued.remove(job)
+                self._running += 1
+                self._running_by_client[job.client] += 1
+                job.set_status("running")
+                started.append(job)
+        for job in started:
+            self._pool.submit(self._run, job)
+
+    def _run(self, job: Job):
+        try:
+            job.output_dir.mkdir(parents=True, exist_ok=True)
+            with run_scope(), run_trace(job.id, job.query, job.output_dir) if self.trace else nullcontext():
+                self._stream(job)
+            if job.cancel_requested.is_set():
+                job.set_status("cancelled")
+            else:
+                job.set_status("done", average=job.evaluation.get("average"))
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.set_status("failed", error=job.error)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._running_by_client[job.client] -= 1
+                self._evict()
+            self._dispatch()
+
+    def _evict(self):
+        # Called with the lock held
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in TERMINAL_STATUSES and job.finished_at),
+            key=lambda job: job.finished_at,
+        )
+        cutoff = time.time() - self.retain_finished_seconds
+        excess = len(finished) - self.max_finished_jobs
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self._jobs[job.id]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP API:
+
+    POST   /jobs               {"query": "..."}  → 202 job summary
+    GET    /jobs               jobs of the calling client
+    GET    /jobs/<id>          job summary (with report and evaluation when done)
+    GET    /jobs/<id>/events   server-sent events: status changes and graph updates
+    DELETE /jobs/<id>          cancel
+    GET    /health             queue stats
+
+    Clients identify themselves with an X-Client-Id header (default: their IP).
+    """
+
+    server_version = "Spectra"
+    queue: JobQueue
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            return self._json(200, {"status": "ok", **self.queue.stats()})
+        if path == "/jobs":
+            return self._json(200, [job.summary() for job in self.queue.list(self._client())])
+        match = re.fullmatch(r"/jobs/(\w+)(/events)?", path)
+        if not match:
+            return self._json(404, {"error": "not found"})
+        job = self.queue.get(match.group(1))
+        if job is None:
+            return self._json(404, {"error": "unknown job"})
+        if match.group(2):
+            last_event_id = self.headers.get("Last-Event-ID") or "-1"
+            if not re.fullmatch(r"-?\d+", last_event_id.strip()):
+                return self._json(400, {"error": "Last-Event-ID must be an event id"})
+            return self._stream_events(job, int(last_event_id) + 1)
+        return self._json(200, job.summary())
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/jobs":
+            return self._json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._json(413, {"error": "request body too large"})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._json(400, {"error": "body must be JSON"})
+        query = body.get("query") if isinstance(body, dict) else None
+        query = query.strip() if isinstance(query, str) else ""
+        if not query:
+            return self._json(400, {"error": "missing query"})
+        try:
+            job = self.queue.submit(self._client(), query)
+        except QueueFull as e:
+            return self._json(429, {"error": str(e)})
+        self._json(202, job.summary())
+
+    def do_DELETE(self):
+        match = re.fullmatch(r"/jobs/(\w+)", urlsplit(self.path).path)
+        job = self.queue.cancel(match.group(1)) if match else None
+        if job is None:
+            return self._json(404, {"error": "unknown job"})
+        self._json(200, job.summary())
+
+    def _stream_events(self, job: Job, index: int):
+        """Stream `job`'s events from `index` on; reconnecting clients only get what they missed."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        index = max(index, 0)
+        try:
+            while True:
+                events = job.events_since(index, KEEPALIVE_SECONDS)
+                if not events:
+                    if job.status in TERMINAL_STATUSES:
+                        break
+                    self.wfile.write(b": keep-alive\n\n")
+                for event, data in events:
+                    payload = json.dumps(data, ensure_ascii=False, default=str)
+                    self.wfile.write(f"id: {index}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8"))
+                    index += 1
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _client(self) -> str:
+        return self.headers.get("X-Client-Id") or self.client_address[0]
+
+    def _json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _jsonable(values: dict) -> dict:
+    return json.loads(json.dumps(values, ensure_ascii=False, default=str))
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, app=None, output_dir: Path = JOBS_DIR,
+                  trace: bool = False) -> ThreadingHTTPServer:
+    """HTTP server bound to (host, port) with its own job queue; call serve_forever() to run it."""
+    from graph import get_app
+    from models_config import get_agent_config
+
+    try:
+        config = {**SERVICE_DEFAULTS, **get_agent_config("service")}
+    except KeyError:
+        config = dict(SERVICE_DEFAULTS)
+
+    queue = JobQueue(app or get_app(), output_dir, trace=trace, **config)
+    handler = type("Handler", (ServiceHandler,), {"queue": queue})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spectra research service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--fake-backends", action="store_true",
+        help="answer every LLM call and search with local stubs (no API keys needed)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="show node output from running jobs")
+    parser.add_argument(
+        "--trace", action="store_true",
+        help="write trace.json and metrics.prom to each job's directory",
+    )
+    args = parser.parse_args()
+
+    if args.fake_backends:
+        import fakes
+
+        fakes.install()
+
+    from display import console
+
+    server = create_server(args.host, args.port, trace=args.trace)
+    console.print(f"[bold]Spectra service[/bold] listening on http://{args.host}:{args.port}")
+    # Output from concurrent jobs would interleave
+    console.quiet = not args.verbose
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import re
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def words(text: str) -> list[str]:
+    """Lowercased words in order, ignoring tokens shorter than three characters."""
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 2]
+
+
+def tokenize(text: str) -> set[str]:
+    """Lowercased word set, ignoring tokens shorter than three characters."""
+    return set(words(text))
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,60 @@
+import hashlib
+
+
+def source_id(url: str) -> str:
+    """Compact, stable id for a URL ("s" + 16 hex digits).
+
+    64 bits keep collisions out of reach for any realistic registry; the
+    registry functions still refuse to merge two URLs under one id.
+    """
+    return "s" + hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def add_source(registry: dict[str, dict], url: str, title: str, used_in: str) -> str:
+    """Register `url` (once) in `registry`, noting where it was used; returns its id."""
+    sid = source_id(url)
+    entry = registry.get(sid)
+    if entry is None:
+        registry[sid] = {"id": sid, "url": url, "title": title or url, "used_in": [used_in]}
+        return sid
+    _check_same_url(entry, url)
+    if used_in not in entry["used_in"]:
+        entry["used_in"] = entry["used_in"] + [used_in]
+    return sid
+
+
+def merge_sources(left: dict[str, dict], right: dict[str, dict]) -> dict[str, dict]:
+    """State reducer: nodes return only the sources they found; usages are unioned."""
+    if not right:
+        return left
+    merged = dict(left)
+    for sid, entry in right.items():
+        current = merged.get(sid)
+        if current is None:
+            merged[sid] = entry
+            continue
+        _check_same_url(current, entry["url"])
+        used_in = current["used_in"] + [u for u in entry["used_in"] if u not in current["used_in"]]
+        if used_in != current["used_in"]:
+            merged[sid] = {**current, "used_in": used_in}
+    return merged
+
+
+def _check_same_url(entry: dict, url: str):
+    if entry["url"] != url:
+        raise ValueError(f"source id {entry['id']} is shared by {entry['url']!r} and {url!r}")
+
+
+def resolve_source(registry: dict[str, dict], ref: str) -> str:
+    """Id of the source an LLM referred to by title or URL, or "" if none matches."""
+    ref = ref.strip().strip("[]").strip()
+    if not ref:
+        return ""
+    sid = source_id(ref)
+    if sid in registry:
+        return sid
+    lowered = ref.lower()
+    for entry in registry.values():
+        if entry["title"].lower() == lowered:
+            return entry["id"]
+    return ""
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from typing import TypedDict
+import operator
+from typing import Annotated, TypedDict
 
 from pydantic import BaseModel
 
+from sources import merge_sources
+
 
 # ── Pydantic Models ──
 
@@ -15,20 +18,22 @@ class Perspective(BaseModel):
 
 
 class Source(BaseModel):
+    id: str  # sources.source_id(url)
     url: str
     title: str
-    used_in: str  # which subtopic
+    used_in: list[str]  # subtopics and "debate:<topic>" entries that found it
 
 
 class SearchResult(BaseModel):
     query: str
-    sources: list[Source]
+    source_ids: list[str]
     summary: str
 
 
 class Evidence(BaseModel):
     claim: str
-    source: str  # source title
+    source: str = ""  # source title, as written by the debater
+    source_id: str = ""  # registry id, when the title or URL matches a known source
 
 
 class Argument(BaseModel):
@@ -40,6 +45,7 @@ class Argument(BaseModel):
     rebuttal_to: str = ""  # only in round 2
     confidence: float = 0.0
     unresolved_questions: list[str] = []
+    source_ids: list[str] = []  # sources found by the rebuttal search
 
 
 class DebateRound(BaseModel):
@@ -54,24 +60,54 @@ class Synthesis(BaseModel):
     gap_queries: list[str]
 
 
+# ── LLM output schemas (validated by structured.invoke_structured) ──
+
+
+class PlannerOutput(BaseModel):
+    subtopics: list[str]
+    perspectives: list[Perspective]
+
+
+class EvidenceOutput(BaseModel):
+    claim: str
+    source: str = ""  # source title
+
+
+class DebaterOutput(BaseModel):
+    main_argument: str
+    evidence: list[EvidenceOutput] = []
+    rebuttal_to: str | None = ""  # only in round 2
+    confidence: float = 0.0
+    unresolved_questions: list[str] = []
+
+
+class EvaluatorOutput(BaseModel):
+    scores: dict[str, float]
+    justifications: dict[str, str] = {}
+    average: float
+    feedback: str = ""
+
+
 # ── LangGraph State ──
 
 
 class ResearchState(TypedDict, total=False):
     # Input
     query: str
+    output_dir: str  # where the Publisher writes the report; defaults to the project root
 
     # Planner
     subtopics: list[str]
     perspectives: list[dict]  # Perspective dicts (JSON-serializable)
 
-    # Researcher
-    search_results: list[dict]  # SearchResult dicts
+    # Researcher. search_results, sources and debate_rounds have reducers:
+    # nodes return only what they add and LangGraph merges it in.
+    search_results: Annotated[list[dict], operator.add]  # SearchResult dicts
     compressed_context: str
-    sources: list[dict]  # Source dicts
+    sources: Annotated[dict[str, dict], merge_sources]  # Source dicts by id, one per URL
 
     # Debate
-    debate_rounds: list[dict]  # DebateRound dicts
+    debate_rounds: Annotated[list[dict], operator.add]  # DebateRound dicts
     current_round: int
 
     # Moderator
@@ -0,0 +1,331 @@
+import copy
+import json
+import re
+import threading
+
+from pydantic import BaseModel, ValidationError
+
+from display import display_structured_retry
+from models_config import get_agent_config
+from runscope import scoped
+
+# "structured_output" in an agent's models.json entry:
+#   "json_schema"  the provider constrains the reply to the pydantic schema
+#   "json_object"  the provider guarantees syntactically valid JSON
+#   "prompt"       (default) the prompt asks for JSON and the reply is parsed
+# Providers that reject response_format fall back to "prompt" for the agent.
+STRUCTURED_MODES = ("json_schema", "json_object", "prompt")
+
+# Re-asks after an unusable reply; override with "structured_retries"
+DEFAULT_RETRIES = 1
+
+REASK_PROMPT = (
+    "Your previous reply could not be used: {error}\n"
+    "Reply again with only the corrected JSON object: no commentary, no code fences."
+)
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*")
+
+_unsupported: set[str] = set()  # agents whose provider rejected response_format
+_STATS = ("calls", "repaired", "reasked", "failed", "native", "native_fallbacks")
+_lock = threading.Lock()
+
+
+class StructuredOutputError(ValueError):
+    """The reply still didn't match the schema after every re-ask."""
+
+    def __init__(self, agent_name: str, error: Exception, text: str):
+        super().__init__(f"{agent_name}: unusable structured output ({_describe(error)})")
+        self.agent_name = agent_name
+        self.text = text
+
+
+class JSONStreamParser:
+    """Incremental, lenient JSON parser for streamed LLM replies.
+
+    `feed()` takes chunks as they arrive; `value()` returns the document so
+    far, with open strings, arrays and objects closed. `on_field(key, value)`
+    fires as soon as each top-level field of an object is complete, so
+    callers can use e.g. "main_argument" before the reply finishes.
+
+    Anything before the first { or [ (a code fence, a preamble) is skipped,
+    as is anything after the document. Trailing commas and raw newlines in
+    strings are accepted. On invalid input `error` is set and parsing stops.
+    """
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.done = False
+        self.error: str | None = None
+        self._root = None
+        self._stack: list[list] = []  # [container, pending key] per open object/array
+        self._string: list[str] | None = None  # raw characters of the open string
+        self._string_is_key = False
+        self._escape = False
+        self._literal = ""
+
+    def feed(self, text: str):
+        for char in text:
+            if self.done or self.error:
+                return
+            if self._string is not None:
+                self._string_char(char)
+            elif not self._stack:
+                # Before the document starts
+                if char in "{[":
+                    self._open({} if char == "{" else [])
+            elif char in " \t\r\n,:]}":
+                if self._literal:
+                    self._end_literal()
+                if char in "]}" and not self.error:
+                    self._close(char)
+            elif char == '"':
+                self._start_string()
+            elif char in "{[":
+                self._open({} if char == "{" else [])
+            elif char.isalnum() or char in "-+.":
+                self._literal += char
+            else:
+                self.error = f"unexpected {char!r}"
+
+    def value(self):
+        """The document parsed so far (a copy), or None before it starts."""
+        if self._string is not None and not self._string_is_key and self._stack:
+            container, key = self._stack[-1]
+            partial = _decode_string(self._string, partial=True)
+            if isinstance(container, list):
+                container[-1] = partial
+            else:
+                container[key] = partial
+        return copy.deepcopy(self._root)
+
+    def _open(self, container):
+        self._add(container, complete=False)
+        self._stack.append([container, None])
+
+    def _close(self, char: str):
+        container, _ = self._stack.pop()
+        if isinstance(container, dict) != (char == "}"):
+            self.error = f"mismatched {char!r}"
+            return
+        if not self._stack:
+            self.done = True
+        else:
+            self._completed(container)
+
+    def _start_string(self):
+        self._string = []
+        container, key = self._stack[-1]
+        self._string_is_key = isinstance(container, dict) and key is None
+        if not self._string_is_key:
+            # Placeholder so value() can show the partial string in place
+            self._add("", complete=False)
+
+    def _string_char(self, char: str):
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            text = _decode_string(self._string)
+            self._string = None
+            if self._string_is_key:
+                self._stack[-1][1] = text
+            else:
+                self._set_last(text)
+                self._completed(text)
+            return
+        self._string.append(char)
+
+    def _end_literal(self):
+        try:
+            value = json.loads(self._literal)
+        except ValueError:
+            self.error = f"invalid literal {self._literal!r}"
+            return
+        self._literal = ""
+        self._add(value, complete=True)
+
+    def _add(self, value, complete: bool):
+        if not self._stack:
+            self._root = value
+            return
+        container, key = self._stack[-1]
+        if isinstance(container, list):
+            container.append(value)
+        elif key is None:
+            self.error = "value without a key"
+            return
+        else:
+            container[key] = value
+        if complete:
+            self._completed(value)
+
+    def _set_last(self, value):
+        container, key = self._stack[-1]
+        if isinstance(container, list):
+            container[-1] = value
+        else:
+            container[key] = value
+
+    def _completed(self, value):
+        # The frame on top is the value's parent; a finished value frees its key
+        container, key = self._stack[-1]
+        if isinstance(container, dict):
+            self._stack[-1][1] = None
+            if len(self._stack) == 1 and self.on_field:
+                self.on_field(key, value)
+
+
+def _decode_string(chars: list[str], partial: bool = False) -> str:
+    raw = "".join(chars)
+    if partial:
+        # Drop an escape sequence cut off by the end of the chunk
+        raw = re.sub(r"\\(u[0-9a-fA-F]{0,3})?$", "", raw)
+    try:
+        return json.loads(f'"{raw}"', strict=False)
+    except ValueError:
+        return raw
+
+
+def parse_json(text: str):
+    """Parse the JSON document in an LLM reply.
+
+    Code fences and text around the document are ignored, and trailing
+    commas and raw newlines in strings are tolerated. A reply cut off before
+    the document ends raises ValueError.
+    """
+    cleaned = _FENCE_RE.sub("", text).strip().rstrip("`")
+    try:
+        return json.loads(cleaned)
+    except ValueError as e:
+        error = e
+    parser = JSONStreamParser()
+    parser.feed(cleaned)
+    if parser.done and not parser.error:
+        _count("repaired")
+        return parser.value()
+    raise error
+
+
+def invoke_structured(llm, agent_name: str, messages: list[dict], schema: type[BaseModel], on_field=None):
+    """Call `llm` and return its reply validated as `schema`.
+
+    Uses the provider's JSON mode per the agent's "structured_output"
+    setting. A reply that doesn't parse or validate is sent back with the
+    error for a corrected one, up to "structured_retries" times, before
+    StructuredOutputError is raised. With `on_field`, the reply is streamed
+    and `on_field(key, value)` is called as each top-level field completes.
+    """
+    config = get_agent_config(agent_name)
+    retries = config.get("structured_retries", DEFAULT_RETRIES)
+    _count("calls")
+
+    text = ""
+    for attempt in range(retries + 1):
+        # Client errors propagate; only an unusable reply is re-asked
+        try:
+            text = _call(llm, agent_name, config, messages, schema, on_field)
+        except Exception as e:
+            if not _truncated(e):
+                raise
+            # A reply cut off at max_tokens in json_schema mode raises instead of returning
+            error = ValueError("the reply was cut off at the output token limit; keep it shorter")
+            text = _partial_text(e)
+        else:
+            try:
+                return schema.model_validate(parse_json(text))
+            except ValueError as e:  # JSONDecodeError and ValidationError included
+                error = e
+        if attempt < retries:
+            _count("reasked")
+            display_structured_retry(agent_name, _describe(error))
+            messages = [
+                *messages,
+                {"role": "assistant", "content": text},
+                {"role": "user", "content": REASK_PROMPT.format(error=_describe(error))},
+            ]
+    _count("failed")
+    raise StructuredOutputError(agent_name, error, text)
+
+
+def get_structured_stats() -> dict:
+    """Structured-output counters for the current run (see runscope)."""
+    with _lock:
+        return dict(_run_stats())
+
+
+def _call(llm, agent_name: str, config: dict, messages: list[dict], schema: type[BaseModel], on_field) -> str:
+    mode = config.get("structured_output", "prompt")
+    kwargs = {}
+    if mode != "prompt" and agent_name not in _unsupported:
+        kwargs["response_format"] = _response_format(mode, schema)
+    try:
+        text = _request(llm, messages, kwargs, on_field)
+    except Exception as e:
+        if not kwargs or not _rejects_response_format(e):
+            raise
+        # Remember it for this agent and ask again the plain way
+        with _lock:
+            _unsupported.add(agent_name)
+        _count("native_fallbacks")
+        return _request(llm, messages, {}, on_field)
+    if kwargs:
+        _count("native")
+    return text
+
+
+def _request(llm, messages: list[dict], kwargs: dict, on_field) -> str:
+    if on_field is None:
+        return llm.invoke(messages, **kwargs).content
+    parser = JSONStreamParser(on_field)
+    parts = []
+    for chunk in llm.stream(messages, **kwargs):
+        if isinstance(chunk.content, str) and chunk.content:
+            parts.append(chunk.content)
+            parser.feed(chunk.content)
+    return "".join(parts)
+
+
+def _response_format(mode: str, schema: type[BaseModel]) -> dict:
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": False},
+        }
+    return {"type": "json_object"}
+
+
+def _rejects_response_format(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    message = str(error).lower()
+    return status in (400, 422) and ("response_format" in message or "json" in message)
+
+
+def _truncated(error: Exception) -> bool:
+    # openai.LengthFinishReasonError, raised by the client's parse() for json_schema replies
+    return type(error).__name__ == "LengthFinishReasonError"
+
+
+def _partial_text(error: Exception) -> str:
+    try:
+        return error.completion.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        return ""
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in e['loc']) or 'reply'}: {e['msg']}" for e in error.errors()[:5]
+        )
+    return str(error)
+
+
+def _count(key: str):
+    with _lock:
+        _run_stats()[key] += 1
+
+
+def _run_stats() -> dict:
+    return scoped("structured_stats", lambda: dict.fromkeys(_STATS, 0))
@@ -0,0 +1,112 @@
+"""Endpoint limits, and picking up edits to the "endpoints" entry of models.json."""
+
+import json
+import os
+import threading
+
+import pytest
+
+import models_config
+import ratelimit
+from models_config import get_endpoint_config
+from ratelimit import get_endpoint
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "models.json"
+    monkeypatch.setattr(models_config, "_CONFIG_PATH", path)
+    monkeypatch.setattr(models_config, "_config", None)
+    monkeypatch.setattr(ratelimit, "_endpoints", {})
+    mtime = [1_000_000]
+
+    def write(endpoints: dict):
+        path.write_text(json.dumps({"endpoints": endpoints}), encoding="utf-8")
+        # A new mtime each write, however fast the test runs
+        mtime[0] += 10
+        os.utime(path, (mtime[0], mtime[0]))
+
+    return write
+
+
+def endpoint():
+    return get_endpoint("https://llm.test", "TEST_KEY", get_endpoint_config("https://llm.test"))
+
+
+def concurrent_peak(ep, calls: int) -> int:
+    """Most calls `ep` let run at once out of `calls` started together."""
+    lock = threading.Lock()
+    running = peak = 0
+    barrier = threading.Barrier(calls, timeout=0.2)
+
+    def work():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        try:
+            # Holds the slot until every call is running, or gives up when the limit blocks the rest
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        with lock:
+            running -= 1
+
+    threads = [threading.Thread(target=ep.call, args=(work,)) for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return peak
+
+
+def test_reloaded_limits_apply_to_the_same_endpoint(config_file):
+    config_file({"https://llm.test": {"requests_per_second": 2, "burst": 4, "max_concurrency": 1}})
+    first = endpoint()
+    assert (first.bucket.rate, first.bucket.burst, first.limiter.maximum) == (2, 4, 1)
+    assert concurrent_peak(first, 3) == 1
+
+    config_file({"https://llm.test": {"requests_per_second": 50, "burst": 10, "max_concurrency": 3}})
+    second = endpoint()
+    assert second is first
+    assert (second.bucket.rate, second.bucket.burst, second.limiter.maximum) == (50, 10, 3)
+    assert concurrent_peak(second, 3) == 3
+
+
+def test_removing_a_limit_takes_effect(config_file):
+    config_file({"https://llm.test": {"requests_per_second": 1, "max_concurrency": 2}})
+    assert endpoint().bucket is not None
+    config_file({})
+    ep = endpoint()
+    assert ep.bucket is None and ep.limiter is None
+    assert ep.call(lambda: "ok") == "ok"
+
+
+def test_learned_concurrency_is_kept_unless_initial_changes(config_file):
+    config_file({"https://llm.test": {"max_concurrency": 8, "initial_concurrency": 2}})
+    ep = endpoint()
+    ep.limiter.limit = 5.0  # as if AIMD had grown it
+
+    config_file({"https://llm.test": {"max_concurrency": 4, "initial_concurrency": 2}})
+    assert endpoint().concurrency() == 4.0
+
+    config_file({"https://llm.test": {"max_concurrency": 8, "initial_concurrency": 6}})
+    assert endpoint().concurrency() == 6.0
+
+
+def test_slot_taken_before_a_reload_is_released_on_its_limiter(config_file):
+    config_file({"https://llm.test": {"max_concurrency": 1}})
+    ep = endpoint()
+    limiter = ep.limiter
+    release = threading.Event()
+    thread = threading.Thread(target=ep.call, args=(lambda: release.wait(2),))
+    thread.start()
+    # Wait until the call holds the only slot
+    while limiter._in_flight == 0:
+        pass
+
+    config_file({})
+    assert endpoint().limiter is None
+    release.set()
+    thread.join()
+    assert limiter._in_flight == 0
@@ -0,0 +1,194 @@
+"""The HTTP service against the stub backends in fakes.py (no API keys, no network)."""
+
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+import fakes
+from display import console
+from service import Job, JobQueue, QueueFull, create_server
+
+
+@pytest.fixture(autouse=True)
+def stub_backends():
+    fakes.install()
+    quiet, console.quiet = console.quiet, True
+    yield
+    console.quiet = quiet
+    fakes.uninstall()
+
+
+class BlockingApp:
+    """Stands in for the graph: each job streams one update, then waits until released for the rest."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started: list[str] = []
+        self._lock = threading.Lock()
+
+    def stream(self, graph_input, stream_mode=None):
+        with self._lock:
+            self.started.append(graph_input["query"])
+        yield {"planner": {"subtopics": ["a"]}}
+        self.release.wait(5)
+        yield {"publisher": {"final_report": "report"}}
+        yield {"evaluator": {"evaluation": {"average": 8.0}}}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server(tmp_path):
+    from graph import get_app
+
+    server = create_server(port=0, app=get_app(), output_dir=tmp_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.read().decode("utf-8")
+
+
+def read_events(text: str) -> list[dict]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append({"id": int(fields["id"]), "event": fields["event"], "data": json.loads(fields["data"])})
+    return events
+
+
+def test_per_client_and_global_limits(tmp_path):
+    app = BlockingApp()
+    queue = JobQueue(app, tmp_path, max_concurrent_jobs=3, max_jobs_per_client=2, max_queued_per_client=2)
+    a1, a2, a3 = (queue.submit("a", f"a{i}") for i in range(3))
+    b1, b2 = (queue.submit("b", f"b{i}") for i in range(2))
+    wait_for(lambda: len(app.started) == 3)
+
+    # Client a is capped at 2; b's first job takes the last global slot
+    assert [a1.status, a2.status, a3.status] == ["running", "running", "queued"]
+    assert [b1.status, b2.status] == ["running", "queued"]
+    assert queue.stats()["running"] == 3
+    queue.submit("a", "a3")
+    with pytest.raises(QueueFull):
+        queue.submit("a", "a4")
+
+    app.release.set()
+    wait_for(lambda: all(job.status == "done" for job in queue.list()))
+    assert len(app.started) == 6
+
+
+def test_cancel_queued_and_running(tmp_path):
+    app = BlockingApp()
+    queue = JobQueue(app, tmp_path, max_concurrent_jobs=1)
+    running = queue.submit("a", "first")
+    queued = queue.submit("a", "second")
+    wait_for(lambda: app.started == ["first"])
+
+    assert queue.cancel(queued.id).status == "cancelled"
+    queue.cancel(running.id)
+    app.release.set()
+    wait_for(lambda: running.status == "cancelled")
+    # The running job finished its current node and started no other
+    assert "evaluator" not in [data.get("node") for _, data in running.events_since(0, 0)]
+    assert app.started == ["first"]
+
+
+class InstantApp:
+    """A graph that finishes as soon as it starts."""
+
+    def stream(self, graph_input, stream_mode=None):
+        yield {"evaluator": {"evaluation": {"average": 8.0}}}
+
+
+def test_status_events_stay_in_order_while_jobs_finish(tmp_path, monkeypatch):
+    # Widen the window between a job becoming visible and its "queued" event
+    set_status = Job.set_status
+
+    def slow_queued(job, status, **data):
+        if status == "queued":
+            time.sleep(0.002)
+        return set_status(job, status, **data)
+
+    monkeypatch.setattr(Job, "set_status", slow_queued)
+    queue = JobQueue(InstantApp(), tmp_path, max_concurrent_jobs=2, max_jobs_per_client=2, max_queued_per_client=100)
+    jobs: list = []
+
+    def submit_many(client):
+        for i in range(30):
+            jobs.append(queue.submit(client, f"{client}{i}"))
+
+    submitters = [threading.Thread(target=submit_many, args=(client,)) for client in "abc"]
+    for thread in submitters:
+        thread.start()
+    for thread in submitters:
+        thread.join()
+    wait_for(lambda: all(job.status == "done" for job in jobs))
+
+    for job in jobs:
+        statuses = [data["status"] for event, data in job.events_since(0, 0) if event == "status"]
+        assert statuses == ["queued", "running", "done"], job.id
+    # A finished job never moves back
+    assert not jobs[0].set_status("queued") and jobs[0].status == "done"
+
+
+def test_finished_jobs_are_evicted(tmp_path):
+    app = BlockingApp()
+    app.release.set()
+    queue = JobQueue(app, tmp_path, max_finished_jobs=2)
+    jobs = [queue.submit("a", f"q{i}") for i in range(4)]
+    wait_for(lambda: all(job.status == "done" for job in jobs))
+    queue.submit("a", "last")
+    # Jobs run side by side, so the oldest to finish aren't necessarily the first submitted
+    by_finish = sorted(jobs, key=lambda job: job.finished_at)
+    assert [queue.get(job.id) for job in by_finish[:2]] == [None, None]
+    assert all(queue.get(job.id) for job in by_finish[2:])
+
+
+def test_job_streams_events_and_resumes_from_last_event_id(server):
+    status, body = request(server, "POST", "/jobs?source=test", {"query": "remote work productivity"})
+    assert status == 202
+    job_id = json.loads(body)["id"]
+
+    status, body = request(server, "GET", f"/jobs/{job_id}/events")
+    assert status == 200
+    events = read_events(body)
+    assert [e["id"] for e in events] == list(range(len(events)))
+    nodes = [e["data"]["node"] for e in events if e["event"] == "update"]
+    assert nodes[0] == "planner" and "publisher" in nodes and nodes[-1] == "evaluator"
+    assert events[-1]["data"]["status"] == "done"
+
+    status, body = request(server, "GET", f"/jobs/{job_id}/events", headers={"Last-Event-ID": "2"})
+    assert read_events(body) == events[3:]
+
+    status, body = request(server, "GET", f"/jobs/{job_id}")
+    summary = json.loads(body)
+    assert summary["status"] == "done" and summary["final_report"]
+
+
+def test_rejects_bad_requests(server):
+    assert request(server, "POST", "/jobs", {"query": 42})[0] == 400
+    assert request(server, "POST", "/jobs", {"query": "  "})[0] == 400
+    assert request(server, "POST", "/jobs", ["query"])[0] == 400
+    assert request(server, "GET", "/jobs/unknown")[0] == 404
+    status, body = request(server, "POST", "/jobs", {"query": "remote work"})
+    job_id = json.loads(body)["id"]
+    assert request(server, "GET", f"/jobs/{job_id}/events", headers={"Last-Event-ID": "abc"})[0] == 400
+    assert request(server, "GET", "/health?verbose=1")[0] == 200
+    assert request(server, "DELETE", f"/jobs/{job_id}?reason=test")[0] == 200
@@ -0,0 +1,149 @@
+"""invoke_structured re-asks and truncation recovery, and the streaming JSON parser."""
+
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+import structured
+from display import console
+from structured import JSONStreamParser, StructuredOutputError, invoke_structured, parse_json
+
+
+class Answer(BaseModel):
+    claim: str
+    confidence: float
+
+
+class LengthFinishReasonError(Exception):
+    """Named like openai's, which is matched by class name."""
+
+    def __init__(self, partial: str):
+        super().__init__("length limit reached")
+        message = SimpleNamespace(content=partial)
+        self.completion = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class ScriptedLLM:
+    """Returns (or raises) each scripted reply in turn and records the messages it was sent."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls: list[list[dict]] = []
+
+    def invoke(self, messages, **kwargs):
+        self.calls.append(list(messages))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(content=reply)
+
+
+@pytest.fixture(autouse=True)
+def agent_config(monkeypatch):
+    config = {"structured_output": "prompt", "structured_retries": 1}
+    monkeypatch.setattr(structured, "get_agent_config", lambda name: config)
+    quiet, console.quiet = console.quiet, True
+    yield config
+    console.quiet = quiet
+
+
+MESSAGES = [{"role": "user", "content": "Answer as JSON."}]
+
+
+def test_valid_reply_is_returned():
+    llm = ScriptedLLM('```json\n{"claim": "x", "confidence": 0.5}\n```')
+    assert invoke_structured(llm, "agent", MESSAGES, Answer) == Answer(claim="x", confidence=0.5)
+    assert len(llm.calls) == 1
+
+
+def test_unparseable_reply_is_reasked_with_the_error():
+    llm = ScriptedLLM("not json", '{"claim": "x", "confidence": 0.5}')
+    assert invoke_structured(llm, "agent", MESSAGES, Answer).claim == "x"
+
+    reask = llm.calls[1]
+    assert reask[:1] == MESSAGES
+    assert reask[1] == {"role": "assistant", "content": "not json"}
+    assert reask[2]["role"] == "user" and "could not be used" in reask[2]["content"]
+
+
+def test_invalid_reply_names_the_failing_field():
+    llm = ScriptedLLM('{"claim": "x", "confidence": "high"}', '{"claim": "x", "confidence": 0.9}')
+    assert invoke_structured(llm, "agent", MESSAGES, Answer).confidence == 0.9
+    assert "confidence" in llm.calls[1][2]["content"]
+
+
+def test_gives_up_after_the_configured_retries():
+    llm = ScriptedLLM("nope", "still nope")
+    with pytest.raises(StructuredOutputError) as info:
+        invoke_structured(llm, "agent", MESSAGES, Answer)
+    assert info.value.text == "still nope"
+    assert len(llm.calls) == 2
+
+
+def test_client_value_error_propagates_without_a_reask():
+    # langchain-openai raises ValueError for provider error payloads
+    llm = ScriptedLLM(ValueError("boom"))
+    with pytest.raises(ValueError, match="boom") as info:
+        invoke_structured(llm, "agent", MESSAGES, Answer)
+    assert not isinstance(info.value, StructuredOutputError)
+    assert len(llm.calls) == 1
+
+
+def test_client_error_after_a_bad_reply_is_not_reasked():
+    llm = ScriptedLLM("not json", ValueError("boom"))
+    with pytest.raises(ValueError, match="boom"):
+        invoke_structured(llm, "agent", MESSAGES, Answer)
+    assert len(llm.calls) == 2
+
+
+def test_truncated_reply_is_reasked_with_the_partial_text():
+    llm = ScriptedLLM(LengthFinishReasonError('{"claim": "a very lo'), '{"claim": "short", "confidence": 0.7}')
+    assert invoke_structured(llm, "agent", MESSAGES, Answer).claim == "short"
+
+    reask = llm.calls[1]
+    assert reask[1] == {"role": "assistant", "content": '{"claim": "a very lo'}
+    assert "output token limit" in reask[2]["content"]
+
+
+def test_truncated_last_attempt_raises_structured_error(agent_config):
+    agent_config["structured_retries"] = 0
+    llm = ScriptedLLM(LengthFinishReasonError('{"claim": "cut'))
+    with pytest.raises(StructuredOutputError) as info:
+        invoke_structured(llm, "agent", MESSAGES, Answer)
+    assert info.value.text == '{"claim": "cut'
+
+
+def test_parse_json_repairs_trailing_commas_and_rejects_cut_off_documents():
+    assert parse_json('Here you go: {"a": [1, 2,], "b": "line\nbreak",}') == {"a": [1, 2], "b": "line\nbreak"}
+    with pytest.raises(ValueError):
+        parse_json('{"a": [1, 2')
+
+
+def test_stream_parser_reports_fields_as_they_complete():
+    fields = []
+    parser = JSONStreamParser(lambda key, value: fields.append((key, value)))
+    document = '```json\n{"main_argument": "Solar is \\"cheap\\"", "evidence": [{"claim": "c"}], "confidence": 0.8}\n```'
+    for i in range(0, len(document), 7):
+        parser.feed(document[i:i + 7])
+
+    assert parser.done and parser.error is None
+    assert fields == [
+        ("main_argument", 'Solar is "cheap"'),
+        ("evidence", [{"claim": "c"}]),
+        ("confidence", 0.8),
+    ]
+    assert parser.value()["confidence"] == 0.8
+
+
+def test_stream_parser_value_closes_an_unfinished_document():
+    parser = JSONStreamParser()
+    parser.feed('{"claim": "half a sent')
+    assert not parser.done
+    assert parser.value() == {"claim": "half a sent"}
+
+
+def test_stream_parser_flags_invalid_input():
+    parser = JSONStreamParser()
+    parser.feed('{"a": [1}')
+    assert parser.error
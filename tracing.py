@@ -0,0 +1,359 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACE_DIR = Path(__file__).parent / ".cache" / "traces"
+
+# The active run's Trace (None = tracing off) and the tags for new records.
+# Both are contextvars so concurrent runs (batch, service) never mix.
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_tags: contextvars.ContextVar = contextvars.ContextVar("trace_tags", default={})
+_call: contextvars.ContextVar = contextvars.ContextVar("trace_call", default=None)
+
+
+class Trace:
+    """Node spans, LLM/search call records and task schedules for one run."""
+
+    def __init__(self, run_id: str, query: str = ""):
+        self.run_id = run_id
+        self.query = query
+        self.started_at = time.time()
+        self.wall_seconds = 0.0
+        self.nodes: list[dict] = []
+        self.calls: list[dict] = []
+        self.schedules: list[dict] = []
+        self.files: tuple[Path, Path] | None = None
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, record: dict):
+        with self._lock:
+            {"node": self.nodes, "schedule": self.schedules}.get(kind, self.calls).append(record)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "query": self.query,
+                "started_at": self.started_at,
+                "wall_seconds": round(self.wall_seconds, 4),
+                "nodes": list(self.nodes),
+                "calls": list(self.calls),
+                "schedules": list(self.schedules),
+            }
+
+
+def enabled() -> bool:
+    return _trace.get() is not None
+
+
+@contextmanager
+def run_trace(run_id: str, query: str = "", output_dir: Path | None = None):
+    """Collect a trace for everything run inside the block.
+
+    On exit the trace is written to <output_dir>/trace.json and
+    <output_dir>/metrics.prom (default: .cache/traces/<run_id>.*).
+    """
+    trace = Trace(run_id, query)
+    token = _trace.set(trace)
+    tags_token = _tags.set({"run_id": run_id})
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.wall_seconds = time.perf_counter() - start
+        _tags.reset(tags_token)
+        _trace.reset(token)
+        trace.files = export(trace, output_dir)
+
+
+def set_tags(**tags):
+    """Tag every record made from here on in this context (e.g. the debate round)."""
+    if _trace.get() is not None:
+        _tags.set({**_tags.get(), **tags})
+
+
+def bind(fn):
+    """Make `fn` run in the caller's context (trace, run scope), for use with thread pools."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # Each call gets its own copy: one context can't be entered by two threads
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def traced_node(name: str, fn):
+    """Wrap a graph node so its wall time and state sizes are recorded.
+
+    state_bytes is the JSON size of the state the node received and
+    update_bytes that of the update it returned, which is what a
+    checkpointer has to serialize.
+    """
+
+    def node(state):
+        trace = _trace.get()
+        if trace is None:
+            return fn(state)
+        _tags.set({**_tags.get(), "node": name})
+        record = {**_tags.get(), "state_bytes": _json_size(state)}
+        start = time.perf_counter()
+        update = None
+        try:
+            update = fn(state)
+            return update
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            record["update_bytes"] = _json_size(update) if update is not None else 0
+            trace.add("node", record)
+
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
+
+
+@contextmanager
+def call(kind: str, agent: str, **fields):
+    """Record one LLM or search call; inner layers fill it in through `annotate`.
+
+    Yields the record dict, or None when tracing is off.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    record = {
+        **_tags.get(),
+        "kind": kind,
+        "agent": agent,
+        "cache": "off",
+        "retries": 0,
+        "queue_seconds": 0.0,
+        **fields,
+    }
+    token = _call.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["latency"] = round(time.perf_counter() - start, 4)
+        record.setdefault("ttft", record["latency"])
+        _call.reset(token)
+        trace.add("call", record)
+
+
+def add_schedule(name: str, tasks: list[dict], critical_path: list[str]):
+    """Record the task spans of one dataflow run and its critical path."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add("schedule", {
+            **_tags.get(),
+            "schedule": name,
+            "seconds": max((task.get("end", 0.0) for task in tasks), default=0.0),
+            "critical_path": critical_path,
+            "tasks": tasks,
+        })
+
+
+def annotate(**fields):
+    """Set fields on the call being recorded, if any."""
+    record = _call.get()
+    if record is not None:
+        record.update(fields)
+
+
+def add(**amounts):
+    """Add to numeric fields of the call being recorded, if any."""
+    record = _call.get()
+    if record is not None:
+        for key, value in amounts.items():
+            record[key] = record.get(key, 0) + value
+
+
+def record_usage(message):
+    """Copy token counts from a response's usage_metadata onto the current call."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage and _call.get() is not None:
+        annotate(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+
+
+class TracedChatModel:
+    """Chat model proxy recording latency, TTFT and tokens for each call."""
+
+    def __init__(self, llm, agent_name: str, model: str = ""):
+        self._llm = llm
+        self._agent_name = agent_name
+        self._model = model
+
+    def invoke(self, messages, **kwargs):
+        if _trace.get() is None:
+            return self._llm.invoke(messages, **kwargs)
+        with call("llm", self._agent_name, model=self._model):
+            response = self._llm.invoke(messages, **kwargs)
+            record_usage(response)
+            return response
+
+    def stream(self, messages, **kwargs):
+        if _trace.get() is None:
+            yield from self._llm.stream(messages, **kwargs)
+            return
+        with call("llm", self._agent_name, model=self._model, streamed=True) as record:
+            start = time.perf_counter()
+            for chunk in self._llm.stream(messages, **kwargs):
+                if "ttft" not in record:
+                    record["ttft"] = round(time.perf_counter() - start, 4)
+                record_usage(chunk)
+                yield chunk
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+
+# ── Export ──
+
+
+def export(trace: Trace, output_dir: Path | None = None) -> tuple[Path, Path]:
+    if output_dir is None:
+        output_dir = TRACE_DIR
+        json_path = output_dir / f"{trace.run_id}.json"
+        prom_path = output_dir / f"{trace.run_id}.prom"
+    else:
+        json_path = Path(output_dir) / "trace.json"
+        prom_path = Path(output_dir) / "metrics.prom"
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    json_path.write_text(json.dumps(trace.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+    prom_path.write_text(to_prometheus(trace), encoding="utf-8")
+    return json_path, prom_path
+
+
+_METRICS = [
+    # name, type, help, per-record value
+    ("spectra_llm_calls_total", "counter", "LLM calls", lambda r: 1),
+    ("spectra_llm_latency_seconds_total", "counter", "Time spent in LLM calls", lambda r: r["latency"]),
+    ("spectra_llm_ttft_seconds_total", "counter", "Time to first token, summed over calls", lambda r: r["ttft"]),
+    ("spectra_llm_queue_seconds_total", "counter", "Time LLM calls waited for a rate limit slot", lambda r: r["queue_seconds"]),
+    ("spectra_llm_input_tokens_total", "counter", "LLM input tokens", lambda r: r.get("input_tokens", 0)),
+    ("spectra_llm_output_tokens_total", "counter", "LLM output tokens", lambda r: r.get("output_tokens", 0)),
+    ("spectra_llm_retries_total", "counter", "LLM call retries", lambda r: r["retries"]),
+    ("spectra_search_calls_total", "counter", "Search calls", lambda r: 1),
+    ("spectra_search_latency_seconds_total", "counter", "Time spent in search calls", lambda r: r["latency"]),
+    ("spectra_search_retries_total", "counter", "Search call retries", lambda r: r["retries"]),
+]
+
+
+def to_prometheus(trace: Trace) -> str:
+    """Trace totals in the Prometheus text exposition format."""
+    data = trace.to_dict()
+    lines = [
+        "# HELP spectra_run_seconds Wall time of the run",
+        "# TYPE spectra_run_seconds gauge",
+        f'spectra_run_seconds{{run_id="{_escape(trace.run_id)}"}} {data["wall_seconds"]}',
+        "# HELP spectra_node_seconds_total Wall time spent in each graph node",
+        "# TYPE spectra_node_seconds_total counter",
+    ]
+    node_totals: dict[str, float] = {}
+    update_totals: dict[str, int] = {}
+    for span in data["nodes"]:
+        node_totals[span["node"]] = node_totals.get(span["node"], 0.0) + span["seconds"]
+        update_totals[span["node"]] = update_totals.get(span["node"], 0) + span["update_bytes"]
+    for node, seconds in node_totals.items():
+        lines.append(f'spectra_node_seconds_total{{run_id="{_escape(trace.run_id)}",node="{node}"}} {round(seconds, 4)}')
+    lines += [
+        "# HELP spectra_state_update_bytes_total JSON size of the state updates returned by each node",
+        "# TYPE spectra_state_update_bytes_total counter",
+    ]
+    for node, size in update_totals.items():
+        lines.append(f'spectra_state_update_bytes_total{{run_id="{_escape(trace.run_id)}",node="{node}"}} {size}')
+    lines += [
+        "# HELP spectra_state_peak_bytes Largest JSON size of the state any node received",
+        "# TYPE spectra_state_peak_bytes gauge",
+        f'spectra_state_peak_bytes{{run_id="{_escape(trace.run_id)}"}} '
+        f'{max((span["state_bytes"] for span in data["nodes"]), default=0)}',
+    ]
+    if data["schedules"]:
+        lines += [
+            "# HELP spectra_schedule_seconds_total Wall time of dataflow schedules (e.g. debate rounds)",
+            "# TYPE spectra_schedule_seconds_total counter",
+        ]
+        schedule_totals: dict[str, float] = {}
+        for schedule in data["schedules"]:
+            schedule_totals[schedule["schedule"]] = schedule_totals.get(schedule["schedule"], 0.0) + schedule["seconds"]
+        for name, seconds in schedule_totals.items():
+            lines.append(f'spectra_schedule_seconds_total{{run_id="{_escape(trace.run_id)}",schedule="{_escape(name)}"}} {round(seconds, 4)}')
+
+    for name, metric_type, help_text, value in _METRICS:
+        kind = name.split("_")[1]
+        totals: dict[tuple, float] = {}
+        for record in data["calls"]:
+            if record["kind"] != kind:
+                continue
+            labels = (record.get("node", ""), record["agent"], record["cache"])
+            totals[labels] = totals.get(labels, 0) + value(record)
+        if not totals:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        for (node, agent, cache), total in totals.items():
+            labels = f'run_id="{_escape(trace.run_id)}",node="{node}",agent="{_escape(agent)}",cache="{cache}"'
+            lines.append(f"{name}{{{labels}}} {round(total, 4)}")
+    return "\n".join(lines) + "\n"
+
+
+def summarize(trace: Trace) -> dict:
+    """Per-node and per-agent totals for the console summary."""
+    data = trace.to_dict()
+    nodes: dict[str, dict] = {}
+    for span in data["nodes"]:
+        entry = nodes.setdefault(span["node"], {"runs": 0, "seconds": 0.0, "update_bytes": 0})
+        entry["runs"] += 1
+        entry["seconds"] += span["seconds"]
+        entry["update_bytes"] += span["update_bytes"]
+
+    agents: dict[str, dict] = {}
+    for record in data["calls"]:
+        entry = agents.setdefault(record["agent"], {
+            "calls": 0, "cache_hits": 0, "latency": 0.0, "ttft": 0.0, "queue_seconds": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "retries": 0, "errors": 0,
+        })
+        entry["calls"] += 1
+        entry["cache_hits"] += record["cache"] in ("hit", "memory", "store", "coalesced")
+        entry["latency"] += record["latency"]
+        entry["ttft"] += record["ttft"]
+        entry["queue_seconds"] += record["queue_seconds"]
+        entry["input_tokens"] += record.get("input_tokens", 0)
+        entry["output_tokens"] += record.get("output_tokens", 0)
+        entry["retries"] += record["retries"]
+        entry["errors"] += "error" in record
+    return {
+        "run_id": data["run_id"],
+        "wall_seconds": data["wall_seconds"],
+        "peak_state_bytes": max((span["state_bytes"] for span in data["nodes"]), default=0),
+        "update_bytes": sum(n["update_bytes"] for n in nodes.values()),
+        "nodes": nodes,
+        "agents": agents,
+        "critical_paths": [_critical_path_summary(schedule) for schedule in data["schedules"]],
+    }
+
+
+def _critical_path_summary(schedule: dict) -> dict:
+    tasks = {task["task"]: task for task in schedule["tasks"]}
+    return {
+        "schedule": schedule["schedule"],
+        "seconds": schedule["seconds"],
+        "path": [
+            {"task": name, "seconds": round(tasks[name]["end"] - tasks[name]["start"], 4)}
+            for name in schedule["critical_path"]
+        ],
+    }
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")